@@ -0,0 +1,224 @@
+"""
+Vorprüfung ganzer Bewerbungsrunden ohne LLM: die Entscheidung aus
+openai_client.build_decision_facts (Template-Pfad des Chats) wird spaltenweise
+(pandas/NumPy) über alle Bewerber gleichzeitig berechnet:
+    Bachelor        HZB Ja → Ja, Nein → Nein, sonst Unklar
+    Master intern   ECTS-Soll/Ist wie evaluate_ects_decision
+    Master extern   immer Unklar (ECTS-Nachweise im Einzelfall)
+Note, Berufserfahrung und Englisch entscheiden wie im Chat nicht mit; sie stehen
+nur informativ in formal_entscheidung/hinweise (Kriterien aus matching.py).
+Abweichung vom Chat: ausgeschriebene HZB-Arten aus matching.evaluate_bachelor
+(z. B. "Fachhochschulreife") zählen ebenfalls als Ja.
+
+Aufruf (aus dem backend-Ordner):
+    python batch_evaluation.py bewerbungen.csv --format csv -o ergebnis.csv
+"""
+import argparse
+import io
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+
+from rules_excel import _norm
+
+# Ergebnisse werden in Blöcken dieser Größe berechnet und gestreamt
+BATCH_CHUNK_SIZE = 10000
+
+RESULT_COLUMNS = [
+    "id", "kategorie", "entscheidung", "formal_entscheidung", "ects_entscheidung",
+    "fehlende_ects", "defizite", "hinweise"
+]
+DECISIONS = np.array(["Ja", "Unklar", "Nein"])
+
+# Alternative Spaltennamen (Felder aus matching.py) → Felder des Chat-Profils
+COLUMN_ALIASES = {"berufserfahrung_jahre": "berufserfahrung", "bachelor_hsbi": "bachelorstudiengang"}
+
+# Hochschulzugang wie in matching.evaluate_bachelor (+ Ja/Nein aus dem Chat)
+HZB_JA = {
+    "allgemeine hochschulreife", "fachhochschulreife", "fachgebundene hochschulreife",
+    "berufliche qualifizierung", "ja"
+}
+# Englisch-Noten wie in matching.evaluate_master_intern
+ENGLISCH_NOTEN = {"sehr gut": 1, "gut": 2, "befriedigend": 3, "ausreichend": 4, "mangelhaft": 5}
+
+
+def read_profiles(data: bytes, content_type: str = "") -> pd.DataFrame:
+    """Liest Bewerberprofile aus CSV (mit Header), JSON-Liste oder JSON-Lines (ValueError bei ungültigem Inhalt)."""
+    text = data.decode("utf-8-sig")
+    stripped = text.lstrip()
+    if not stripped:
+        return pd.DataFrame()
+    if "json" in content_type or stripped.startswith(("[", "{")):
+        if stripped.startswith("["):
+            records = json.loads(text)
+        else:
+            records = [json.loads(line) for line in text.splitlines() if line.strip()]
+        if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+            raise ValueError("Erwartet werden JSON-Objekte (Liste oder eines je Zeile)")
+        df = pd.DataFrame.from_records(records)
+    else:
+        df = pd.read_csv(io.StringIO(text), dtype=str, keep_default_na=False)
+    df = df.rename(columns={k: v for k, v in COLUMN_ALIASES.items() if k in df.columns and v not in df.columns})
+    return df.fillna("").astype(str)
+
+
+class CompiledBatchRules:
+    """Schwellenwerte und Matrizen des Regelwerks, einmal pro Batch vorbereitet."""
+
+    def __init__(self, rules):
+        general = rules.get("Allgemein", {})
+        self.min_note = float(general.get("Mindestnote_Bachelor", 2.5))
+        self.min_erfahrung = float(general.get("Berufserfahrung_Jahre", 1))
+        self.englisch_level = int(general.get("Technisches_Englisch", 3))
+
+        # Soll-/Ist-Matrizen aus dem Regelwerk, je mit einer Zeile "unbekannt" am Ende
+        self.categories = rules.requirement_categories
+        self.program_index = {name: i for i, name in enumerate(rules.program_names)}
+        self.soll = np.vstack([rules.soll_matrix, np.full((1, len(self.categories)), np.nan)])
+        self.has_soll = ~np.all(np.isnan(self.soll), axis=1)
+
+        self.curriculum_index = rules.curriculum_index
+        self.ist = np.zeros((len(rules.curriculum_keys) + 1, len(self.categories)))
+        self.ist[:-1, :len(rules.categories)] = rules.ects_matrix
+        self.has_ist = np.zeros(len(rules.curriculum_keys) + 1, dtype=bool)
+        self.has_ist[:-1] = len(rules.categories) > 0
+
+        self._rules = rules
+
+    def canonical_bachelor(self, names: pd.Series) -> pd.Series:
+        """Bachelornamen je eindeutigem Wert über den Trigramm-Index normalisieren (Tippfehler)."""
+        mapping = {}
+        for name in names.unique():
+            resolved = self._rules.match_bachelor(name)
+            mapping[name] = _norm(resolved["match"] or name)
+        return names.map(mapping)
+
+
+def _column(df: pd.DataFrame, name: str) -> pd.Series:
+    if name in df.columns:
+        return df[name].str.strip()
+    return pd.Series([""] * len(df), index=df.index)
+
+
+def _number(values: pd.Series) -> np.ndarray:
+    return pd.to_numeric(values.str.replace(",", ".", regex=False), errors="coerce").to_numpy(dtype=float)
+
+
+def _join_flags(flags: dict, length: int) -> np.ndarray:
+    """Baut aus booleschen Spalten {Name: Maske} die Texte "a;b;c" je Zeile."""
+    joined = np.full(length, "", dtype=object)
+    for name, mask in flags.items():
+        joined = np.where(mask, joined + name + ";", joined)
+    return np.array([s[:-1] for s in joined], dtype=object)
+
+
+def evaluate_batch(df: pd.DataFrame, compiled: CompiledBatchRules, offset: int = 0) -> pd.DataFrame:
+    """
+    Bewertet alle Profile eines DataFrames auf einmal und gibt je Bewerber eine Ergebniszeile zurück.
+    Ohne Spalte "id" ist die id die Zeilennummer in der Eingabe (`offset` = Position des ersten Profils).
+    """
+    n = len(df)
+    ziel = _column(df, "abschlussziel").str.lower()
+    is_bachelor = ziel.str.contains("bachelor").to_numpy()
+    is_master = ziel.str.contains("master").to_numpy() & ~is_bachelor
+    intern = is_master & (_column(df, "hsbi_bachelor").str.lower() == "ja").to_numpy()
+    extern = is_master & ~intern
+
+    # === Bachelor: Hochschulzugang (build_decision_facts) ===
+    hzb = _column(df, "hochschulzugang").str.lower()
+    bachelor_rank = np.where(hzb.isin(HZB_JA), 0, np.where(hzb == "nein", 2, 1))
+
+    # === Formale Kriterien Master (Note, Berufserfahrung, Englisch) ===
+    note = _number(_column(df, "abschlussnote"))
+    erfahrung = _number(_column(df, "berufserfahrung").str.extract(r"(\d+(?:[.,]\d+)?)", expand=False).fillna(""))
+    englisch = _column(df, "englischkenntnisse").str.lower()
+    englisch_level = englisch.map(ENGLISCH_NOTEN).to_numpy(dtype=float)
+
+    note_issue = np.isnan(note) | (note > compiled.min_note)
+    erfahrung_issue = np.isnan(erfahrung) | (erfahrung < compiled.min_erfahrung)
+    englisch_issue = (englisch == "nein").to_numpy() | (englisch_level > compiled.englisch_level)
+    formal_issues = note_issue.astype(int) + erfahrung_issue + englisch_issue
+
+    # === ECTS Soll/Ist (evaluate_ects_decision) als Matrix-Operation ===
+    program_rows = _column(df, "studiengang").map(compiled.program_index).fillna(len(compiled.program_index)).to_numpy(dtype=int)
+    keys = pd.Series(list(zip(
+        compiled.canonical_bachelor(_column(df, "bachelorstudiengang")),
+        _column(df, "studienart").str.lower(),
+        _column(df, "vertiefung").str.lower()
+    )), index=df.index)
+    curriculum_rows = keys.map(compiled.curriculum_index).fillna(len(compiled.curriculum_index)).to_numpy(dtype=int)
+
+    soll = compiled.soll[program_rows]
+    ist = compiled.ist[curriculum_rows]
+    has_data = compiled.has_soll[program_rows] & compiled.has_ist[curriculum_rows]
+    # Ohne Soll- oder Ist-Daten gibt es keine Defizite (wie RulesSnapshot.check_programs)
+    deficit_mask = ~np.isnan(soll) & (ist < soll) & has_data[:, None]
+    fehlend = np.where(deficit_mask, np.round(np.nan_to_num(soll) - ist, 2), 0.0).sum(axis=1)
+    ects_rank = np.where(~has_data, 1, np.where(fehlend == 0, 0, np.where(fehlend <= 10, 1, 2)))
+
+    # === Entscheidung je Kategorie (wie build_decision_facts) ===
+    formal_rank = np.where(formal_issues == 0, 0, np.where(formal_issues <= 2, 1, 2))
+    # Extern formal: jede Soll-Anforderung ist nachzuweisen → mindestens Unklar (matching.evaluate_master_extern)
+    extern_rank = np.where((formal_issues > 0) | compiled.has_soll[program_rows], 1, 0)
+    rank = np.select([is_bachelor, intern], [bachelor_rank, ects_rank], default=1)
+
+    kategorie = np.select(
+        [is_bachelor, intern, extern], ["bachelor", "master_intern", "master_extern"], default="unbekannt"
+    )
+    ids = _column(df, "id").to_numpy() if "id" in df.columns else np.arange(offset, offset + n).astype(str)
+
+    return pd.DataFrame({
+        "id": ids,
+        "kategorie": kategorie,
+        "entscheidung": DECISIONS[rank],
+        "formal_entscheidung": np.where(is_master, DECISIONS[np.where(extern, extern_rank, formal_rank)], ""),
+        "ects_entscheidung": np.where(intern, DECISIONS[ects_rank], ""),
+        "fehlende_ects": np.where(intern & has_data, fehlend, np.nan),
+        "defizite": np.where(
+            intern, _join_flags({cat: deficit_mask[:, i] for i, cat in enumerate(compiled.categories)}, n), ""
+        ),
+        "hinweise": np.where(
+            is_master,
+            _join_flags({"abschlussnote": note_issue, "berufserfahrung": erfahrung_issue, "englisch": englisch_issue}, n),
+            ""
+        )
+    }, columns=RESULT_COLUMNS)
+
+
+def stream_results(profiles: pd.DataFrame, rules, output_format: str = "jsonl", chunk_size: int = BATCH_CHUNK_SIZE):
+    """Bewertet blockweise und liefert die Ergebnisse als CSV- bzw. JSON-Lines-Text."""
+    if profiles.empty:
+        if output_format == "csv":
+            yield ",".join(RESULT_COLUMNS) + "\n"
+        return
+    compiled = CompiledBatchRules(rules)
+    for start in range(0, len(profiles), chunk_size):
+        result = evaluate_batch(profiles.iloc[start:start + chunk_size], compiled, offset=start)
+        if output_format == "csv":
+            yield result.to_csv(index=False, header=(start == 0))
+        else:
+            # Je nach pandas-Version mit oder ohne abschließenden Zeilenumbruch → genau einer je Block
+            yield result.to_json(orient="records", lines=True, force_ascii=False).rstrip("\n") + "\n"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vorprüfung von Bewerberprofilen (CSV/JSON) ohne LLM")
+    parser.add_argument("input", help="CSV mit Headerzeile, JSON-Liste oder JSON-Lines")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    parser.add_argument("-o", "--output", help="Zieldatei (Standard: stdout)")
+    parser.add_argument("--rules", default="zulassung.xlsx")
+    args = parser.parse_args()
+
+    from rules_excel import load_excel_rules
+
+    with open(args.input, "rb") as f:
+        profiles = read_profiles(f.read(), "json" if args.input.endswith((".json", ".jsonl")) else "")
+    out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        for chunk in stream_results(profiles, load_excel_rules(args.rules), args.format):
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
@@ -0,0 +1,154 @@
+"""
+Startup-Benchmark: misst den Start von `main` (Import + Aufwärmen) mit kaltem und warmem
+Regelwerk-Cache. Zusätzlich wird das reine Laden des Regelwerks (frischer Interpreter,
+inkl. Imports) gemessen, da der Gesamtstart stark von fastapi/openai geprägt ist.
+Mit --workers starten N Worker gleichzeitig und melden Ladezeit und privaten Speicher des
+Regelwerks; beides soll mit gemeinsamem Segment (RULES_SHARED_SEGMENT) flach bleiben.
+
+Aufruf (aus dem backend-Ordner):
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --runs 3 --workers 1,4,8
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from rules_excel import cache_path_for, segment_path_for, workbook_hash  # noqa: E402
+
+WORKBOOK = os.path.join(BACKEND_DIR, "zulassung.xlsx")
+
+
+STAGES = {
+    "import_main": "import main; main.warm_up()",
+    "load_rules": "import rules_excel; rules_excel.load_excel_rules()",
+}
+
+
+def time_subprocess(code: str) -> float:
+    """Startet einen frischen Interpreter und misst die Laufzeit von `code` (Sekunden)."""
+    # Der OpenAI-Client verlangt beim Import einen Key, aufgerufen wird er hier nicht
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=BACKEND_DIR,
+        env=env,
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def _private_dirty_kb():
+    """Private, beschriebene Seiten des Prozesses (Linux); eingeblendete Segmente zählen nicht dazu."""
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            return sum(int(line.split()[1]) for line in f if line.startswith("Private_Dirty:"))
+    except OSError:
+        return None
+
+
+def rules_worker():
+    """Läuft in einem frischen Prozess wie ein App-Worker: Regelwerk laden, Zeit und Speicher melden."""
+    import numpy  # noqa: F401  (Importkosten nicht dem Regelwerk zurechnen)
+    import rules_excel
+
+    before = _private_dirty_kb()
+    started = time.perf_counter()
+    rules_excel.load_excel_rules(WORKBOOK)
+    elapsed = time.perf_counter() - started
+    after = _private_dirty_kb()
+    print(json.dumps({
+        "load_s": elapsed,
+        "private_dirty_kb": after - before if before is not None else None,
+    }))
+
+
+def _clear_cache():
+    for path in (cache_path_for(WORKBOOK), segment_path_for(WORKBOOK, workbook_hash(WORKBOOK))):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def run_workers(counts: list, runs: int) -> dict:
+    """Startet je Stufe N Worker gleichzeitig (kalt: ohne Cache, einer veröffentlicht; warm: alle mappen)."""
+    result = {}
+    for count in counts:
+        for mode in ("cold", "warm"):
+            loads, memory = [], []
+            for _ in range(runs):
+                if mode == "cold":
+                    _clear_cache()
+                workers = [
+                    subprocess.Popen(
+                        [sys.executable, os.path.abspath(__file__), "--rules-worker"],
+                        cwd=BACKEND_DIR, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+                    )
+                    for _ in range(count)
+                ]
+                for worker in workers:
+                    stdout, _ = worker.communicate()
+                    sample = json.loads(stdout.strip().splitlines()[-1])
+                    loads.append(sample["load_s"])
+                    if sample["private_dirty_kb"] is not None:
+                        memory.append(sample["private_dirty_kb"])
+            result[f"{count}_workers.{mode}"] = {
+                "load_median_s": round(statistics.median(loads), 4),
+                "load_max_s": round(max(loads), 4),
+                "private_dirty_kb_median": statistics.median(memory) if memory else None,
+            }
+    return result
+
+
+def run(runs: int) -> dict:
+    result = {"runs": runs}
+
+    for stage, code in STAGES.items():
+        cold, warm = [], []
+        for _ in range(runs):
+            _clear_cache()
+            cold.append(time_subprocess(code))
+            # Der kalte Lauf hat den Cache geschrieben → nächster Lauf ist warm
+            warm.append(time_subprocess(code))
+
+        result[stage] = {
+            "cold_median_s": round(statistics.median(cold), 4),
+            "warm_median_s": round(statistics.median(warm), 4),
+            "saved_s": round(statistics.median(cold) - statistics.median(warm), 4),
+        }
+
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kalte vs. warme Startzeit (Regelwerk-Cache)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", help="Gleichzeitig startende Worker je Stufe, kommagetrennt (z. B. 1,4,8)")
+    parser.add_argument("--rules-worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.rules_worker:
+        rules_worker()
+        sys.exit(0)
+
+    result = run(args.runs)
+    for stage in STAGES:
+        r = result[stage]
+        print(f"{stage}: kalt {r['cold_median_s']} s | warm {r['warm_median_s']} s | gespart {r['saved_s']} s")
+
+    if args.workers:
+        scaling = run_workers([int(count) for count in args.workers.split(",")], args.runs)
+        for stage, r in scaling.items():
+            print(
+                f"{stage}: Laden Median {r['load_median_s']} s (max {r['load_max_s']} s) | "
+                f"privater Speicher Regelwerk {r['private_dirty_kb_median']} kB"
+            )
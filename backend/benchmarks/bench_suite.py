@@ -0,0 +1,411 @@
+"""
+Benchmark-Suite: misst jede Stufe eines Chat-Turns einzeln und schreibt die Ergebnisse als JSON.
+
+Stufen: Regelwerk laden (kalt/warm), get_vertiefungen_for, calculate_bachelor_ects,
+get_next_question/update_state je Flow, format_markdown_response, log_interaction
+(sync/async), generate_report auf synthetischen Logs (10k/1M/10M Zeilen, je ein
+frischer Prozess), komplette /chat-Sessions über den FastAPI-TestClient mit
+einem lokalen Fake statt des OpenAI-Clients sowie der App-Start (Import von main
+und Zeit bis /ready, je ein frischer Prozess) gegen ein Zeitbudget.
+
+Aufruf (aus dem backend-Ordner):
+    python benchmarks/bench_suite.py -o bench.json
+    python benchmarks/bench_suite.py --log-sizes 10000,1000000 --compare bench.json
+    python benchmarks/bench_suite.py --log-sizes "" --startup-budget 1.5
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+DEFAULT_LOG_SIZES = "10000,1000000,10000000"
+# Maximale Zeit vom Import von main bis /ready (Median, Sekunden)
+DEFAULT_STARTUP_BUDGET = 1.5
+
+# Chat-Flows (Antworten in Reihenfolge) für Konversation und /chat-Sessions
+FLOWS = {
+    "bachelor": ["Bachelor", "Ja"],
+    "master_intern": ["Master", "Ja", "Elektrotechnik", "Vollzeit", "Medizintechnik", "Angewandte Automatisierung", "2.0", "2", "Ja"],
+    "master_extern": ["Master", "Nein", "BWL", "Maschinenbau", "2.0", "2", "Ja"],
+}
+
+FAKE_DECISION_TEXT = (
+    "- **Entscheidung:** Unklar\n"
+    "- **Begründung:** Die formalen Voraussetzungen sind teilweise erfüllt.\n"
+    "- **Fehlende Voraussetzungen:** 10 ECTS im Bereich Mathematik\n"
+    "- **Bewerbungsempfehlung:** Eine Bewerbung wird empfohlen.\n"
+)
+
+
+# === Messung ===
+def _summary(durations_ns: list) -> dict:
+    values = sorted(durations_ns)
+    n = len(values)
+    mean = sum(values) / n
+    return {
+        "iterations": n,
+        "mean_us": round(mean / 1000, 3),
+        "median_us": round(statistics.median(values) / 1000, 3),
+        "p95_us": round(values[min(n - 1, int(n * 0.95))] / 1000, 3),
+        "min_us": round(values[0] / 1000, 3),
+        "max_us": round(values[-1] / 1000, 3),
+        "ops_per_s": round(1e9 / mean, 2) if mean else None,
+    }
+
+
+def measure(fn, min_time=0.5, max_iterations=100000, min_iterations=3, warmup=1) -> dict:
+    """Ruft `fn(i)` wiederholt auf (mind. `min_time` Sekunden bzw. `min_iterations` Mal), stdout stumm."""
+    durations = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for i in range(warmup):
+            fn(i)
+        deadline = time.perf_counter() + min_time
+        i = 0
+        while i < max_iterations and (i < min_iterations or time.perf_counter() < deadline):
+            started = time.perf_counter_ns()
+            fn(i)
+            durations.append(time.perf_counter_ns() - started)
+            i += 1
+    return _summary(durations)
+
+
+# === Synthetische Logs ===
+def generate_log(path: str, rows: int, days: int = 90, seed: int = 42):
+    """
+    Schreibt ein Log im aktuellen Format mit den Werten, die main.py loggt: je Session eine
+    Zeile "gestartet", 0–5 Zeilen "in_progress" und (zu 70 %) eine Zeile "abgeschlossen",
+    verteilt über `days` Tage.
+    """
+    from logging_handler import LOG_HEADER
+
+    rng = random.Random(seed)
+    programs = ["Angewandte Automatisierung", "Digitale Technologien", "Maschinenbau", "Wirtschaftsingenieurwesen"]
+    start = datetime.now() - timedelta(days=days)
+    step = timedelta(days=days) / max(rows, 1)
+
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(LOG_HEADER)
+        written, user = 0, 0
+        batch = []
+        while written < rows:
+            user += 1
+            ziel = rng.choice(["Bachelor", "Master"])
+            program = rng.choice(programs) if ziel == "Master" else "Unbekannt"
+            if ziel == "Bachelor":
+                kategorie = "bachelorbewerber"
+                # Bachelor mit eindeutiger HZB wird als "Unklar" geloggt (siehe build_decision_messages)
+                entscheidung = "Unklar"
+            else:
+                kategorie = rng.choice(["master_intern", "master_extern"])
+                entscheidung = rng.choice(["Ja", "Nein", "Unklar"])
+            turns = min(rng.randint(1, 6), rows - written)
+            completed = rng.random() < 0.7
+            for turn in range(turns):
+                timestamp = (start + step * (written + turn)).isoformat()
+                if turn == 0:
+                    row = ["Unbekannt", "Unbekannt", "Unbekannt", "-", "gestartet", 0]
+                elif turn == turns - 1 and completed:
+                    row = [ziel, "Bachelor" if ziel == "Bachelor" else program, kategorie, entscheidung, "abgeschlossen", 100]
+                else:
+                    # Studiengang steht erst gegen Ende der Master-Fragen fest
+                    row = [ziel, program if turn >= 3 else "Unbekannt", "Unbekannt", "-", "in_progress", turn * 15]
+                batch.append([timestamp, f"user-{user}", *row, "bench"])
+            written += turns
+            if len(batch) >= 100000:
+                writer.writerows(batch)
+                batch = []
+        writer.writerows(batch)
+
+
+def report_worker(log_path: str, min_time: float) -> dict:
+    """Läuft in einem frischen Prozess (LOG_FILE zeigt auf das synthetische Log)."""
+    import logging_handler
+    from log_tail import CsvLogTail
+
+    results = {}
+    logging_handler.REPORT_INCREMENTAL = False
+    results["full_scan"] = measure(lambda i: logging_handler.generate_report(30), min_time=min_time, warmup=0)
+
+    logging_handler.REPORT_INCREMENTAL = True
+    aggregates = logging_handler.report_aggregates
+
+    def build_from_scratch(i):
+        # Neuer Tail ab Offset 0 → Tages-Buckets werden aus dem ganzen Log aufgebaut
+        logging_handler.log_tail = CsvLogTail(log_path, on_rows=aggregates.add_rows, on_reset=lambda: aggregates.rebuild([]))
+        logging_handler.generate_report(30)
+    results["incremental_build"] = measure(build_from_scratch, min_time=0, warmup=0)
+    results["incremental_cached"] = measure(lambda i: logging_handler.generate_report(30), min_time=min_time)
+
+    def append_and_report(i):
+        for n in range(100):
+            logging_handler.log_interaction(f"bench-{i}-{n}", "Master", "Maschinenbau", "master_extern", "Ja", rules_version="bench")
+        logging_handler.generate_report(30)
+    results["incremental_after_100_rows"] = measure(append_and_report, min_time=min_time)
+    return results
+
+
+def bench_reports(sizes: list, min_time: float) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="hsbi-bench-") as tmp:
+        for size in sizes:
+            path = os.path.join(tmp, f"log_{size}.csv")
+            started = time.perf_counter()
+            generate_log(path, size)
+            print(f"[Bench] Log mit {size} Zeilen erzeugt ({time.perf_counter() - started:.1f} s)", file=sys.stderr)
+
+            env = dict(os.environ, LOG_FILE=path, LOG_BACKEND="csv", LOG_ASYNC="0", LOG_DIR=os.path.join(tmp, "logs"))
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--report-worker", path, "--min-time", str(min_time)],
+                cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+            )
+            for stage, summary in json.loads(proc.stdout.strip().splitlines()[-1]).items():
+                results[f"generate_report.{stage}.{size}"] = summary
+            os.remove(path)
+    return results
+
+
+# === App-Start ===
+def startup_worker() -> dict:
+    """Läuft in einem frischen Prozess: Dauer von `import main` und bis /ready 200 liefert (inkl. Lifespan)."""
+    from fastapi.testclient import TestClient
+
+    started = time.perf_counter_ns()
+    import main
+    imported = time.perf_counter_ns()
+    with TestClient(main.app) as client:
+        while client.get("/ready").status_code != 200:
+            if main.STARTUP["error"]:
+                raise RuntimeError(main.STARTUP["error"])
+            time.sleep(0.002)
+        ready = time.perf_counter_ns()
+    return {"import_main": imported - started, "ready": ready - started}
+
+
+def bench_startup(runs: int) -> dict:
+    durations = {}
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--startup-worker"],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        )
+        for stage, ns in json.loads(proc.stdout.strip().splitlines()[-1]).items():
+            durations.setdefault(f"startup.{stage}", []).append(ns)
+    return {stage: _summary(values) for stage, values in durations.items()}
+
+
+# === Fake-OpenAI-Client für /chat ===
+class FakeCompletions:
+    """Antwortet sofort mit einem festen Entscheidungstext (optional als Stream)."""
+
+    async def create(self, stream=False, **kwargs):
+        usage = types.SimpleNamespace(total_tokens=120)
+        if not stream:
+            message = types.SimpleNamespace(content=FAKE_DECISION_TEXT)
+            return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=usage)
+        return self._stream(usage)
+
+    async def _stream(self, usage):
+        for start in range(0, len(FAKE_DECISION_TEXT), 16):
+            delta = types.SimpleNamespace(content=FAKE_DECISION_TEXT[start:start + 16])
+            yield types.SimpleNamespace(choices=[types.SimpleNamespace(delta=delta)], usage=None)
+        yield types.SimpleNamespace(choices=[], usage=usage)
+
+
+class FakeAsyncOpenAI:
+    def __init__(self):
+        self.chat = types.SimpleNamespace(completions=FakeCompletions())
+
+
+# === Stufen ===
+def bench_stages(min_time: float, log_sizes: list) -> dict:
+    import rules_excel
+    from conversation import get_next_question, update_state
+    from openai_client import build_decision_facts, decision_template_markdown, format_markdown_response
+    from session_store import SessionState
+
+    results = {}
+    workbook = os.path.join(BACKEND_DIR, "zulassung.xlsx")
+
+    # --- Regelwerk ---
+    results["load_excel_rules.cold"] = measure(
+        lambda i: rules_excel.load_excel_rules(workbook, use_cache=False), min_time=min_time, warmup=0
+    )
+    rules_excel.load_excel_rules(workbook)
+    results["load_excel_rules.warm"] = measure(lambda i: rules_excel.load_excel_rules(workbook), min_time=min_time)
+    rules = rules_excel.load_excel_rules(workbook)
+    combos = rules.curriculum_keys
+
+    results["get_vertiefungen_for"] = measure(
+        lambda i: rules_excel.get_vertiefungen_for(combos[i % len(combos)][0], combos[i % len(combos)][1], rules=rules),
+        min_time=min_time
+    )
+    results["calculate_bachelor_ects"] = measure(
+        lambda i: rules_excel.calculate_bachelor_ects(*combos[i % len(combos)], rules=rules), min_time=min_time
+    )
+
+    # --- Konversation (ohne HTTP) ---
+    for flow, answers in FLOWS.items():
+        def run_flow(i, answers=answers):
+            state = SessionState()
+            for answer in answers:
+                get_next_question(state, rules)
+                update_state(state, answer, rules)
+            return state
+        results[f"conversation.{flow}"] = measure(run_flow, min_time=min_time)
+
+    # --- Markdown-Formatierung einer typischen Entscheidung ---
+    applicant = run_flow(0, FLOWS["master_intern"]).to_dict()
+    raw_text = decision_template_markdown(build_decision_facts(applicant, rules)) + "\n" + FAKE_DECISION_TEXT
+    results["format_markdown_response"] = measure(lambda i: format_markdown_response(raw_text), min_time=min_time)
+
+    # --- Logging (schreibt in LOG_FILE, siehe main()) ---
+    import logging_handler
+
+    logging_handler.LOG_ASYNC = False
+    results["log_interaction.sync"] = measure(
+        lambda i: logging_handler.log_interaction(f"bench-{i}", "Master", "Unbekannt", "Unbekannt", "-", "in_progress", 50, "bench"),
+        min_time=min_time
+    )
+    logging_handler.LOG_ASYNC = True
+
+    def log_async_batch(i):
+        for n in range(1000):
+            logging_handler.log_interaction(f"bench-{i}-{n}", "Master", "Unbekannt", "Unbekannt", "-", "in_progress", 50, "bench")
+        logging_handler.log_writer.flush()
+    # 1000 Einträge je Messung inkl. Schreiben im Hintergrund-Thread
+    results["log_interaction.async_per_1000"] = measure(log_async_batch, min_time=min_time)
+
+    # --- Komplette /chat-Sessions mit Fake-OpenAI ---
+    import openai_client
+    import main
+    from fastapi.testclient import TestClient
+
+    openai_client.async_client = FakeAsyncOpenAI()
+    client = TestClient(main.app)
+    for flow, answers in FLOWS.items():
+        def run_session(i, flow=flow, answers=answers):
+            user_id = f"bench-{flow}-{i}-{time.perf_counter_ns()}"
+            for answer in answers:
+                response = client.post("/chat", json={"message": answer, "user_id": user_id})
+                response.raise_for_status()
+        results[f"chat_session.{flow}"] = measure(run_session, min_time=min_time)
+    logging_handler.log_writer.flush()
+
+    # --- Reports auf synthetischen Logs (je Größe ein frischer Prozess) ---
+    results.update(bench_reports(log_sizes, min_time))
+    return results
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "-"
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Stufen, deren Median um mehr als `threshold` (relativ) langsamer geworden ist."""
+    regressions = []
+    for stage, summary in current["stages"].items():
+        before = baseline.get("stages", {}).get(stage)
+        if not before or not before.get("median_us"):
+            continue
+        ratio = summary["median_us"] / before["median_us"]
+        if ratio > 1 + threshold:
+            regressions.append({"stage": stage, "before_us": before["median_us"], "now_us": summary["median_us"], "ratio": round(ratio, 2)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark aller Stufen eines Chat-Turns (JSON-Ausgabe)")
+    parser.add_argument("-o", "--output", default="bench_results.json")
+    parser.add_argument("--log-sizes", default=DEFAULT_LOG_SIZES, help="Zeilenzahlen der synthetischen Logs, kommagetrennt")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Mindestmesszeit je Stufe in Sekunden")
+    parser.add_argument("--compare", help="Früheres Ergebnis-JSON; Regressionen führen zu Exit-Code 1")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Tolerierte Verlangsamung (0.25 = +25 %%)")
+    parser.add_argument("--startup-runs", type=int, default=5, help="Frische Prozesse für die Startmessung")
+    parser.add_argument(
+        "--startup-budget", type=float, default=DEFAULT_STARTUP_BUDGET,
+        help="Maximaler Median bis /ready in Sekunden; Überschreitung führt zu Exit-Code 1"
+    )
+    parser.add_argument("--report-worker", help=argparse.SUPPRESS)
+    parser.add_argument("--startup-worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.startup_worker:
+        with contextlib.redirect_stdout(sys.stderr):
+            result = startup_worker()
+        print(json.dumps(result))
+        return 0
+
+    if args.report_worker:
+        with contextlib.redirect_stdout(sys.stderr):
+            result = report_worker(args.report_worker, args.min_time)
+        print(json.dumps(result))
+        return 0
+
+    output = os.path.abspath(args.output)
+    log_sizes = [int(size) for size in args.log_sizes.split(",") if size.strip()]
+    with tempfile.TemporaryDirectory(prefix="hsbi-bench-") as tmp:
+        # Vor dem Import der Backend-Module: Logs, Sessions und Cache isolieren
+        os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+        os.environ["LOG_FILE"] = os.path.join(tmp, "chatbot_log.csv")
+        os.environ["LOG_BACKEND"] = "csv"
+        os.environ["SESSION_STORE"] = "memory"
+        os.environ["DECISION_CACHE_ENABLED"] = "0"
+        os.chdir(BACKEND_DIR)
+        stages = bench_startup(args.startup_runs)
+        stages.update(bench_stages(args.min_time, log_sizes))
+
+    result = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "log_sizes": log_sizes,
+        "stages": stages,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+
+    for stage, summary in stages.items():
+        print(f"{stage:48s} median {summary['median_us']:>14.1f} µs | p95 {summary['p95_us']:>14.1f} µs | n={summary['iterations']}")
+    print(f"[Bench] Ergebnisse geschrieben nach {output}")
+
+    exit_code = 0
+    ready_s = stages["startup.ready"]["median_us"] / 1e6
+    if ready_s > args.startup_budget:
+        print(f"[Bench] ⚠️ Start bis /ready dauert {ready_s:.3f} s (Budget {args.startup_budget} s)")
+        exit_code = 1
+    else:
+        print(f"[Bench] ✅ Start bis /ready in {ready_s:.3f} s (Budget {args.startup_budget} s)")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.threshold)
+        for r in regressions:
+            print(f"[Bench] ⚠️ Regression {r['stage']}: {r['before_us']} → {r['now_us']} µs (x{r['ratio']})")
+        if regressions:
+            return 1
+        print(f"[Bench] ✅ Keine Regression gegenüber {args.compare} (Toleranz {args.threshold:.0%})")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+"""
+Lasttest für komplette Chat-Sessions: startet den OpenAI-Mock und einen uvicorn-Worker
+(OPENAI_BASE_URL zeigt auf den Mock) und schickt N synthetische Bewerber gleichzeitig
+durch /chat bzw. /chat/stream (Bachelor, Master intern, Master extern).
+Ausgabe: Durchsatz, p50/p95/p99 je Turn-Typ und Fehlerzahlen – optional als JSON.
+
+Aufruf (aus dem backend-Ordner):
+    python benchmarks/load_test.py --users 500 --concurrency 10,50,100 --latency-ms 800
+    python benchmarks/load_test.py --app-url http://127.0.0.1:8000 --users 100   # laufende Instanz
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+FLOW_MIX = "bachelor:1,master_intern:2,master_extern:1"
+MASTER_PROGRAMS = ["Angewandte Automatisierung", "Digitale Technologien", "Maschinenbau", "Wirtschaftsingenieurwesen"]
+STUDIENARTEN = {"praxisintegriert": "praxisintegriert", "vollzeit": "Vollzeit"}
+
+
+# === Synthetische Bewerber ===
+def build_applicants(rules, users: int, mix: dict, seed: int) -> list:
+    """Antwortfolgen je Bewerber; HSBI-Bachelor samt Vertiefung stammen aus dem Regelwerk."""
+    rng = random.Random(seed)
+    combos = [
+        (bachelor, art, vertiefung)
+        for (bachelor, art), entries in rules.curricula.items() if art in STUDIENARTEN
+        for vertiefung in entries
+    ]
+    flows = [flow for flow, weight in mix.items() for _ in range(weight)]
+
+    def master_tail():
+        return [
+            rng.choice(MASTER_PROGRAMS),
+            rng.choice(["1.7", "2.3", "2,8", "3.1"]),
+            rng.choice(["0", "1", "3"]),
+            rng.choice(["Ja", "Nein"]),
+        ]
+
+    applicants = []
+    for _ in range(users):
+        flow = rng.choice(flows)
+        if flow == "bachelor":
+            answers = ["Bachelor", rng.choice(["Ja", "Nein"])]
+        elif flow == "master_intern":
+            bachelor, art, vertiefung = rng.choice(combos)
+            answers = ["Master", "Ja", rules.bachelor_names[bachelor], STUDIENARTEN[art], vertiefung] + master_tail()
+        else:
+            answers = ["Master", "Nein", rng.choice(["BWL", "Informatik", "Mechatronik", "Physik"])] + master_tail()
+        applicants.append((flow, answers))
+    return applicants
+
+
+# === Lastgenerator ===
+def _percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def _send(client, url: str, payload: dict, stream: bool):
+    """Ein Turn; liefert (Antwort-Dict, Zeit bis zum ersten Chunk bzw. None)."""
+    if not stream:
+        response = await client.post(f"{url}/chat", json=payload)
+        response.raise_for_status()
+        return response.json(), None
+
+    started = time.perf_counter()
+    first_chunk = None
+    done = None
+    async with client.stream("POST", f"{url}/chat/stream", json=payload) as response:
+        response.raise_for_status()
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: "):
+                if event == "chunk" and first_chunk is None:
+                    first_chunk = time.perf_counter() - started
+                if event == "done":
+                    done = json.loads(line[6:])
+    return done or {}, first_chunk
+
+
+async def run_level(url: str, applicants: list, concurrency: int, stream: bool) -> dict:
+    latencies = defaultdict(list)
+    first_chunks = defaultdict(list)
+    errors = Counter()
+    sessions_done = 0
+    queue = asyncio.Queue()
+    for item in applicants:
+        queue.put_nowait(item)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        async def worker(worker_id: int):
+            nonlocal sessions_done
+            while not queue.empty():
+                flow, answers = queue.get_nowait()
+                user_id = f"load-{worker_id}-{time.perf_counter_ns()}"
+                for position, answer in enumerate(answers):
+                    turn = f"{flow}.{'decision' if position == len(answers) - 1 else 'question'}"
+                    started = time.perf_counter()
+                    try:
+                        reply, first_chunk = await _send(client, url, {"message": answer, "user_id": user_id}, stream)
+                    except httpx.HTTPStatusError as e:
+                        errors[f"http_{e.response.status_code}"] += 1
+                        break
+                    except httpx.HTTPError as e:
+                        errors[type(e).__name__] += 1
+                        break
+                    latencies[turn].append(time.perf_counter() - started)
+                    if first_chunk is not None:
+                        first_chunks[turn].append(first_chunk)
+                    if "❌" in str(reply.get("response", "")):
+                        errors["decision_error"] += 1
+                else:
+                    sessions_done += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    turns = {}
+    for turn, values in sorted(latencies.items()):
+        turns[turn] = {
+            "count": len(values),
+            "p50_ms": round(_percentile(values, 0.50) * 1000, 1),
+            "p95_ms": round(_percentile(values, 0.95) * 1000, 1),
+            "p99_ms": round(_percentile(values, 0.99) * 1000, 1),
+            "max_ms": round(max(values) * 1000, 1),
+        }
+        if first_chunks.get(turn):
+            turns[turn]["first_chunk_p95_ms"] = round(_percentile(first_chunks[turn], 0.95) * 1000, 1)
+
+    total_turns = sum(len(values) for values in latencies.values())
+    return {
+        "concurrency": concurrency,
+        "sessions": sessions_done,
+        "elapsed_s": round(elapsed, 3),
+        "sessions_per_s": round(sessions_done / elapsed, 2),
+        "turns_per_s": round(total_turns / elapsed, 2),
+        "errors": dict(errors),
+        "turns": turns,
+    }
+
+
+# === Prozesse (Mock + App) ===
+def _wait_until_up(url: str, process, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Prozess für {url} beendet (Exit-Code {process.returncode})")
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} nicht erreichbar")
+
+
+def start_servers(args, tmp: str, processes: list):
+    """Startet Mock und App; `processes` wird sofort befüllt, damit sie auch bei Fehlern beendet werden."""
+    mock = subprocess.Popen(
+        [
+            sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "mock_openai_server.py"),
+            "--port", str(args.mock_port), "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+            "--error-rate", str(args.error_rate), "--token-delay-ms", str(args.token_delay_ms), "--seed", str(args.seed),
+        ],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL
+    )
+    processes.append(mock)
+    env = dict(
+        os.environ,
+        OPENAI_BASE_URL=f"http://127.0.0.1:{args.mock_port}/v1",
+        OPENAI_API_KEY=os.getenv("OPENAI_API_KEY") or "sk-mock",
+        LOG_FILE=os.path.join(tmp, "chatbot_log.csv"),
+        LOG_BACKEND="csv",
+        # Mehrere Worker teilen sich Sessions nur über SQLite (Turns einer Session landen auf beliebigen Workern)
+        SESSION_STORE="sqlite" if args.workers > 1 else "memory",
+        SESSION_DB=os.path.join(tmp, "sessions.db"),
+        # Gleiche Profile sollen das Modell erreichen, sonst misst der Test den Cache
+        DECISION_CACHE_ENABLED="1" if args.decision_cache else "0",
+    )
+    app = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.app_port),
+            "--workers", str(args.workers), "--log-level", "warning", "--no-access-log",
+        ],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL
+    )
+    processes.append(app)
+    _wait_until_up(f"http://127.0.0.1:{args.mock_port}/stats", mock)
+    _wait_until_up(f"http://127.0.0.1:{args.app_port}/", app)
+
+
+def print_level(result: dict):
+    print(
+        f"\n[Last] Parallelität {result['concurrency']}: {result['sessions']} Sessions in {result['elapsed_s']} s "
+        f"→ {result['sessions_per_s']} Sessions/s, {result['turns_per_s']} Turns/s, Fehler: {result['errors'] or 0}"
+    )
+    for turn, stats in result["turns"].items():
+        print(
+            f"    {turn:26s} n={stats['count']:<6d} p50 {stats['p50_ms']:>8.1f} ms | p95 {stats['p95_ms']:>8.1f} ms"
+            f" | p99 {stats['p99_ms']:>8.1f} ms | max {stats['max_ms']:>8.1f} ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lasttest kompletter Chat-Sessions gegen einen OpenAI-Mock")
+    parser.add_argument("--users", type=int, default=200, help="Synthetische Bewerber je Stufe")
+    parser.add_argument("--concurrency", default="20", help="Gleichzeitige Bewerber, mehrere Stufen kommagetrennt")
+    parser.add_argument("--mix", default=FLOW_MIX, help="Gewichtung der Flows, z. B. bachelor:1,master_intern:2")
+    parser.add_argument("--stream", action="store_true", help="/chat/stream statt /chat verwenden")
+    parser.add_argument("--latency-ms", type=float, default=800)
+    parser.add_argument("--jitter-ms", type=float, default=200)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--token-delay-ms", type=float, default=20)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn-Worker der App")
+    parser.add_argument("--decision-cache", action="store_true", help="Entscheidungs-Cache der App eingeschaltet lassen")
+    parser.add_argument("--app-url", help="Bereits laufende App testen (Mock/App werden dann nicht gestartet)")
+    parser.add_argument("--app-port", type=int, default=8800)
+    parser.add_argument("--mock-port", type=int, default=8900)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("-o", "--output", help="Ergebnisse zusätzlich als JSON schreiben")
+    args = parser.parse_args()
+
+    from rules_excel import load_excel_rules
+
+    os.chdir(BACKEND_DIR)
+    mix = {name: int(weight) for name, weight in (part.split(":") for part in args.mix.split(","))}
+    levels = [int(level) for level in args.concurrency.split(",")]
+    rules = load_excel_rules()
+
+    with tempfile.TemporaryDirectory(prefix="hsbi-load-") as tmp:
+        processes = []
+        url = args.app_url or f"http://127.0.0.1:{args.app_port}"
+        results = []
+        try:
+            if not args.app_url:
+                start_servers(args, tmp, processes)
+            for level in levels:
+                if not args.app_url:
+                    httpx.post(f"http://127.0.0.1:{args.mock_port}/stats/reset")
+                applicants = build_applicants(rules, args.users, mix, args.seed + level)
+                result = asyncio.run(run_level(url, applicants, level, args.stream))
+                if not args.app_url:
+                    # Vom Mock simulierte Fehler fängt die App über die regelbasierte Antwort ab
+                    result["llm"] = httpx.get(f"http://127.0.0.1:{args.mock_port}/stats").json()
+                    result["llm"].pop("config", None)
+                results.append(result)
+                print_level(result)
+        finally:
+            for process in processes:
+                process.terminate()
+                process.wait()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "levels": results}, f, indent=2, ensure_ascii=False)
+        print(f"\n[Last] Ergebnisse geschrieben nach {args.output}")
+
+
+if __name__ == "__main__":
+    main()
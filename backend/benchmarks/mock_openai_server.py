@@ -0,0 +1,150 @@
+"""
+Lokaler OpenAI-kompatibler Stand-in für Lasttests: beantwortet /v1/chat/completions
+(auch mit stream=True) mit konfigurierbarer Latenz, Jitter, Fehlerquote und Token-Tempo.
+Die Entscheidung im Antworttext wird, falls vorhanden, aus dem Prompt übernommen.
+
+Aufruf (aus dem backend-Ordner):
+    python benchmarks/mock_openai_server.py --port 8900 --latency-ms 800 --jitter-ms 200 --error-rate 0.01
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 uvicorn main:app
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+CONFIG = {
+    "latency_ms": 800.0,
+    "jitter_ms": 200.0,
+    "error_rate": 0.0,
+    "error_status": 500,
+    "token_delay_ms": 20.0,
+}
+STATS = {"requests": 0, "streamed": 0, "errors": 0}
+
+REPLY_TEMPLATE = (
+    "- **Entscheidung:** {decision}\n"
+    "- **Begründung:** Die Angaben wurden mit den Zulassungsregeln abgeglichen.\n"
+    "- **Fehlende Voraussetzungen:** Keine weiteren Angaben.\n"
+    "- **Bewerbungsempfehlung:** Bitte reiche die Unterlagen fristgerecht ein.\n"
+    "- **Bewerbungsunterlagen:** Abschlusszeugnis, Lebenslauf, Modulübersicht.\n"
+)
+
+app = FastAPI()
+
+
+def _delay() -> float:
+    """Antwortzeit bis zum ersten Token in Sekunden (Latenz ± Jitter, nie negativ)."""
+    jitter = random.uniform(-CONFIG["jitter_ms"], CONFIG["jitter_ms"])
+    return max(0.0, CONFIG["latency_ms"] + jitter) / 1000
+
+
+def _reply_text(messages: list) -> str:
+    prompt = "\n".join(str(m.get("content", "")) for m in messages)
+    match = re.search(r"Entscheidung:?\s*\**\s*(Ja|Nein|Unklar)", prompt)
+    return REPLY_TEMPLATE.format(decision=match.group(1) if match else "Unklar")
+
+
+def _tokens(text: str) -> list:
+    # Grob wie echte Tokens: Wortstücke inkl. folgendem Leerraum
+    return re.findall(r"\S+\s*", text)
+
+
+def _chunk(completion_id: str, model: str, delta: dict, finish_reason=None, usage=None) -> str:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [] if usage else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    if usage:
+        payload["usage"] = usage
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    STATS["requests"] += 1
+    await asyncio.sleep(_delay())
+
+    if random.random() < CONFIG["error_rate"]:
+        STATS["errors"] += 1
+        return JSONResponse(
+            {"error": {"message": "Mock: simulierter Fehler", "type": "server_error", "code": None}},
+            status_code=CONFIG["error_status"]
+        )
+
+    model = body.get("model", "mock")
+    text = _reply_text(body.get("messages", []))
+    tokens = _tokens(text)
+    usage = {"prompt_tokens": 400, "completion_tokens": len(tokens), "total_tokens": 400 + len(tokens)}
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+    if not body.get("stream"):
+        # Generierung dauert wie beim Stream, kommt aber am Stück
+        await asyncio.sleep(len(tokens) * CONFIG["token_delay_ms"] / 1000)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+
+    STATS["streamed"] += 1
+    include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+    async def events():
+        yield _chunk(completion_id, model, {"role": "assistant", "content": ""})
+        for token in tokens:
+            await asyncio.sleep(CONFIG["token_delay_ms"] / 1000)
+            yield _chunk(completion_id, model, {"content": token})
+        yield _chunk(completion_id, model, {}, finish_reason="stop")
+        if include_usage:
+            yield _chunk(completion_id, model, {}, usage=usage)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/stats")
+def stats():
+    return {**STATS, "config": CONFIG}
+
+
+@app.post("/stats/reset")
+def reset_stats():
+    for key in STATS:
+        STATS[key] = 0
+    return STATS
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI-kompatibler Mock-Server für Lasttests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=CONFIG["latency_ms"], help="Zeit bis zum ersten Token")
+    parser.add_argument("--jitter-ms", type=float, default=CONFIG["jitter_ms"], help="± gleichverteilt auf die Latenz")
+    parser.add_argument("--error-rate", type=float, default=CONFIG["error_rate"], help="Anteil fehlerhafter Antworten (0–1)")
+    parser.add_argument("--error-status", type=int, default=CONFIG["error_status"], help="HTTP-Status simulierter Fehler")
+    parser.add_argument("--token-delay-ms", type=float, default=CONFIG["token_delay_ms"], help="Abstand zwischen Tokens")
+    parser.add_argument("--seed", type=int, help="Zufallsstartwert für reproduzierbare Läufe")
+    args = parser.parse_args()
+
+    CONFIG.update(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+        error_status=args.error_status, token_delay_ms=args.token_delay_ms
+    )
+    if args.seed is not None:
+        random.seed(args.seed)
+    print(f"[Mock] OpenAI-Mock auf http://{args.host}:{args.port}/v1 – {CONFIG}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
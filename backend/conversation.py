@@ -1,21 +1,22 @@
-from rules_excel import load_excel_rules, calculate_bachelor_ects, get_vertiefungen_for
-import pandas as pd
+from functools import lru_cache
 
-# === Lade Excel-Regeln ===
-try:
-    RULES = load_excel_rules("zulassung.xlsx")
-except Exception as e:
-    print(f"[WARN] Excel-Regeln konnten nicht geladen werden: {e}")
-    RULES = {"Studiengänge": {}, "Allgemein": {}}
+from rules_excel import calculate_bachelor_ects, get_rules, get_vertiefungen_for
+from structured_log import get_logger
+
+log = get_logger("conversation")
 
 
 # === Fragenlogik ===
+# depends_on: alle Bedingungen müssen erfüllt sein (Vergleich ohne Groß-/Kleinschreibung).
+# options_from: Antwortmöglichkeiten kommen zur Laufzeit aus dem Regelwerk; ohne Optionen wird die Frage übersprungen.
+# match: Freitext wird per Trigramm-Index auf Namen aus dem Regelwerk abgebildet (bei Unsicherheit Rückfrage).
 questions = [
     {"key": "abschlussziel", "text": "Für welchen Abschluss interessierst du dich?", "options": ["Bachelor", "Master"]},
     {"key": "hochschulzugang", "text": "Besitzt du eine Hochschulzugangsberechtigung (z. B. Abitur, Fachabitur oder eine berufliche Qualifikation)?", "options": ["Ja", "Nein"], "depends_on": {"abschlussziel": "Bachelor"}},
     {"key": "hsbi_bachelor", "text": "Hast du deinen Bachelor an der HSBI gemacht?", "options": ["Ja", "Nein"], "depends_on": {"abschlussziel": "Master"}},
-    {"key": "bachelorstudiengang", "text": "Welchen Bachelorstudiengang hast du an der HSBI abgeschlossen?", "depends_on": {"hsbi_bachelor": "Ja"}},
+    {"key": "bachelorstudiengang", "text": "Welchen Bachelorstudiengang hast du an der HSBI abgeschlossen?", "match": "bachelor", "depends_on": {"hsbi_bachelor": "Ja"}},
     {"key": "studienart", "text": "Hast du praxisintegriert oder in Vollzeit studiert?", "options": ["praxisintegriert", "Vollzeit"], "depends_on": {"hsbi_bachelor": "Ja"}},
+    {"key": "vertiefung", "text": "Welche Vertiefung hattest du in deinem Bachelorstudium ({bachelorstudiengang})?", "options_from": "vertiefungen", "depends_on": {"abschlussziel": "Master", "hsbi_bachelor": "Ja"}},
     {"key": "bachelorstudiengang", "text": "Welchen Studiengang hast du abgeschlossen?", "depends_on": {"hsbi_bachelor": "Nein"}},
     {"key": "studiengang", "text": "Für welchen Masterstudiengang interessierst du dich?", "options": ["Angewandte Automatisierung", "Digitale Technologien", "Maschinenbau", "Wirtschaftsingenieurwesen"], "depends_on": {"abschlussziel": "Master"}},
     {"key": "abschlussnote", "text": "Welche Abschlussnote hast du in deinem Vorstudium?", "depends_on": {"abschlussziel": "Master"}},
@@ -23,92 +24,178 @@ questions = [
     {"key": "englischkenntnisse", "text": "Besitzt du Englischkenntnisse auf mindestens B2-Niveau?", "options": ["Ja", "Nein"], "depends_on": {"abschlussziel": "Master"}}
 ]
 
-
-# === Funktion zur nächsten Frage ===
-def get_next_question(state):
-    """Bestimmt dynamisch die nächste Frage."""
-
-    # 🧩 Falls gerade eine Vertiefung abgeschlossen wurde → Flag löschen
-    if state.get("_vertiefung_done"):
-        print("[INFO] Vertiefung abgeschlossen – nächste Frage wird bestimmt.")
-        state["_vertiefung_done"] = False
-
-    # 1️⃣ Abschlussziel fehlt → zuerst fragen
-    if "abschlussziel" not in state:
-        return {"key": "abschlussziel", "text": "Für welchen Abschluss interessierst du dich?", "options": ["Bachelor", "Master"]}
-
-    # 2️⃣ Wenn Bachelor → HZB prüfen
-    if state["abschlussziel"].lower() == "bachelor" and "hochschulzugang" not in state:
-        return {
-            "key": "hochschulzugang",
-            "text": "Besitzt du eine Hochschulzugangsberechtigung (z. B. Abitur, Fachabitur oder eine berufliche Qualifikation)?",
-            "options": ["Ja", "Nein"]
-        }
-
-    # 3️⃣ Wenn Masterbewerbung → ggf. Vertiefung abfragen
-    if (
-        state.get("abschlussziel", "").lower() == "master"
-        and state.get("hsbi_bachelor", "").lower() == "ja"
-        and "bachelorstudiengang" in state
-        and "studienart" in state
-        and "vertiefung" not in state
+# Schlüssel, von denen Bedingungen abhängen → bilden den Kontext für den kompilierten Graphen
+CONDITION_KEYS = tuple(sorted({key for q in questions for key in q.get("depends_on", {})}))
+# Bedingungen je Frage als Tupel von (Index in CONDITION_KEYS, erwarteter Wert in Kleinbuchstaben)
+_CONDITIONS = [
+    tuple((CONDITION_KEYS.index(key), str(val).lower()) for key, val in q.get("depends_on", {}).items())
+    for q in questions
+]
+# Werte je Bedingungs-Schlüssel, die in irgendeiner Bedingung vorkommen; alles andere zählt als ""
+_CONDITION_VALUES = [
+    frozenset(str(q["depends_on"][key]).lower() for q in questions if key in q.get("depends_on", {}))
+    for key in CONDITION_KEYS
+]
+# Index der offenen Frage im Session-Zustand
+CURSOR_KEY = "_question"
+# Gesetzt, solange zur offenen Frage bereits Vorschläge ("Meintest du …?") angeboten wurden
+SUGGESTED_KEY = "_suggested"
+
+
+def _context(state) -> tuple:
+    """
+    Antworten auf alle Bedingungs-Schlüssel (klein geschrieben) – bestimmt den Pfad durch den Graphen.
+    Unbekannte Freitexte werden zu "", damit der Cache von _compile_path nur endlich viele Kontexte sieht.
+    """
+    context = []
+    for key, known in zip(CONDITION_KEYS, _CONDITION_VALUES):
+        value = str(state.get(key, "")).lower()
+        context.append(value if value in known else "")
+    return tuple(context)
+
+
+def _applies(index: int, context: tuple) -> bool:
+    return all(context[pos] == val for pos, val in _CONDITIONS[index])
+
+
+@lru_cache(maxsize=None)
+def _compile_path(context: tuple) -> tuple:
+    """
+    Kompiliert den Pfad für einen Kontext einmalig: für jede Position die nächste
+    zutreffende Frage und die Zahl zutreffender Fragen davor. Danach sind nächste
+    Frage und Fortschritt reine Tabellenzugriffe.
+    """
+    count = len(questions)
+    next_index = [count] * (count + 1)
+    for index in range(count - 1, -1, -1):
+        next_index[index] = index if _applies(index, context) else next_index[index + 1]
+
+    done_before = [0] * (count + 1)
+    for index in range(count):
+        done_before[index + 1] = done_before[index] + (1 if _applies(index, context) else 0)
+    return next_index, done_before
+
+
+def _next_index(start: int, context: tuple) -> int:
+    """Erste Frage ab `start`, deren Bedingungen im Kontext erfüllt sind (len(questions) = keine mehr)."""
+    return _compile_path(context)[0][min(start, len(questions))]
+
+
+def _dynamic_options(question: dict, state, rules=None) -> list:
+    if question.get("options_from") == "vertiefungen":
+        return get_vertiefungen_for(state.get("bachelorstudiengang", ""), state.get("studienart"), rules=rules)
+    return question.get("options", [])
+
+
+def _advance(state, start: int, rules=None) -> int:
+    """Setzt den Zeiger auf die nächste offene Frage ab `start` und gibt ihren Index zurück."""
+    context = _context(state)
+    index = _next_index(start, context)
+    # Bereits beantwortet oder ohne Antwortmöglichkeiten (z. B. keine Vertiefungen) → überspringen
+    while index < len(questions) and (
+        questions[index]["key"] in state
+        or ("options_from" in questions[index] and not _dynamic_options(questions[index], state, rules))
     ):
-        vertiefungen = get_vertiefungen_for(state["bachelorstudiengang"], state["studienart"])
-        if vertiefungen:
-            print(f"🎯 Vertiefungsfrage wird gestellt: {vertiefungen}")
-            return {
-                "key": "vertiefung",
-                "text": f"Welche Vertiefung hattest du in deinem Bachelorstudium ({state['bachelorstudiengang']})?",
-                "options": vertiefungen
-            }
+        index = _next_index(index + 1, context)
+    state[CURSOR_KEY] = index
+    return index
 
-    # 4️⃣ Sonst: nächste unbeantwortete Frage
-    for q in questions:
-        if "depends_on" in q:
-            key, val = list(q["depends_on"].items())[0]
-            if str(state.get(key, "")).lower() != str(val).lower():
-                continue
 
-        if q["key"] not in state:
-            return q
+def _pending_index(state, rules=None) -> int:
+    # Ältere Sessions ohne Zeiger → einmalig ab Anfang bestimmen
+    if CURSOR_KEY not in state:
+        return _advance(state, 0, rules)
+    return state[CURSOR_KEY]
 
-    return None
+
+# === Funktion zur nächsten Frage ===
+def get_next_question(state, rules=None):
+    """Gibt die offene Frage zurück (O(1) über den Zeiger im Zustand) oder None, wenn alle beantwortet sind."""
+    index = _pending_index(state, rules)
+    if index >= len(questions):
+        return None
+
+    question = questions[index]
+    if "options_from" not in question:
+        return question
+
+    options = _dynamic_options(question, state, rules)
+    log.debug("vertiefungsfrage", options=options)
+    return {
+        "key": question["key"],
+        "text": question["text"].format(bachelorstudiengang=state.get("bachelorstudiengang", "")),
+        "options": options
+    }
+
+
+# === Fortschritt ===
+def get_progress(state) -> int:
+    """Fortschritt in Prozent: erledigte Fragen auf dem aktuellen Pfad (interne Felder zählen nicht)."""
+    index = state.get(CURSOR_KEY, 0)
+    if index >= len(questions):
+        return 100
+    done_before = _compile_path(_context(state))[1]
+    total = done_before[-1]
+    return int(done_before[index] / total * 100) if total else 0
 
 
 # === Funktion zum Aktualisieren des Zustands ===
-def update_state(state, user_input):
-    """Aktualisiert den Gesprächszustand basierend auf der Nutzereingabe."""
+def update_state(state, user_input, rules=None):
+    """
+    Speichert die Antwort zur offenen Frage und rückt zur nächsten Frage vor.
+    Beim Bachelorstudiengang wird nur einmal mit Vorschlägen nachgefragt: passt auch
+    die nächste Eingabe nicht eindeutig, wird sie wie bisher unverändert übernommen.
+    """
 
     if user_input.lower() in ["ok", "weiter", "next"]:
         return {"state": state}
 
-    # 🧩 Vertiefungsauswahl erkennen
-    if "vertiefung" not in state and all(k in state for k in ["bachelorstudiengang", "studienart"]):
-        vertiefungen = get_vertiefungen_for(state["bachelorstudiengang"], state["studienart"])
-        if user_input in vertiefungen:
-            state["vertiefung"] = user_input
-            state["_vertiefung_done"] = True
-            print(f"[STATE-UPDATE] Vertiefung gesetzt: {user_input}")
-
-            # ECTS-Berechnung
-            try:
-                ects_data = calculate_bachelor_ects(state["bachelorstudiengang"], state["studienart"], user_input)
-                if ects_data:
-                    state["ects_ist"] = ects_data
-                    print(f"[ECTS-Berechnung erfolgreich]: {ects_data}")
-            except Exception as e:
-                print(f"[Fehler bei ECTS-Berechnung]: {e}")
-
-            return {"state": state}
-
-    # 🔹 Normale Fragenabarbeitung
-    for q in questions:
-        if "depends_on" in q:
-            key, val = list(q["depends_on"].items())[0]
-            if str(state.get(key, "")).lower() != str(val).lower():
-                continue
-        if q["key"] not in state:
-            state[q["key"]] = user_input
-            return {"state": state}
+    index = _pending_index(state, rules)
+    if index >= len(questions):
+        return {"state": state}
 
+    question = questions[index]
+    key = question["key"]
+
+    # 🧩 Bachelorstudiengang: Tippfehler auf den Namen aus dem Regelwerk abbilden
+    if question.get("match") == "bachelor":
+        resolved = (rules if rules is not None else get_rules()).match_bachelor(user_input)
+        if resolved["match"] is None and resolved["suggestions"] and SUGGESTED_KEY not in state:
+            state[SUGGESTED_KEY] = True
+            return _did_you_mean(state, "Meintest du einen dieser Studiengänge?", resolved["suggestions"])
+        # Unbekannte bzw. nach der Rückfrage weiter unklare Studiengänge werden unverändert übernommen
+        user_input = resolved["match"] or user_input
+
+    # 🧩 Vertiefung nur aus den angebotenen Optionen übernehmen, sonst Rückfrage bzw. Frage erneut stellen
+    if key == "vertiefung":
+        if user_input not in _dynamic_options(question, state, rules):
+            resolved = (rules if rules is not None else get_rules()).match_vertiefung(
+                user_input, state["bachelorstudiengang"], state.get("studienart")
+            )
+            if resolved["match"] is None:
+                if resolved["suggestions"]:
+                    return _did_you_mean(state, "Meintest du eine dieser Vertiefungen?", resolved["suggestions"])
+                return {"state": state}
+            user_input = resolved["match"]
+        state["vertiefung"] = user_input
+        log.debug("vertiefung_gesetzt", vertiefung=user_input)
+
+        # ECTS-Berechnung
+        try:
+            ects_data = calculate_bachelor_ects(state["bachelorstudiengang"], state["studienart"], user_input, rules=rules)
+            if ects_data:
+                state["ects_ist"] = ects_data
+        except Exception as e:
+            log.error("ects_fehler", vertiefung=user_input, error=str(e))
+    else:
+        state[key] = user_input
+
+    state.pop(SUGGESTED_KEY, None)
+    _advance(state, index + 1, rules)
     return {"state": state}
+
+
+def _did_you_mean(state, text: str, suggestions: list) -> dict:
+    """Rückfrage mit Vorschlägen; die offene Frage bleibt bestehen."""
+    log.debug("unsichere_eingabe", suggestions=suggestions)
+    return {"state": state, "next_question": text, "options": suggestions}
@@ -0,0 +1,192 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Felder, die in den Prompt einfließen und damit die Entscheidung bestimmen
+PROFILE_FIELDS = [
+    "abschlussziel", "hochschulzugang", "hsbi_bachelor", "bachelorstudiengang", "studienart",
+    "vertiefung", "studiengang", "abschlussnote", "berufserfahrung", "englischkenntnisse"
+]
+
+DECISION_CACHE_ENABLED = os.getenv("DECISION_CACHE_ENABLED", "1") == "1"
+DECISION_CACHE_SIZE = int(os.getenv("DECISION_CACHE_SIZE", "10000"))
+DECISION_CACHE_TTL = float(os.getenv("DECISION_CACHE_TTL", str(24 * 3600)))
+# Optional: SQLite-Datei, damit der Cache Neustarts übersteht (leer = nur im Speicher)
+DECISION_CACHE_DB = os.getenv("DECISION_CACHE_DB", "")
+# Abstand zwischen zwei Aufräumläufen abgelaufener Einträge in SQLite (Sekunden, pro Prozess)
+DECISION_CACHE_SWEEP_INTERVAL = float(os.getenv("DECISION_CACHE_SWEEP_INTERVAL", "300"))
+
+
+def _normalize_value(value) -> str:
+    """Vereinheitlicht Antworten: Leerzeichen, Groß-/Kleinschreibung, Dezimalkomma."""
+    text = re.sub(r"\s+", " ", str(value or "")).strip().lower()
+    if re.fullmatch(r"\d+,\d+", text):
+        text = text.replace(",", ".")
+    return text
+
+
+def profile_key(applicant_data: dict, rules_version: str = None) -> str:
+    """Kanonischer Hash aus normalisierten Bewerberfeldern und Regelwerk-Version."""
+    profile = {field: _normalize_value(applicant_data.get(field)) for field in PROFILE_FIELDS}
+    payload = json.dumps({"rules": rules_version or "-", "profile": profile}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DecisionCache:
+    """
+    Größenbegrenzter LRU-Cache mit TTL für GPT-Entscheidungen.
+    Optional werden Einträge zusätzlich in einer lokalen SQLite-Datei abgelegt;
+    Dateizugriffe laufen nie unter dem Speicher-Lock, async Aufrufer nutzen
+    get_async/set_async (Worker-Thread). Abgelaufene Zeilen werden nur alle
+    `sweep_interval` Sekunden gelöscht.
+    Zählt Treffer/Fehlschläge sowie eingesparte Latenz und Tokens.
+    """
+
+    def __init__(
+        self, max_size=DECISION_CACHE_SIZE, ttl=DECISION_CACHE_TTL, db_path=DECISION_CACHE_DB,
+        enabled=DECISION_CACHE_ENABLED, sweep_interval=DECISION_CACHE_SWEEP_INTERVAL
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.enabled = enabled
+        self.sweep_interval = sweep_interval
+        self.db_path = db_path if enabled and db_path else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._next_sweep = 0.0
+        self._sweep_lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0
+        self.saved_tokens = 0
+
+        self.swept = 0
+
+        if self.db_path is not None:
+            conn = self._connection()
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS decisions ("
+                "key TEXT PRIMARY KEY, result TEXT, latency REAL, tokens INTEGER, created REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_decisions_created ON decisions (created)")
+
+    def _connection(self):
+        # Eine Verbindung pro Thread (sqlite3-Verbindungen sind nicht thread-sicher)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str):
+        """Liefert eine Kopie des gecachten Ergebnisses oder None."""
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+        # Nur bei Fehlschlag im Speicher die Datei fragen – außerhalb des Locks
+        if entry is None and self.db_path is not None:
+            entry = self._load_from_db(key)
+
+        with self._lock:
+            if entry is not None and key not in self._entries:
+                self._store(key, entry)
+            if entry is None or now - entry["created"] > self.ttl:
+                if entry is not None:
+                    self._entries.pop(key, None)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_seconds += entry["latency"]
+            self.saved_tokens += entry["tokens"]
+            return dict(entry["result"])
+
+    def set(self, key: str, result: dict, latency: float = 0.0, tokens: int = 0):
+        if not self.enabled:
+            return
+
+        entry = {"result": dict(result), "latency": latency, "tokens": tokens, "created": time.time()}
+        with self._lock:
+            self._store(key, entry)
+        if self.db_path is not None:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO decisions (key, result, latency, tokens, created) VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(entry["result"], ensure_ascii=False), latency, tokens, entry["created"])
+            )
+            self._maybe_sweep(entry["created"])
+
+    async def get_async(self, key: str):
+        """Wie get(); muss die SQLite-Datei gefragt werden, geschieht das in einem Worker-Thread."""
+        if self.db_path is None or key in self._entries:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def set_async(self, key: str, result: dict, latency: float = 0.0, tokens: int = 0):
+        """Wie set(); der Schreibzugriff auf die SQLite-Datei läuft in einem Worker-Thread."""
+        if self.db_path is None:
+            self.set(key, result, latency=latency, tokens=tokens)
+            return
+        await asyncio.to_thread(self.set, key, result, latency, tokens)
+
+    def sweep(self, now=None) -> int:
+        """Löscht abgelaufene Einträge aus der SQLite-Datei."""
+        now = time.time() if now is None else now
+        deleted = self._connection().execute("DELETE FROM decisions WHERE created < ?", (now - self.ttl,)).rowcount
+        self.swept += deleted
+        return deleted
+
+    def _maybe_sweep(self, now):
+        if now < self._next_sweep or not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_sweep = now + self.sweep_interval
+            self.sweep(now)
+        finally:
+            self._sweep_lock.release()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "persistent": self.db_path is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups * 100, 2) if lookups else 0,
+            "evictions": self.evictions,
+            "saved_seconds": round(self.saved_seconds, 3),
+            "saved_tokens": self.saved_tokens
+        }
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _load_from_db(self, key):
+        row = self._connection().execute(
+            "SELECT result, latency, tokens, created FROM decisions WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"result": json.loads(row[0]), "latency": row[1], "tokens": row[2], "created": row[3]}
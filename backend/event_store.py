@@ -0,0 +1,205 @@
+"""
+SQLite-Ablage für Chat-Interaktionen als Alternative zu chatbot_log.csv.
+Reports werden per SQL nur über das angefragte Zeitfenster berechnet.
+
+Einmaliger Import bestehender CSV-Logs (aus dem backend-Ordner):
+    python event_store.py import chatbot_log.csv
+"""
+import argparse
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from logging_handler import LOG_HEADER, read_log_rows
+from structured_log import get_logger
+
+LOG_DB = os.getenv("LOG_DB", "chatbot_log.db")
+
+log = get_logger("event_store")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    user_id TEXT,
+    abschlussziel TEXT,
+    studiengang TEXT,
+    nutzerkategorie TEXT,
+    entscheidung TEXT,
+    status TEXT,
+    progress INTEGER,
+    rules_version TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events (timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_user ON events (user_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_status ON events (status, timestamp);
+"""
+
+INSERT_SQL = f"INSERT INTO events ({', '.join(LOG_HEADER)}) VALUES ({', '.join('?' * len(LOG_HEADER))})"
+
+
+class EventStore:
+    """Interaktions-Events in SQLite (WAL), eine Verbindung pro Thread."""
+
+    def __init__(self, path=LOG_DB):
+        self.path = path
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def append(self, rows):
+        """Schreibt Zeilen (Spalten wie LOG_HEADER) in einer Transaktion."""
+        conn = self._connection()
+        with conn:
+            conn.executemany(INSERT_SQL, rows)
+
+    def rows(self):
+        """Alle Events in Schreibreihenfolge (Spalten wie LOG_HEADER)."""
+        return self._connection().execute(f"SELECT {', '.join(LOG_HEADER)} FROM events ORDER BY id")
+
+    def rows_after(self, last_id: int):
+        """Events mit id > last_id in Schreibreihenfolge als (id, *LOG_HEADER-Spalten)."""
+        return self._connection().execute(
+            f"SELECT id, {', '.join(LOG_HEADER)} FROM events WHERE id > ? ORDER BY id", (last_id,)
+        ).fetchall()
+
+    def max_id(self) -> int:
+        return self._connection().execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+
+    def count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    def report(self, days: int = 30) -> dict:
+        """Dashboard-Kennzahlen wie generate_report, berechnet nur über die letzten `days` Tage."""
+        conn = self._connection()
+        cutoff = (datetime.now() - timedelta(days=days)).isoformat()
+
+        total_users = conn.execute(
+            "SELECT COUNT(DISTINCT user_id) FROM events WHERE timestamp >= ?", (cutoff,)
+        ).fetchone()[0]
+
+        if total_users == 0:
+            log.info("report_keine_daten", days=days, backend="sqlite")
+            return empty_report(days)
+
+        completed_users = conn.execute(
+            "SELECT COUNT(DISTINCT user_id) FROM events "
+            "WHERE timestamp >= ? AND status = 'abgeschlossen' AND lower(entscheidung) IN ('ja', 'unklar')",
+            (cutoff,)
+        ).fetchone()[0]
+        dropped_users = total_users - completed_users
+        dropout_rate = round((dropped_users / total_users * 100), 2) if total_users > 0 else 0
+
+        # Letzter Eintrag je Nutzer im Zeitfenster → nur abgeschlossene Master-Sessions zählen
+        top_programs = [
+            [studiengang, count] for studiengang, count in conn.execute(
+                """
+                WITH last AS (
+                    SELECT abschlussziel, trim(studiengang) AS studiengang, status, timestamp,
+                           ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY timestamp DESC, id DESC) AS rn
+                    FROM events WHERE timestamp >= ?
+                )
+                SELECT studiengang, COUNT(*) AS n FROM last
+                WHERE rn = 1
+                  AND lower(trim(status)) = 'abgeschlossen'
+                  AND instr(lower(abschlussziel), 'master') > 0
+                  AND studiengang != 'Unbekannt'
+                GROUP BY studiengang
+                ORDER BY n DESC, MIN(timestamp)
+                LIMIT 5
+                """,
+                (cutoff,)
+            )
+        ]
+
+        nutzertypen = dict(conn.execute(
+            """
+            SELECT trim(nutzerkategorie) AS kategorie, COUNT(*) AS n FROM events
+            WHERE timestamp >= ? AND trim(nutzerkategorie) != 'Unbekannt'
+            GROUP BY kategorie
+            ORDER BY n DESC, MIN(id)
+            """,
+            (cutoff,)
+        ).fetchall())
+
+        log.debug(
+            "report_berechnet", total_users=int(total_users), completed=int(completed_users),
+            dropped=int(dropped_users), dropout_rate=dropout_rate, days=days, backend="sqlite"
+        )
+
+        return {
+            "period_days": days,
+            "total_users": int(total_users),
+            "completed": int(completed_users),
+            "dropped": int(dropped_users),
+            "dropout_rate": dropout_rate,
+            "beliebteste_studiengänge": top_programs,
+            "nutzertypen": nutzertypen
+        }
+
+    def import_csv(self, csv_path: str) -> int:
+        """Importiert eine bestehende CSV-Logdatei (mit Headerzeile). Gibt die Anzahl Zeilen zurück."""
+        rows = []
+        with open(csv_path, mode="r", newline="", encoding="utf-8-sig") as f:
+            for row in read_log_rows(f):
+                if not row[0]:
+                    continue
+                try:
+                    row[LOG_HEADER.index("progress")] = int(float(row[LOG_HEADER.index("progress")]))
+                except (TypeError, ValueError):
+                    pass
+                rows.append(row)
+        self.append(rows)
+        return len(rows)
+
+
+def empty_report(days: int) -> dict:
+    return {
+        "period_days": days,
+        "total_users": 0,
+        "completed": 0,
+        "dropped": 0,
+        "dropout_rate": 0,
+        "beliebteste_studiengänge": [],
+        "nutzertypen": {}
+    }
+
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_event_store() -> EventStore:
+    """Prozessweite EventStore-Instanz für LOG_DB."""
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = EventStore()
+        return _STORE
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SQLite-Eventstore für Chat-Interaktionen")
+    sub = parser.add_subparsers(dest="command", required=True)
+    import_cmd = sub.add_parser("import", help="CSV-Log einmalig nach SQLite übernehmen")
+    import_cmd.add_argument("csv_path", nargs="?", default="chatbot_log.csv")
+    import_cmd.add_argument("--db", default=LOG_DB)
+    import_cmd.add_argument("--force", action="store_true", help="auch importieren, wenn bereits Events vorhanden sind")
+    args = parser.parse_args()
+
+    store = EventStore(args.db)
+    if store.count() and not args.force:
+        print(f"[Import] ⚠️ {args.db} enthält bereits {store.count()} Events – Abbruch (--force zum Erzwingen)")
+        raise SystemExit(1)
+    imported = store.import_csv(args.csv_path)
+    print(f"[Import] ✅ {imported} Zeilen aus {args.csv_path} nach {args.db} übernommen")
@@ -0,0 +1,88 @@
+import os
+import re
+from collections import defaultdict
+
+# Ab diesem Ähnlichkeitswert (0–1) wird eine Eingabe direkt übernommen
+FUZZY_ACCEPT_SCORE = float(os.getenv("FUZZY_ACCEPT_SCORE", "0.75"))
+# Ab diesem Wert werden Namen als "Meintest du …?"-Vorschlag angeboten
+FUZZY_SUGGEST_SCORE = float(os.getenv("FUZZY_SUGGEST_SCORE", "0.3"))
+FUZZY_MAX_SUGGESTIONS = 3
+
+_UMLAUTE = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+
+
+def normalize_name(text) -> str:
+    """Kleinschreibung, Umlaute ausgeschrieben, Satzzeichen/Mehrfach-Leerzeichen entfernt."""
+    text = str(text or "").lower().translate(_UMLAUTE)
+    return re.sub(r"[^a-z0-9]+", " ", text).strip()
+
+
+def trigrams(normalized: str) -> set:
+    """Zeichen-Trigramme mit Wortgrenzen-Padding ("  mb", " mbx", …)."""
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """
+    Vorberechneter Trigramm-Index über kanonische Namen (Studiengänge, Vertiefungen).
+    Eine Suche zählt gemeinsame Trigramme über die invertierte Liste und bewertet
+    Kandidaten mit dem Dice-Koeffizienten – ohne LLM und ohne Vergleich gegen alle Namen.
+    """
+
+    def __init__(self, names):
+        self.names = []
+        self._grams = []
+        self._exact = {}
+        self._postings = defaultdict(list)
+
+        for name in names:
+            normalized = normalize_name(name)
+            if not normalized or normalized in self._exact:
+                continue
+            self._exact[normalized] = name
+            position = len(self.names)
+            self.names.append(name)
+            grams = trigrams(normalized)
+            self._grams.append(len(grams))
+            for gram in grams:
+                self._postings[gram].append(position)
+        self._postings = dict(self._postings)
+
+    def search(self, text: str, allowed=None) -> list:
+        """Kandidaten als (Name, Score) absteigend sortiert; optional nur Namen aus `allowed`."""
+        normalized = normalize_name(text)
+        if not normalized:
+            return []
+        exact = self._exact.get(normalized)
+        if exact is not None and (allowed is None or exact in allowed):
+            return [(exact, 1.0)]
+
+        grams = trigrams(normalized)
+        overlap = defaultdict(int)
+        for gram in grams:
+            for position in self._postings.get(gram, ()):
+                overlap[position] += 1
+
+        scored = [
+            (self.names[position], 2 * common / (len(grams) + self._grams[position]))
+            for position, common in overlap.items()
+            if allowed is None or self.names[position] in allowed
+        ]
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return scored
+
+    def resolve(self, text: str, allowed=None) -> dict:
+        """
+        Ordnet eine Freitext-Eingabe einem kanonischen Namen zu.
+        Ergebnis: {"match": Name oder None, "score": 0–1, "suggestions": [Namen]}.
+        """
+        candidates = self.search(text, allowed)
+        if candidates and candidates[0][1] >= FUZZY_ACCEPT_SCORE:
+            return {"match": candidates[0][0], "score": round(candidates[0][1], 3), "suggestions": []}
+        suggestions = [name for name, score in candidates[:FUZZY_MAX_SUGGESTIONS] if score >= FUZZY_SUGGEST_SCORE]
+        return {
+            "match": None,
+            "score": round(candidates[0][1], 3) if candidates else 0.0,
+            "suggestions": suggestions
+        }
@@ -0,0 +1,108 @@
+"""
+Tagespartitionierte Logdateien: jede Interaktion landet in logs/chatbot_log-YYYY-MM-DD.csv.
+Reports öffnen nur die Partitionen, die das angefragte Zeitfenster überlappen.
+
+Befehle (aus dem backend-Ordner):
+    python log_partitions.py migrate chatbot_log.csv   # bestehendes Log auf Tagesdateien aufteilen
+    python log_partitions.py retention                 # Aufbewahrungsregel sofort anwenden
+"""
+import argparse
+import gzip
+import os
+import re
+import shutil
+from datetime import datetime, timedelta
+
+from structured_log import get_logger
+
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+# Partitionen älter als X Tage werden archiviert bzw. gelöscht (0 = alles behalten)
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "0"))
+# "archive" (gzip nach logs/archive/) oder "delete"
+LOG_RETENTION_ACTION = os.getenv("LOG_RETENTION_ACTION", "archive").strip().lower()
+
+PARTITION_PATTERN = re.compile(r"^chatbot_log-(\d{4}-\d{2}-\d{2})\.csv$")
+
+log = get_logger("log_partitions")
+
+
+def partition_path(day: str, log_dir=LOG_DIR) -> str:
+    return os.path.join(log_dir, f"chatbot_log-{day}.csv")
+
+
+def list_partitions(log_dir=LOG_DIR, since_day: str = None) -> list:
+    """Vorhandene Partitionen als (Tag, Pfad), aufsteigend; optional erst ab `since_day`."""
+    if not os.path.isdir(log_dir):
+        return []
+    partitions = []
+    for name in os.listdir(log_dir):
+        match = PARTITION_PATTERN.match(name)
+        if match and (since_day is None or match.group(1) >= since_day):
+            partitions.append((match.group(1), os.path.join(log_dir, name)))
+    return sorted(partitions)
+
+
+def rows_by_day(rows) -> dict:
+    """Gruppiert Logzeilen nach dem Tag ihres Zeitstempels (erste Spalte, ISO-Format)."""
+    groups = {}
+    for row in rows:
+        groups.setdefault(str(row[0])[:10], []).append(row)
+    return groups
+
+
+def apply_retention(log_dir=LOG_DIR, retention_days=LOG_RETENTION_DAYS, action=LOG_RETENTION_ACTION) -> list:
+    """Archiviert bzw. löscht Partitionen außerhalb der Aufbewahrungsfrist. Gibt die betroffenen Tage zurück."""
+    if retention_days <= 0:
+        return []
+    cutoff = (datetime.now() - timedelta(days=retention_days)).date().isoformat()
+    expired = [(day, path) for day, path in list_partitions(log_dir) if day < cutoff]
+
+    for day, path in expired:
+        if action == "archive":
+            archive_dir = os.path.join(log_dir, "archive")
+            os.makedirs(archive_dir, exist_ok=True)
+            with open(path, "rb") as src, gzip.open(os.path.join(archive_dir, os.path.basename(path) + ".gz"), "wb") as dst:
+                shutil.copyfileobj(src, dst)
+        os.remove(path)
+
+    if expired:
+        log.info("partitionen_aufbewahrung", partitions=len(expired), before=cutoff, action=action)
+    return [day for day, _ in expired]
+
+
+def migrate(csv_path: str, log_dir=LOG_DIR) -> int:
+    """Teilt ein bestehendes (ggf. älteres) Einzel-Log auf Tagespartitionen auf."""
+    from logging_handler import _append_rows, read_log_rows
+
+    os.makedirs(log_dir, exist_ok=True)
+    with open(csv_path, mode="r", newline="", encoding="utf-8-sig") as f:
+        # Ältere Logs ohne rules_version → Spalte bleibt leer
+        rows = [row for row in read_log_rows(f) if row[0]]
+
+    for day, group in rows_by_day(rows).items():
+        _append_rows(group, partition_path(day, log_dir))
+    return len(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tagespartitionierte Chat-Logs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate_cmd = sub.add_parser("migrate", help="Einzel-Log auf Tagesdateien aufteilen")
+    migrate_cmd.add_argument("csv_path", nargs="?", default="chatbot_log.csv")
+    migrate_cmd.add_argument("--log-dir", default=LOG_DIR)
+    retention_cmd = sub.add_parser("retention", help="Aufbewahrungsregel anwenden")
+    retention_cmd.add_argument("--log-dir", default=LOG_DIR)
+    retention_cmd.add_argument("--days", type=int, default=LOG_RETENTION_DAYS)
+    retention_cmd.add_argument("--action", choices=["archive", "delete"], default=LOG_RETENTION_ACTION)
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        if list_partitions(args.log_dir):
+            print(f"[Migration] ⚠️ {args.log_dir} enthält bereits Partitionen – Zeilen werden angehängt")
+        migrated = migrate(args.csv_path, args.log_dir)
+        print(f"[Migration] ✅ {migrated} Zeilen aus {args.csv_path} nach {args.log_dir}/ aufgeteilt")
+        print("[Migration] Danach LOG_BACKEND=partitioned setzen; die alte Datei kann archiviert werden.")
+    else:
+        removed = apply_retention(args.log_dir, args.days, args.action)
+        verb = "archiviert" if args.action == "archive" else "gelöscht"
+        print(f"[Log] {len(removed)} Partition(en) {verb}")
@@ -0,0 +1,147 @@
+import csv
+import io
+import os
+import threading
+
+
+class CsvLogTail:
+    """
+    Folgt einer CSV-Logdatei wie `tail -f`: merkt sich den Byte-Offset und
+    parst bei jedem `poll()` nur neu angehängte, vollständige Zeilen.
+    Wird die Datei gekürzt oder ersetzt (Rotation, Header-Migration), wird
+    `on_reset` aufgerufen und die Datei von vorne gelesen.
+    """
+
+    def __init__(self, path, on_rows, on_reset):
+        self.path = path
+        self.on_rows = on_rows
+        self.on_reset = on_reset
+        self._offset = 0
+        self._file_id = None
+        self._lock = threading.Lock()
+
+        self.bytes_read = 0
+        self.resets = 0
+
+    def poll(self) -> int:
+        """Liest neue Zeilen ein und gibt deren Anzahl zurück."""
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                # Datei (noch) nicht vorhanden → leerer Zustand
+                if self._file_id is not None or self.resets == 0:
+                    self._restart(None)
+                return 0
+
+            file_id = (stat.st_dev, stat.st_ino)
+            if file_id != self._file_id or stat.st_size < self._offset:
+                self._restart(file_id)
+            if stat.st_size == self._offset:
+                return 0
+
+            with open(self.path, mode="rb") as f:
+                f.seek(self._offset)
+                chunk = f.read(stat.st_size - self._offset)
+
+            # Nur vollständige Zeilen verarbeiten, angefangene Zeile beim nächsten Mal
+            end = chunk.rfind(b"\n") + 1
+            if end == 0:
+                return 0
+            start_offset = self._offset
+            self._offset += end
+            self.bytes_read += end
+
+            text = chunk[:end].decode("utf-8-sig" if start_offset == 0 else "utf-8", errors="replace")
+            rows = list(csv.reader(io.StringIO(text)))
+            if start_offset == 0 and rows and rows[0] and rows[0][0] == "timestamp":
+                rows = rows[1:]
+            if rows:
+                self.on_rows(rows)
+            return len(rows)
+
+    def _restart(self, file_id):
+        self._file_id = file_id
+        self._offset = 0
+        self.resets += 1
+        self.on_reset()
+
+
+class PartitionedLogTail:
+    """
+    Folgt allen Tagespartitionen, die `list_partitions()` liefert, mit je einem
+    CsvLogTail. Wegfallende Partitionen (Aufbewahrungsregel) werden nur
+    vergessen; wird eine Partition gekürzt oder ersetzt, startet alles neu.
+    """
+
+    def __init__(self, list_partitions, on_rows, on_reset):
+        self.list_partitions = list_partitions
+        self.on_rows = on_rows
+        self.on_reset = on_reset
+        self._tails = {}
+        self._needs_reset = True
+        self._lock = threading.Lock()
+
+    def poll(self) -> int:
+        with self._lock:
+            total = self._poll_all()
+            if self._needs_reset:
+                total = self._poll_all()
+            return total
+
+    def _poll_all(self) -> int:
+        if self._needs_reset:
+            self._tails = {}
+            self._needs_reset = False
+            self.on_reset()
+
+        paths = [path for _, path in self.list_partitions()]
+        for path in [path for path in self._tails if path not in paths]:
+            del self._tails[path]
+
+        total = 0
+        for path in paths:
+            tail = self._tails.get(path)
+            if tail is None:
+                tail = self._tails[path] = CsvLogTail(path, self.on_rows, on_reset=lambda p=path: self._partition_reset(p))
+            total += tail.poll()
+        return total
+
+    def _partition_reset(self, path):
+        # Der erste Start einer Partition ist kein Reset
+        if self._tails[path].resets > 1:
+            self._needs_reset = True
+
+
+class EventStoreTail:
+    """
+    Folgt der SQLite-Eventtabelle über die höchste bereits gelesene id, damit
+    auch Zeilen anderer Worker in die Report-Kennzahlen einfließen.
+    `fetch_after(id)` liefert (id, *LOG_HEADER-Spalten) in id-Reihenfolge,
+    `max_id()` die aktuell höchste id. Sinkt sie (Datenbank ersetzt), wird
+    `on_reset` aufgerufen und von vorne gelesen.
+    """
+
+    def __init__(self, fetch_after, max_id, on_rows, on_reset):
+        self.fetch_after = fetch_after
+        self.max_id = max_id
+        self.on_rows = on_rows
+        self.on_reset = on_reset
+        self._last_id = None
+        self._lock = threading.Lock()
+
+        self.resets = 0
+
+    def poll(self) -> int:
+        """Liest neue Events ein und gibt deren Anzahl zurück."""
+        with self._lock:
+            if self._last_id is None or self.max_id() < self._last_id:
+                self._last_id = 0
+                self.resets += 1
+                self.on_reset()
+            rows = [list(row) for row in self.fetch_after(self._last_id)]
+            if not rows:
+                return 0
+            self._last_id = rows[-1][0]
+            self.on_rows([row[1:] for row in rows])
+            return len(rows)
@@ -1,31 +1,291 @@
+import atexit
 import csv
+import io
 import os
-import pandas as pd
+import queue
+import threading
+import time
 from datetime import datetime, timedelta
 from collections import Counter
 
-LOG_FILE = "chatbot_log.csv"
+from log_partitions import LOG_DIR, apply_retention, list_partitions, partition_path, rows_by_day
+from log_tail import CsvLogTail, EventStoreTail, PartitionedLogTail
+from metrics import LOG_ROWS, span
+from report_aggregates import ReportAggregates
+from structured_log import get_logger
 
-# 🔹 Sicherstellen, dass Logdatei existiert
-if not os.path.exists(LOG_FILE):
-    with open(LOG_FILE, mode="w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["timestamp", "user_id", "abschlussziel", "studiengang", "entscheidung"])
+LOG_FILE = os.getenv("LOG_FILE", "chatbot_log.csv")
+# "csv" (chatbot_log.csv), "partitioned" (Tagesdateien, siehe log_partitions.py)
+# oder "sqlite" (indizierter Eventstore, siehe event_store.py)
+LOG_BACKEND = os.getenv("LOG_BACKEND", "csv").strip().lower()
+LOG_HEADER = ["timestamp", "user_id", "abschlussziel", "studiengang", "nutzerkategorie", "entscheidung", "status", "progress", "rules_version"]
+
+# Hintergrund-Schreiber: Einträge werden gesammelt und gebündelt angehängt
+LOG_ASYNC = os.getenv("LOG_ASYNC", "1") == "1"
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "100"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "0.5"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Reports aus laufend gepflegten Tages-Buckets statt aus dem kompletten Log
+REPORT_INCREMENTAL = os.getenv("REPORT_INCREMENTAL", "1") == "1"
+
+log = get_logger("logging_handler")
+
+
+def read_log_rows(f):
+    """
+    Zeilen einer CSV-Logdatei in der Spaltenreihenfolge von LOG_HEADER (Headerzeile übersprungen).
+    Ältere Logs haben einen Header ohne rules_version; ihre kürzeren Zeilen werden aufgefüllt,
+    neu angehängte Zeilen mit allen Spalten bleiben vollständig – eine Migration ist nicht nötig.
+    """
+    width = len(LOG_HEADER)
+    for row in csv.reader(f):
+        if not row or row[0] == "timestamp":
+            continue
+        yield row[:width] + [""] * (width - len(row))
+
+
+def migrate_log_header(path=LOG_FILE) -> bool:
+    """
+    Ergänzt fehlende Spalten (z. B. rules_version) in der Headerzeile einer bestehenden Logdatei.
+    Einmaliger Schritt bei gestoppter App (Zeilen, die währenddessen angehängt werden, gingen verloren):
+        python logging_handler.py migrate-header
+    Gibt True zurück, wenn die Datei umgeschrieben wurde.
+    """
+    with open(path, mode="r", newline="", encoding="utf-8-sig") as f:
+        header = next(csv.reader(f), [])
+        if header == LOG_HEADER:
+            return False
+        rest = f.read()
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, mode="w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerow(LOG_HEADER)
+        f.write(rest)
+    os.replace(tmp_path, path)
+    return True
+
+
+def _append_rows(rows, path=LOG_FILE):
+    """
+    Hängt mehrere Zeilen mit einem einzigen write() an (O_APPEND), damit sich
+    Zeilen paralleler Worker nicht ineinander schieben.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if not os.path.isfile(path):
+        writer.writerow(LOG_HEADER)
+    writer.writerows(rows)
+
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, buffer.getvalue().encode("utf-8"))
+    finally:
+        os.close(fd)
+
+
+_WRITE_LOCK = threading.Lock()
+report_aggregates = ReportAggregates()
+
+
+def _write_rows(rows, path=LOG_FILE):
+    """Schreibt Zeilen in das konfigurierte Log-Backend."""
+    with _WRITE_LOCK, span("log_write"):
+        if LOG_BACKEND == "sqlite":
+            from event_store import get_event_store
+            # Report-Kennzahlen kommen über log_tail (auch Zeilen anderer Worker)
+            get_event_store().append(rows)
+        elif LOG_BACKEND == "partitioned":
+            os.makedirs(LOG_DIR, exist_ok=True)
+            for day, group in rows_by_day(rows).items():
+                _append_rows(group, partition_path(day))
+            _apply_retention_daily()
+        else:
+            # CSV: Report-Kennzahlen kommen über log_tail (auch Zeilen anderer Worker)
+            _append_rows(rows, path)
+    LOG_ROWS.inc(len(rows))
+
+
+_retention_day = None
+
+
+def _apply_retention_daily():
+    """Wendet die Aufbewahrungsregel höchstens einmal pro Tag an."""
+    global _retention_day
+    today = datetime.now().date()
+    if today != _retention_day:
+        _retention_day = today
+        try:
+            apply_retention()
+        except OSError as e:
+            log.warning("aufbewahrung_fehlgeschlagen", error=str(e))
+
+
+def _report_partitions(days: int) -> list:
+    """Partitionen, die die letzten `days` Tage überlappen."""
+    return list_partitions(LOG_DIR, since_day=(datetime.now() - timedelta(days=days)).date().isoformat())
+
+
+def _event_store():
+    from event_store import get_event_store
+    return get_event_store()
+
+
+# Bei jedem Report nur die seit dem letzten Mal hinzugekommenen Zeilen lesen (Bytes bzw. Event-ids)
+if LOG_BACKEND == "sqlite":
+    log_tail = EventStoreTail(
+        lambda last_id: _event_store().rows_after(last_id),
+        lambda: _event_store().max_id(),
+        on_rows=report_aggregates.add_rows,
+        on_reset=lambda: report_aggregates.rebuild([])
+    )
+elif LOG_BACKEND == "partitioned":
+    log_tail = PartitionedLogTail(
+        lambda: _report_partitions(report_aggregates.max_days),
+        on_rows=report_aggregates.add_rows,
+        on_reset=lambda: report_aggregates.rebuild([])
+    )
+else:
+    log_tail = CsvLogTail(
+        LOG_FILE,
+        on_rows=report_aggregates.add_rows,
+        on_reset=lambda: report_aggregates.rebuild([])
+    )
+
+
+def rebuild_report_aggregates():
+    """
+    Baut die Report-Kennzahlen aus dem Log auf (beim Start bzw. ersten Report).
+    Danach werden nur neu hinzugekommene Zeilen nachgelesen – auch die anderer Worker.
+    """
+    log_writer.flush()
+    log_tail.poll()
+
+
+_STOP = object()
+
+
+class BatchLogWriter:
+    """
+    Schreibt Log-Einträge in einem Hintergrund-Thread. Ein Batch wird geschrieben,
+    sobald `batch_size` Einträge vorliegen oder `flush_interval` Sekunden seit dem
+    ersten Eintrag vergangen sind (Group Commit). Ist die Queue voll, schreibt der
+    Aufrufer seinen Eintrag selbst (Backpressure statt Datenverlust).
+    """
+
+    def __init__(self, path=LOG_FILE, batch_size=LOG_BATCH_SIZE, flush_interval=LOG_FLUSH_INTERVAL, queue_size=LOG_QUEUE_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+        self.written = 0
+        self.batches = 0
+        self.backpressure = 0
+
+    def write(self, entry: list):
+        # Prüfen und Einreihen unter demselben Lock wie stop() → nach _STOP landet nichts mehr in der Queue
+        with self._lock:
+            if not self._closed:
+                self._ensure_started()
+                try:
+                    self._queue.put_nowait(entry)
+                    return
+                except queue.Full:
+                    self.backpressure += 1
+        self._write_batch([entry])
+
+    def flush(self):
+        """Wartet, bis alle bisher eingereihten Einträge geschrieben sind."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def stop(self):
+        """Schreibt verbleibende Einträge und beendet den Hintergrund-Thread."""
+        with self._lock:
+            self._closed = True
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+        # Was trotzdem noch in der Queue liegt, direkt schreiben
+        rest = []
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._queue.task_done()
+            if entry is not _STOP:
+                rest.append(entry)
+        if rest:
+            self._write_batch(rest)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "backpressure": self.backpressure
+        }
+
+    def _ensure_started(self):
+        # Aufruf nur unter self._lock
+        if self._thread is None and not self._closed:
+            self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+            self._thread.start()
+
+    def _write_batch(self, rows):
+        try:
+            _write_rows(rows, self.path)
+            self.written += len(rows)
+            self.batches += 1
+        except Exception as e:
+            log.error("log_schreiben_fehlgeschlagen", rows=len(rows), error=str(e))
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = None
+            while len(batch) < self.batch_size:
+                timeout = None if deadline is None else deadline - time.monotonic()
+                if timeout is not None and timeout <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    self._queue.task_done()
+                    break
+                batch.append(entry)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if batch:
+                self._write_batch(batch)
+                for _ in batch:
+                    self._queue.task_done()
+
+
+log_writer = BatchLogWriter()
+atexit.register(log_writer.stop)
 
 
 # === Logging-Funktion ===
-def log_interaction(user_id, abschlussziel, studiengang, nutzerkategorie, entscheidung, status="abgeschlossen", progress=100):
-    """Loggt eine Chatinteraktion (Start, Zwischenschritt oder Abschluss)."""
+def log_interaction(user_id, abschlussziel, studiengang, nutzerkategorie, entscheidung, status="abgeschlossen", progress=100, rules_version="-"):
+    """Loggt eine Chatinteraktion (Start, Zwischenschritt oder Abschluss) inkl. Regelwerk-Version."""
     now = datetime.now().isoformat()
-    entry = [now, user_id, abschlussziel, studiengang, nutzerkategorie, entscheidung, status, progress]
+    entry = [now, user_id, abschlussziel, studiengang, nutzerkategorie, entscheidung, status, progress, rules_version]
 
-    # Datei anlegen, falls sie noch nicht existiert
-    file_exists = os.path.isfile(LOG_FILE)
-    with open(LOG_FILE, mode="a", newline="", encoding="utf-8") as file:
-        writer = csv.writer(file)
-        if not file_exists:
-            writer.writerow(["timestamp", "user_id", "abschlussziel", "studiengang", "nutzerkategorie", "entscheidung", "status", "progress"])
-        writer.writerow(entry)
+    if LOG_ASYNC:
+        log_writer.write(entry)
+    else:
+        _write_rows([entry])
 
 
 # === Reporting-Funktion ===
@@ -34,10 +294,29 @@ def generate_report(days: int = 30):
     Liest die Logdatei (chatbot_logs.csv mit Headerzeile) ein und berechnet Kennzahlen
     für das Dashboard: Nutzer, abgeschlossene Sessions, Abbruchquote, Top-Programme, Nutzertypen.
     """
-    log_file = os.path.join(os.path.dirname(__file__), "chatbot_log.csv")
+    log_file = LOG_FILE if os.path.isabs(LOG_FILE) else os.path.join(os.path.dirname(__file__), LOG_FILE)
+    # Gepufferte Einträge zuerst schreiben, damit der Report aktuell ist
+    log_writer.flush()
+
+    # Laufend gepflegte Tages-Buckets → nur N Tage zusammenführen
+    if REPORT_INCREMENTAL:
+        rebuild_report_aggregates()
+        if report_aggregates.covers(days):
+            return report_aggregates.report(days)
 
-    if not os.path.exists(log_file):
-        print(f"[Report] ⚠️ Logdatei nicht gefunden unter: {log_file}")
+    # SQLite-Backend: Kennzahlen per SQL nur über das Zeitfenster
+    if LOG_BACKEND == "sqlite":
+        from event_store import get_event_store
+        return get_event_store().report(days)
+
+    # Partitionierte Logs: nur die Tagesdateien im Zeitfenster öffnen
+    if LOG_BACKEND == "partitioned":
+        log_files = [path for _, path in _report_partitions(days)]
+    else:
+        log_files = [log_file] if os.path.exists(log_file) else []
+
+    if not log_files:
+        log.warning("report_logdatei_fehlt", path=log_file if LOG_BACKEND != "partitioned" else LOG_DIR)
         return {
             "period_days": days,
             "total_users": 0,
@@ -48,16 +327,24 @@ def generate_report(days: int = 30):
             "nutzertypen": {}
         }
 
-    # 🧩 CSV einlesen (mit Header, UTF-8, BOM-Support)
+    # 🧩 CSV einlesen (mit Header, UTF-8, BOM-Support); pandas erst hier laden, der Chat-Pfad braucht es nicht
+    import pandas as pd
     try:
-        df = pd.read_csv(
-            log_file,
-            sep=",",
-            encoding="utf-8-sig",
-            on_bad_lines="skip"
-        )
+        df = pd.concat([
+            pd.read_csv(
+                path,
+                sep=",",
+                encoding="utf-8-sig",
+                # Spaltennamen fest vorgeben: ältere Header ohne rules_version bleiben lesbar
+                names=LOG_HEADER,
+                header=None,
+                skiprows=1,
+                on_bad_lines="skip"
+            )
+            for path in log_files
+        ], ignore_index=True)
     except Exception as e:
-        print(f"[Report] ❌ Fehler beim Einlesen der Logdatei: {e}")
+        log.error("report_einlesen_fehlgeschlagen", error=str(e))
         return {
             "period_days": days,
             "total_users": 0,
@@ -68,9 +355,7 @@ def generate_report(days: int = 30):
             "nutzertypen": {}
         }
 
-    # 🔍 Debug
-    print(f"[Report] {len(df)} Zeilen geladen")
-    print(df.head(3).to_string())
+    log.debug("report_geladen", rows=len(df))
 
     # 🕓 Timestamps sicher parsen
     df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
@@ -79,10 +364,10 @@ def generate_report(days: int = 30):
     # 🧹 Zeitraumfilter (letzte X Tage)
     cutoff = datetime.now() - timedelta(days=days)
     df = df[df["timestamp"] >= cutoff]
-    print(f"[Report] {len(df)} Zeilen nach Filter (letzte {days} Tage)")
+    log.debug("report_gefiltert", rows=len(df), days=days)
 
     if df.empty:
-        print("[Report] ⚠️ Keine Daten im angegebenen Zeitraum")
+        log.info("report_keine_daten", days=days)
         return {
             "period_days": days,
             "total_users": 0,
@@ -137,11 +422,10 @@ def generate_report(days: int = 30):
         .to_dict()
     )
 
-    # 🧾 Debug-Ausgabe
-    print(f"[Report] Nutzer insgesamt: {total_users}")
-    print(f"[Report] Abgeschlossen: {completed_users}, Abgebrochen: {dropped_users} ({dropout_rate}%)")
-    print(f"[Report] Top Programme: {list(top_programs)}")
-    print(f"[Report] Nutzertypen: {nutzertypen}")
+    log.debug(
+        "report_berechnet", total_users=int(total_users), completed=int(completed_users),
+        dropped=int(dropped_users), dropout_rate=dropout_rate
+    )
 
     # === Dashboard-Response ===
     return {
@@ -152,4 +436,19 @@ def generate_report(days: int = 30):
         "dropout_rate": dropout_rate,
         "beliebteste_studiengänge": list(top_programs),
         "nutzertypen": nutzertypen
-    }
\ No newline at end of file
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Wartung der CSV-Logdatei")
+    sub = parser.add_subparsers(dest="command", required=True)
+    header_cmd = sub.add_parser("migrate-header", help="Headerzeile auf die aktuellen Spalten bringen (App vorher stoppen)")
+    header_cmd.add_argument("csv_path", nargs="?", default=LOG_FILE)
+    args = parser.parse_args()
+
+    if migrate_log_header(args.csv_path):
+        print(f"[Log] ✅ Header von {args.csv_path} aktualisiert: {','.join(LOG_HEADER)}")
+    else:
+        print(f"[Log] Header von {args.csv_path} ist bereits aktuell")
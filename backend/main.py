@@ -1,15 +1,71 @@
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from conversation import get_next_question, update_state, questions
-from openai_client import get_openai_decision
-from rules_excel import load_excel_rules
-from logging_handler import log_interaction, generate_report
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from conversation import get_next_question, update_state, get_progress
+from openai_client import get_openai_decision_async, stream_openai_decision, decision_cache, init_clients, close_clients
+from rules_registry import get_registry
+from logging_handler import log_interaction, log_writer, rebuild_report_aggregates
+from session_store import SessionState, create_session_store
+from metrics import DECISIONS, REQUEST_SECONDS, REQUESTS, register_collector, render_metrics, span
+from structured_log import get_logger, recent_events, writer as app_log_writer
+import json
+import threading
 import uuid
 
+# Eine Regelwerk-Instanz pro Prozess; conversation und openai_client bekommen sie als `rules` übergeben
+RULES_REGISTRY = get_registry()
+# Session-Zustände: im Prozess oder geteilt (SQLite/WAL) für mehrere Worker
+SESSION_STORE = create_session_store()
+log = get_logger("main")
+
+# Zustand des Aufwärmens (Regelwerk, OpenAI-Clients), abrufbar über /ready
+STARTUP = {
+    "ready": False,
+    "import_seconds": round(time.perf_counter() - _IMPORT_STARTED, 3),
+    "ready_seconds": None,
+    "rules_version": None,
+    "error": None
+}
+
+
+def warm_up():
+    """Lädt Regelwerk und OpenAI-Clients; Requests davor warten ggf. auf das Regelwerk, statt zu scheitern."""
+    try:
+        rules = RULES_REGISTRY.current()
+        init_clients()
+        STARTUP.update(ready=True, ready_seconds=round(time.perf_counter() - _IMPORT_STARTED, 3), rules_version=rules.version)
+        log.info("warm_up_fertig", seconds=STARTUP["ready_seconds"], rules_version=rules.version)
+    except Exception as e:
+        STARTUP["error"] = f"{type(e).__name__}: {e}"
+        log.error("warm_up_fehlgeschlagen", error=STARTUP["error"])
+
+
+# === App-Lebenszyklus ===
+@asynccontextmanager
+async def lifespan(app):
+    # Aufwärmen im Hintergrund: der Worker nimmt sofort Verbindungen an, /ready meldet, wann er warm ist
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    # Regelwerk im Hintergrund auf Änderungen überwachen
+    RULES_REGISTRY.start()
+    # Report-Kennzahlen im Hintergrund aus dem Log aufbauen (blockiert den Start nicht)
+    threading.Thread(target=rebuild_report_aggregates, name="report-rebuild", daemon=True).start()
+    yield
+    RULES_REGISTRY.stop()
+    # Gepoolte Verbindungen zu OpenAI sauber schließen
+    await close_clients()
+    # Noch gepufferte Log-Einträge schreiben
+    log_writer.stop()
+    app_log_writer.stop()
+
+
 # === App-Setup ===
-app = FastAPI()
-RULES = load_excel_rules()
-SESSIONS = {}
+app = FastAPI(lifespan=lifespan)
 
 # === CORS für Frontend erlauben ===
 app.add_middleware(
@@ -20,49 +76,65 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
 # === Fortschritt berechnen ===
 def calculate_progress(state: dict) -> int:
-    """Berechnet Fortschritt in Prozent anhand der beantworteten Fragen."""
-    total_questions = len(questions)
-    answered = len([key for key in state.keys() if state[key]])
-    if total_questions == 0:
-        return 0
-    progress = int((answered / total_questions) * 100)
-    return min(progress, 100)
+    """Berechnet Fortschritt in Prozent entlang des kompilierten Fragengraphen."""
+    return get_progress(state)
 
 
-# === Chat-Route ===
-@app.post("/chat")
-async def chat(request: Request):
-    data = await request.json()
+# === Gesprächsschritt (gemeinsam für /chat und /chat/stream) ===
+def advance_session(data: dict):
+    """
+    Verarbeitet eine Nutzernachricht bis zur nächsten Frage.
+    Gibt (user_id, state, rules, antwort) zurück; antwort ist None,
+    wenn alle Fragen beantwortet sind und die Entscheidung ansteht.
+    """
     message = data.get("message", "").strip()
     user_id = data.get("user_id", str(uuid.uuid4()))
 
+    # Lesen, Ändern und Zurückschreiben exklusiv pro user_id (auch über Worker hinweg)
+    logs = []
+    with SESSION_STORE.transaction(user_id) as txn:
+        result = _advance_state(txn, user_id, message, logs)
+    # Geloggt wird erst nach Freigabe der Session-Sperre
+    for entry in logs:
+        log_interaction(**entry)
+    return result
+
+
+def _advance_state(txn, user_id: str, message: str, logs: list):
     # Lade Session-Zustand oder erzeuge neuen
-    state = SESSIONS.get(user_id, {})
+    state = txn.state
 
-    # 🟢 Falls neue Session → Start-Log
+    # 🟢 Falls neue Session → an aktuelle Regelwerk-Version binden und Start-Log
     if not state:
-        log_interaction(
+        state["_rules_version"] = RULES_REGISTRY.current().version
+        logs.append(dict(
             user_id=user_id,
             abschlussziel="Unbekannt",
             studiengang="Unbekannt",
             nutzerkategorie="Unbekannt",
             entscheidung="-",
             status="gestartet",
-            progress=0
-        )
+            progress=0,
+            rules_version=state["_rules_version"]
+        ))
 
-    # === Sicherstellen, dass state ein dict ist ===
-    if not isinstance(state, dict):
-        state = {}
+    # === Sicherstellen, dass state ein Session-Zustand ist ===
+    if not isinstance(state, SessionState):
+        state = SessionState(state if isinstance(state, dict) else {})
+
+    # Laufende Sessions bleiben bis zum Ende bei ihrer Regelwerk-Version
+    rules = RULES_REGISTRY.get(state.get("_rules_version"))
 
     # === 🟢 Update State (Rückgabe kann dict mit next_question sein) ===
-    update_result = update_state(state, message)
+    with span("state_update"):
+        update_result = update_state(state, message, rules=rules)
 
     # 🟢 Sicherstellen, dass state richtig aktualisiert wird
     state = update_result.get("state", update_result)
-    SESSIONS[user_id] = state
+    txn.state = state
 
     # 🟢 Falls update_state bereits eine nächste Frage mitliefert:
     if "next_question" in update_result:
@@ -70,14 +142,15 @@ async def chat(request: Request):
         options = update_result.get("options", [])
         progress = calculate_progress(state)
 
-        return {
+        return user_id, state, rules, {
             "response": response_text,
             "options": options,
             "progress": progress
         }
 
     # === Nächste Frage bestimmen (falls update_state keine mitgegeben hat) ===
-    next_q = get_next_question(state)
+    with span("question_selection"):
+        next_q = get_next_question(state, rules=rules)
 
     if next_q:
         response_text = next_q["text"]
@@ -85,62 +158,134 @@ async def chat(request: Request):
         progress = calculate_progress(state)
 
         # 📊 Logge den aktuellen Fortschritt
-        log_interaction(
+        logs.append(dict(
             user_id=user_id,
             abschlussziel=state.get("abschlussziel", "Unbekannt"),
             studiengang=state.get("studiengang", "Unbekannt"),
             nutzerkategorie=state.get("nutzerkategorie", "Unbekannt"),
             entscheidung="-",
             status="in_progress",
-            progress=progress
-        )
+            progress=progress,
+            rules_version=rules.version
+        ))
 
-        return {
+        return user_id, state, rules, {
             "response": response_text,
             "options": options,
             "progress": progress
         }
 
-    # === Wenn alle Fragen beantwortet sind → GPT Entscheidung ===
-    try:
-        decision_data = get_openai_decision(state, RULES)
+    # Entscheidung arbeitet auf einer einfachen dict-Kopie (JSON-Prompt, Cache-Schlüssel)
+    return user_id, state.to_dict(), rules, None
 
-        # 🎓 Studiengang für Logging bestimmen
-        if state.get("abschlussziel", "").lower() == "bachelor":
-            logged_studiengang = "Bachelor"
-        else:
-            logged_studiengang = state.get("studiengang", "Unbekannt")
 
-        log_interaction(
-            user_id=user_id,
-            abschlussziel=state.get("abschlussziel", "Unbekannt"),
-            studiengang=(
-                "Bachelor"
-                if state.get("abschlussziel", "").lower() == "bachelor"
-                else state.get("studiengang", "Unbekannt")
-            ),
-            nutzerkategorie=(
-                "master_intern" if state.get("hsbi_bachelor", "").lower() == "ja"
-                else "master_extern" if state.get("abschlussziel", "").lower() == "master"
-                else "bachelorbewerber"
-            ),
-            entscheidung=decision_data.get("decision", "Unklar"),
-            status="abgeschlossen",   # 🟢 Neue Spalte für Abschlussstatus
-            progress=100              # 🟢 Fortschritt auf 100 % setzen
-        )
+def finish_session(user_id: str, state: dict, rules, decision_data: dict) -> dict:
+    """Loggt den Abschluss einer Session und baut die finale Antwort."""
+    DECISIONS.inc(decision=decision_data.get("decision", "Unklar"))
+    log_interaction(
+        user_id=user_id,
+        abschlussziel=state.get("abschlussziel", "Unbekannt"),
+        studiengang=(
+            "Bachelor"
+            if state.get("abschlussziel", "").lower() == "bachelor"
+            else state.get("studiengang", "Unbekannt")
+        ),
+        nutzerkategorie=(
+            "master_intern" if state.get("hsbi_bachelor", "").lower() == "ja"
+            else "master_extern" if state.get("abschlussziel", "").lower() == "master"
+            else "bachelorbewerber"
+        ),
+        entscheidung=decision_data.get("decision", "Unklar"),
+        status="abgeschlossen",   # 🟢 Neue Spalte für Abschlussstatus
+        progress=100,             # 🟢 Fortschritt auf 100 % setzen
+        rules_version=rules.version
+    )
 
-        return {
-            "response": decision_data["formatted_response"],
-            "decision": decision_data.get("decision", "Unklar"),
-            "options": [],
-            "progress": 100
-        }
+    return {
+        "response": decision_data["formatted_response"],
+        "decision": decision_data.get("decision", "Unklar"),
+        "rules_version": rules.version,
+        "options": [],
+        "progress": 100
+    }
+
+
+# === Chat-Route ===
+def _observe_request(endpoint: str, turn: str, started: float):
+    REQUESTS.inc(endpoint=endpoint, turn=turn)
+    REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint, turn=turn)
+
+
+@app.post("/chat")
+async def chat(request: Request):
+    started = time.perf_counter()
+    data = await request.json()
+    # Sperre/SQLite, Logging und ggf. erstes Laden des Regelwerks laufen im Threadpool, nicht im Event-Loop
+    user_id, state, rules, reply = await run_in_threadpool(advance_session, data)
+    if reply is not None:
+        _observe_request("chat", "question", started)
+        return reply
+
+    # === Wenn alle Fragen beantwortet sind → GPT Entscheidung ===
+    try:
+        decision_data = await get_openai_decision_async(state, rules)
+        return finish_session(user_id, state, rules, decision_data)
     except Exception as e:
         return {
             "response": f"❌ Fehler bei der Entscheidungsanalyse: {e}",
             "options": [],
             "progress": 100
         }
+    finally:
+        _observe_request("chat", "decision", started)
+
+
+def _sse(event: str, payload: dict) -> str:
+    """Formatiert ein Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+# === Streaming-Chat-Route (Server-Sent Events) ===
+@app.post("/chat/stream")
+async def chat_stream(request: Request):
+    """
+    Wie /chat, streamt die Entscheidung aber als SSE:
+    "chunk"-Events mit fertig formatiertem HTML, sobald GPT Text liefert,
+    und ein abschließendes "done"-Event mit Entscheidung und vollständiger Antwort.
+    Fragen-Schritte kommen direkt als einzelnes "done"-Event.
+    """
+    started = time.perf_counter()
+    data = await request.json()
+    user_id, state, rules, reply = await run_in_threadpool(advance_session, data)
+
+    async def events():
+        if reply is not None:
+            _observe_request("chat_stream", "question", started)
+            yield _sse("done", reply)
+            return
+
+        try:
+            decision_data = None
+            async for kind, payload in stream_openai_decision(state, rules):
+                if kind == "chunk":
+                    yield _sse("chunk", {"html": payload})
+                else:
+                    decision_data = payload
+            done = finish_session(user_id, state, rules, decision_data)
+        except Exception as e:
+            done = {
+                "response": f"❌ Fehler bei der Entscheidungsanalyse: {e}",
+                "options": [],
+                "progress": 100
+            }
+        _observe_request("chat_stream", "decision", started)
+        yield _sse("done", done)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 # === Startseite-Test ===
@@ -149,6 +294,61 @@ def root():
     return {"message": "HSBI Chatbot Backend läuft ✅"}
 
 
+@app.get("/ready")
+def ready():
+    """Readiness: 200, sobald Regelwerk und OpenAI-Clients geladen sind, sonst 503."""
+    return JSONResponse(STARTUP, status_code=200 if STARTUP["ready"] else 503)
+
+
+@app.get("/sessions")
+def get_session_stats():
+    """Größe und Verdrängungszähler des Session-Speichers."""
+    return SESSION_STORE.stats()
+
+def _component_metrics() -> list:
+    """Aktuelle Werte von Entscheidungs-Cache, Session-Speicher, Log-Queue und Regelwerk."""
+    cache = decision_cache.stats()
+    sessions = SESSION_STORE.stats()
+    writer = log_writer.stats()
+    return [
+        ("hsbi_decision_cache_lookups_total", "counter", "Lookups im Entscheidungs-Cache",
+         [({"result": "hit"}, cache["hits"]), ({"result": "miss"}, cache["misses"])]),
+        ("hsbi_decision_cache_saved_tokens_total", "counter", "Durch Cache-Treffer eingesparte Tokens",
+         [({}, cache["saved_tokens"])]),
+        ("hsbi_sessions", "gauge", "Aktive Sessions im Session-Speicher", [({"backend": sessions["backend"]}, sessions["size"])]),
+        ("hsbi_log_queue_depth", "gauge", "Noch nicht geschriebene Logeinträge", [({}, writer["queued"])]),
+        ("hsbi_log_backpressure_total", "counter", "Direkt geschriebene Einträge wegen voller Log-Queue",
+         [({}, writer["backpressure"])]),
+        ("hsbi_app_log_dropped_total", "counter", "Verworfene Diagnose-Ereignisse wegen voller Queue",
+         [({}, app_log_writer.stats()["dropped"])]),
+        ("hsbi_rules_info", "gauge", "Aktive Regelwerk-Version", [({"version": RULES_REGISTRY.current().version}, 1)]),
+    ]
+
+
+register_collector(_component_metrics)
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Laufzeit-Metriken im Prometheus-Textformat (Stufen-Latenzen, Anfragen, Entscheidungen, Tokens)."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/debug/events")
+def get_debug_events(limit: int = 100, module: str = None, event: str = None):
+    """
+    Letzte Debug-Ereignisse aus dem Ringpuffer (auch nicht ausgegebene/gesampelte).
+    Beispiel: /debug/events?module=conversation&limit=20
+    """
+    return {"events": recent_events(limit, module, event), "writer": app_log_writer.stats()}
+
+
+@app.get("/decision-cache")
+def get_decision_cache_stats():
+    """Treffer/Fehlschläge und eingesparte Latenz/Tokens des Entscheidungs-Caches."""
+    return decision_cache.stats()
+
+
 @app.get("/report")
 def get_report(days: int = 30):
     """
@@ -158,3 +358,41 @@ def get_report(days: int = 30):
     from logging_handler import generate_report
     report = generate_report(days)
     return report
+
+
+@app.get("/eligibility")
+def get_eligibility(bachelorstudiengang: str, studienart: str, vertiefung: str):
+    """
+    ECTS-Soll/Ist-Vergleich eines HSBI-Bachelors gegen alle Masterstudiengänge.
+    Beispiel: /eligibility?bachelorstudiengang=Maschinenbau&studienart=Vollzeit&vertiefung=...
+    """
+    rules = RULES_REGISTRY.current()
+    resolved = rules.match_bachelor(bachelorstudiengang)
+    ects_ist = rules.ects_for(resolved["match"] or bachelorstudiengang, studienart, vertiefung)
+    return {"ects_ist": ects_ist, "studiengaenge": rules.check_programs(ects_ist)}
+
+
+@app.post("/evaluate/batch")
+async def evaluate_batch(request: Request, format: str = "jsonl"):
+    """
+    Vorprüfung vieler Bewerberprofile ohne LLM (Body: CSV mit Header, JSON-Liste oder JSON-Lines).
+    Die Spalte "entscheidung" entspricht der Entscheidung des Template-Pfads im Chat
+    (build_decision_facts); Note, Berufserfahrung und Englisch stehen nur in
+    formal_entscheidung/hinweise. Anders als im Chat-Log, das Bachelor-Sessions in jedem
+    DECISION_MODE als "Unklar" führt, steht hier das tatsächliche Ja/Nein.
+    Ungültiger Body → 400.
+    Beispiel: curl --data-binary @bewerbungen.csv "/evaluate/batch?format=csv"
+    """
+    from batch_evaluation import read_profiles, stream_results
+
+    body = await request.body()
+    # Parsen und Bewerten sind CPU-Arbeit → außerhalb der Event-Loop
+    # (StreamingResponse iteriert den synchronen Generator ebenfalls im Threadpool)
+    try:
+        profiles = await run_in_threadpool(read_profiles, body, request.headers.get("content-type", ""))
+    except ValueError as e:
+        log.warning("batch_ungueltig", error=str(e))
+        return JSONResponse({"error": f"Ungültige Bewerberdaten: {e}"}, status_code=400)
+    log.info("batch_start", profiles=len(profiles), format=format)
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(stream_results(profiles, RULES_REGISTRY.current(), format), media_type=media_type)
@@ -0,0 +1,169 @@
+"""
+Prozessweite Laufzeit-Metriken im Prometheus-Textformat (ohne Zusatzpaket).
+Zeitspannen (`span`) füllen das Histogramm hsbi_stage_duration_seconds, sodass sich bei
+einem Alarm sofort zeigt, ob Latenz aus Excel, dem Modell oder von der Platte kommt.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from structured_log import get_logger
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+log = get_logger("metrics")
+
+# Sekunden; fein im Mikro-/Millisekundenbereich (Lookups) bis grob (Modellaufrufe)
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monoton steigender Zähler, optional mit Labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(labels.get(name, "") for name in self.labelnames), 0)
+
+    def samples(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_label_text(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Histogram:
+    """Verteilung von Messwerten in festen Buckets (kumulativ beim Export)."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Label-Werte → [Zähler je Bucket (+Inf am Ende), Summe, Anzahl]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(tuple(labels.get(name, "") for name in self.labelnames))
+        return series[2] if series else 0
+
+    def samples(self) -> list:
+        with self._lock:
+            items = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._series.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {count}")
+        return lines
+
+
+_METRICS = []
+# Funktionen, die beim Export aktuelle Werte liefern: [(Name, Typ, Beschreibung, [(Labels-Dict, Wert)])]
+_COLLECTORS = []
+
+
+def _register(metric):
+    _METRICS.append(metric)
+    return metric
+
+
+def register_collector(collect):
+    """Registriert eine Funktion, die beim Export Werte anderer Komponenten (Caches, Queues) liefert."""
+    _COLLECTORS.append(collect)
+
+
+# === Metriken des Chat-Pfads ===
+STAGE_SECONDS = _register(Histogram(
+    "hsbi_stage_duration_seconds",
+    "Dauer einzelner Verarbeitungsschritte (Excel, ECTS, Fragen, Prompt, Modell, Formatierung, Log)",
+    ["stage"]
+))
+REQUEST_SECONDS = _register(Histogram(
+    "hsbi_request_duration_seconds", "Dauer von Chat-Anfragen nach Endpunkt und Turn-Typ", ["endpoint", "turn"]
+))
+REQUESTS = _register(Counter("hsbi_requests_total", "Chat-Anfragen nach Endpunkt und Turn-Typ", ["endpoint", "turn"]))
+DECISIONS = _register(Counter("hsbi_decisions_total", "Abgeschlossene Sessions nach Entscheidung", ["decision"]))
+LLM_CALLS = _register(Counter("hsbi_llm_calls_total", "Modellaufrufe nach Ergebnis", ["outcome"]))
+LLM_TOKENS = _register(Counter("hsbi_llm_tokens_total", "Vom Modell gemeldete Tokens (Prompt + Antwort)"))
+LOG_ROWS = _register(Counter("hsbi_log_rows_written_total", "Geschriebene Logzeilen"))
+
+
+@contextmanager
+def span(stage: str):
+    """Misst die Dauer des Blocks als Stufe `stage` (auch über await hinweg)."""
+    if not METRICS_ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+
+
+def render_metrics() -> str:
+    """Alle Metriken im Prometheus-Textformat (Version 0.0.4)."""
+    lines = []
+    for metric in _METRICS:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+
+    for collect in _COLLECTORS:
+        try:
+            families = collect()
+        except Exception as e:
+            log.warning("collector_fehlgeschlagen", collector=getattr(collect, "__name__", repr(collect)), error=str(e))
+            continue
+        for name, kind, documentation, samples in families:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_label_text(tuple(labels), tuple(labels.values()))} {value}")
+    return "\n".join(lines) + "\n"
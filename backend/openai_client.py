@@ -1,16 +1,142 @@
-from openai import OpenAI
+import asyncio
 import os
 import json
 import re
-import difflib
+import threading
+import time
 from dotenv import load_dotenv
-import re
 from rules_excel import calculate_bachelor_ects
-import pandas as pd
+from decision_cache import DecisionCache, profile_key
+from metrics import LLM_CALLS, LLM_TOKENS, STAGE_SECONDS, span
+from structured_log import get_logger
 
 
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+# === OpenAI-Konfiguration (Timeouts, Verbindungspool, Parallelität) ===
+OPENAI_MODEL = "gpt-4o-mini"
+# Alternativer OpenAI-kompatibler Endpunkt, z. B. der Mock-Server für Lasttests (leer = api.openai.com)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+OPENAI_READ_TIMEOUT = float(os.getenv("OPENAI_READ_TIMEOUT", "30"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "50"))
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "20"))
+
+log = get_logger("openai_client")
+
+# Clients entstehen beim App-Start (Lifespan) bzw. beim ersten Modellaufruf;
+# das openai-Paket wird erst dann importiert
+client = None
+async_client = None
+_clients_lock = threading.Lock()
+
+
+def _build_clients():
+    """Synchroner und gepoolter Async-Client mit den konfigurierten Timeouts."""
+    import httpx
+    from openai import AsyncOpenAI, OpenAI
+
+    timeout = httpx.Timeout(OPENAI_READ_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT)
+    sync_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=OPENAI_BASE_URL, timeout=timeout)
+    pooled_client = AsyncOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        base_url=OPENAI_BASE_URL,
+        timeout=timeout,
+        http_client=httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_CONNECTIONS
+            )
+        )
+    )
+    return sync_client, pooled_client
+
+
+def init_clients(sync_client=None, pooled_client=None):
+    """
+    Setzt die prozessweiten Clients (Injektion z. B. aus dem Lifespan oder Benchmarks).
+    Nicht übergebene und noch nicht vorhandene Clients werden einmalig gebaut.
+    """
+    global client, async_client
+    with _clients_lock:
+        if sync_client is not None:
+            client = sync_client
+        if pooled_client is not None:
+            async_client = pooled_client
+        if client is None or async_client is None:
+            built_sync, built_async = _build_clients()
+            client = client or built_sync
+            async_client = async_client or built_async
+        return client, async_client
+
+
+def _sync_client():
+    return client if client is not None else init_clients()[0]
+
+
+def _async_client():
+    return async_client if async_client is not None else init_clients()[1]
+
+
+async def close_clients():
+    """Schließt die gepoolten Verbindungen (beim Herunterfahren)."""
+    global async_client
+    pooled, async_client = async_client, None
+    if pooled is not None and hasattr(pooled, "close"):
+        await pooled.close()
+
+
+# Globale Obergrenze gleichzeitiger Modellaufrufe pro Worker
+_llm_semaphore = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+
+# Antwortmodus: "llm" (GPT formuliert), "template" (regelbasiert, ohne GPT),
+# "template_polish" (regelbasierte Antwort, von GPT nur sprachlich geglättet)
+DECISION_MODE = os.getenv("DECISION_MODE", "llm").strip().lower()
+if DECISION_MODE not in ("llm", "template", "template_polish"):
+    DECISION_MODE = "llm"
+
+# Cache für GPT-Entscheidungen identischer Bewerberprofile
+decision_cache = DecisionCache()
+
+NO_ANSWER_TEXT = "⚠️ Keine Antwort vom Entscheidungsmodul erhalten."
+
+# Ersetze spezielle Bereiche mit HTML-Struktur
+MARKDOWN_REPLACEMENTS = {
+    r"- \*\*Entscheidung:\*\*": " <b>Entscheidung:</b>",
+    r"- \*\*Begründung:\*\*": " <b>Begründung:</b>",
+    r"- \*\*ECTS-Vergleich:\*\*": " <b>ECTS-Vergleich:</b>",
+    r"- \*\*Bewertung:\*\*": " <b>Bewertung:</b>",
+    r"- \*\*Weitere Voraussetzungen:\*\*": " <b>Weitere Voraussetzungen:</b>",
+    r"- \*\*Bewerbungsunterlagen:\*\*": " <b>Bewerbungsunterlagen:</b>",
+    r"- \*\*Soll:\*\*": "<u>Soll:</u>",
+    r"- \*\*Ist:\*\*": "<u>Ist:</u>",
+}
+
+# Schönes Box-Layout für Chat (Text wird zwischen Anfang und Ende eingesetzt)
+RESPONSE_BOX_START = """
+    <div style='background-color:#f1f6ff;padding:12px;border-radius:10px;line-height:1.6;font-size:15px;'>
+        """
+RESPONSE_BOX_END = """
+    </div>
+    """
+
+
+# Literale Labels (z. B. "- **Entscheidung:**"), nach denen beim Streamen gepuffert wird
+MARKDOWN_LABELS = [pattern.replace("\\", "") for pattern in MARKDOWN_REPLACEMENTS]
+
+
+def _replace_labels(text: str) -> str:
+    for pattern, replacement in MARKDOWN_REPLACEMENTS.items():
+        text = re.sub(pattern, replacement, text)
+    return text
+
+
+def format_markdown_line(line: str) -> str:
+    """Formatiert eine einzelne Markdown-Zeile (Überschriften-Labels, Listenpunkte) in HTML."""
+    # Normale Listenpunkte hübsch einrücken
+    return re.sub(r"^- ", "• ", _replace_labels(line))
+
 
 def format_markdown_response(raw_text: str) -> str:
     """
@@ -20,37 +146,90 @@ def format_markdown_response(raw_text: str) -> str:
     if not raw_text:
         return "Keine Entscheidung verfügbar."
 
-    text = raw_text.strip()
-
-    # Ersetze spezielle Bereiche mit Icons und HTML-Struktur
-    replacements = {
-        r"- \*\*Entscheidung:\*\*": " <b>Entscheidung:</b>",
-        r"- \*\*Begründung:\*\*": " <b>Begründung:</b>",
-        r"- \*\*ECTS-Vergleich:\*\*": " <b>ECTS-Vergleich:</b>",
-        r"- \*\*Bewertung:\*\*": " <b>Bewertung:</b>",
-        r"- \*\*Weitere Voraussetzungen:\*\*": " <b>Weitere Voraussetzungen:</b>",
-        r"- \*\*Bewerbungsunterlagen:\*\*": " <b>Bewerbungsunterlagen:</b>",
-        r"- \*\*Soll:\*\*": "<u>Soll:</u>",
-        r"- \*\*Ist:\*\*": "<u>Ist:</u>",
-    }
-
-    for pattern, replacement in replacements.items():
-        text = re.sub(pattern, replacement, text)
+    # Zeilenweise formatieren, Zeilenumbrüche in <br> umwandeln
+    text = "<br>".join(format_markdown_line(line) for line in raw_text.strip().split("\n"))
 
-    # Normale Listenpunkte hübsch einrücken
-    text = re.sub(r"^- ", "• ", text, flags=re.MULTILINE)
+    return f"{RESPONSE_BOX_START}{text}{RESPONSE_BOX_END}"
 
-    # Zeilenumbrüche in <br> umwandeln
-    text = text.replace("\n", "<br>")
 
-    # Schönes Box-Layout für Chat
-    formatted = f"""
-    <div style='background-color:#f1f6ff;padding:12px;border-radius:10px;line-height:1.6;font-size:15px;'>
-        {text}
-    </div>
+class MarkdownStreamFormatter:
+    """
+    Formatiert gestreamten GPT-Text inkrementell mit denselben Regeln wie
+    format_markdown_response. Zurückgehalten wird nur, was noch zu einem Label
+    werden kann, sowie Leerraum am Ende (entfällt bei strip(), falls nichts mehr folgt).
     """
 
-    return formatted
+    def __init__(self):
+        self.line = ""
+        self.emitted = 0
+        self.pending = ""
+        # Ausgabe, falls der Text mit dem zurückgehaltenen Teil endet
+        self.pending_final = ""
+        self.started = False
+
+    def feed(self, delta: str) -> str:
+        """Nimmt neuen Text entgegen und gibt das darstellbare HTML-Fragment zurück."""
+        html = []
+        *complete_lines, rest = (self.line + delta).split("\n")
+
+        for line in complete_lines:
+            self.line = line
+            cut = len(line.rstrip())
+            if self._is_bare_bullet(cut):
+                # "- " wird nur zum Listenpunkt, wenn danach noch Text folgt (sonst strip())
+                self.pending_final = self.pending + "-"
+                self.pending += format_markdown_line(line[line.index("-"):]) + "<br>"
+                self.started = True
+            else:
+                html.append(self._emit(cut))
+                if self.started:
+                    self.pending += line[max(self.emitted, cut):] + "<br>"
+            self.line, self.emitted = "", 0
+
+        self.line = rest
+        html.append(self._emit(self._safe_cut()))
+        return "".join(html)
+
+    def finish(self) -> str:
+        """Gibt den Rest der letzten Zeile aus; abschließender Leerraum entfällt."""
+        html = self._emit(len(self.line.rstrip())) or self.pending_final
+        self.line, self.emitted, self.pending, self.pending_final = "", 0, "", ""
+        return html
+
+    def _is_bare_bullet(self, cut: int) -> bool:
+        segment = self.line[self.emitted:cut]
+        if not self.started:
+            return segment.lstrip() == "-" and cut < len(self.line)
+        return self.emitted == 0 and segment == "-" and cut < len(self.line)
+
+    def _safe_cut(self) -> int:
+        """Position, bis zu der die aktuelle (unvollständige) Zeile sicher formatiert werden kann."""
+        end = len(self.line.rstrip())
+        for pos in range(self.emitted, end):
+            if self.line[pos] == "-":
+                tail = self.line[pos:end]
+                if any(label.startswith(tail) for label in MARKDOWN_LABELS):
+                    return pos
+        return end
+
+    def _emit(self, cut: int) -> str:
+        segment = self.line[self.emitted:cut]
+        at_line_start = self.emitted == 0
+        if not self.started:
+            # Führende Leerzeichen/Leerzeilen entfallen wie bei strip()
+            stripped = segment.lstrip()
+            if not stripped:
+                return ""
+            segment = stripped
+            at_line_start = True
+            self.started = True
+        if not segment:
+            return ""
+
+        html = self.pending + (format_markdown_line(segment) if at_line_start else _replace_labels(segment))
+        self.pending, self.pending_final = "", ""
+        self.emitted = cut
+        return html
 
 
 # 🧮 Vergleich Soll vs. Ist → Regelbasierte Entscheidung
@@ -111,235 +290,588 @@ def evaluate_ects_decision(ects_soll, ects_ist):
 
     return auto_decision, auto_reason, ects_comparison_text
 
-def get_openai_decision(applicant_data: dict, rules: dict):
+# === Regelbasierte Antwort (Template-Modus) ===
+BEWERBUNGSUNTERLAGEN_BACHELOR = "Abschlusszeugnis, Lebenslauf, ggf. Nachweis über berufliche Qualifikation."
+BEWERBUNGSUNTERLAGEN_MASTER = (
+    "Bachelorzeugnis, Transcript of Records (Modulübersicht mit ECTS), Lebenslauf, "
+    "ggf. Nachweise über Berufserfahrung und Englischkenntnisse (B2)."
+)
+
+
+def _parse_number(value):
+    """Liest die erste Zahl aus einer Freitextantwort (z. B. "2,3" oder "3 Jahre")."""
+    match = re.search(r"\d+(?:[.,]\d+)?", str(value or ""))
+    return float(match.group(0).replace(",", ".")) if match else None
+
+
+def _weitere_voraussetzungen(applicant_data: dict, general: dict) -> str:
+    """Prüft Note, Berufserfahrung und Englischkenntnisse gegen rules["Allgemein"]."""
+    zeilen = []
+
+    note = _parse_number(applicant_data.get("abschlussnote"))
+    min_note = general.get("Mindestnote_Bachelor")
+    if note is None:
+        zeilen.append("• Abschlussnote: keine auswertbare Angabe → Nachweis durch Zeugnis erforderlich")
+    elif min_note is None:
+        zeilen.append(f"• Abschlussnote: {note}")
+    else:
+        status = "erfüllt" if note <= float(min_note) else "nicht erfüllt"
+        zeilen.append(f"• Abschlussnote: {note} (erforderlich: {float(min_note)} oder besser) → {status}")
+
+    jahre = _parse_number(applicant_data.get("berufserfahrung"))
+    min_jahre = general.get("Berufserfahrung_Jahre")
+    if jahre is None:
+        zeilen.append("• Berufserfahrung: keine auswertbare Angabe → Nachweis erforderlich")
+    elif min_jahre is None:
+        zeilen.append(f"• Berufserfahrung: {jahre:g} Jahre")
+    else:
+        status = "erfüllt" if jahre >= float(min_jahre) else "nicht erfüllt"
+        zeilen.append(f"• Berufserfahrung: {jahre:g} Jahre (erforderlich: {float(min_jahre):g}) → {status}")
+
+    englisch = (applicant_data.get("englischkenntnisse") or "").strip().lower()
+    if englisch == "ja":
+        zeilen.append("• Englischkenntnisse (mind. B2): vorhanden → erfüllt")
+    elif englisch == "nein":
+        zeilen.append("• Englischkenntnisse (mind. B2): nicht vorhanden → nicht erfüllt")
+    else:
+        zeilen.append("• Englischkenntnisse (mind. B2): keine Angabe → Nachweis erforderlich")
+
+    return "\n".join(zeilen)
+
+
+def build_decision_facts(applicant_data: dict, rules: dict) -> dict:
     """
-    Übergibt die gesammelten Bewerberdaten und Studienregeln an OpenAI,
-    um automatisch zu prüfen, ob die Voraussetzungen erfüllt sind.
-    Für Bachelorbewerber: nur HZB-Prüfung.
-    Für Masterbewerber: vollständige ECTS- und Regelprüfung.
+    Ermittelt Entscheidung, Begründung, ECTS-Vergleich und weitere Voraussetzungen
+    ausschließlich regelbasiert aus Bewerberdaten und Regelwerk.
+    """
+    abschlussziel = (applicant_data.get("abschlussziel") or "").strip().lower()
+
+    # 🟦 Bachelor → nur HZB-Prüfung
+    if "bachelor" in abschlussziel:
+        hochschulzugang = (applicant_data.get("hochschulzugang") or "").strip().lower()
+        if hochschulzugang == "ja":
+            return {
+                "decision": "Ja",
+                "reason": (
+                    "Der Bewerber besitzt eine anerkannte Hochschulzugangsberechtigung (z. B. Abitur, Fachabitur "
+                    "oder berufliche Qualifikation) und erfüllt damit die formalen Voraussetzungen für ein "
+                    "Bachelorstudium an der HSBI."
+                ),
+                "ects_comparison": None,
+                "weitere": None,
+                "unterlagen": BEWERBUNGSUNTERLAGEN_BACHELOR
+            }
+        if hochschulzugang == "nein":
+            return {
+                "decision": "Nein",
+                "reason": (
+                    "Es liegt keine Hochschulzugangsberechtigung vor. "
+                    "Eine Zulassung zum Bachelorstudium ist daher nicht möglich."
+                ),
+                "ects_comparison": None,
+                "weitere": None,
+                "unterlagen": "Keine – bitte wenden Sie sich an die Studienberatung für alternative Zugangswege."
+            }
+        return {
+            "decision": "Unklar",
+            "reason": "Es liegt keine eindeutige Angabe zur Hochschulzugangsberechtigung vor.",
+            "ects_comparison": None,
+            "weitere": None,
+            "unterlagen": BEWERBUNGSUNTERLAGEN_BACHELOR
+        }
+
+    # 🟨 Master → ECTS-Vergleich (intern) bzw. Nachweispflicht (extern)
+    masterstudiengang = applicant_data.get("studiengang", "Unbekannt")
+    ects_soll = rules.get("Studiengänge", {}).get(masterstudiengang, {}).get("ECTS_Anforderungen", {})
+    weitere = _weitere_voraussetzungen(applicant_data, rules.get("Allgemein", {}))
+
+    if (applicant_data.get("hsbi_bachelor") or "").strip().lower() == "ja":
+        ects_ist = calculate_bachelor_ects(
+            applicant_data.get("bachelorstudiengang", "Unbekannt"),
+            applicant_data.get("studienart", ""),
+            applicant_data.get("vertiefung", ""),
+            rules=rules,
+        )
+        decision, reason, comparison = evaluate_ects_decision(ects_soll, ects_ist)
+    else:
+        decision = "Unklar"
+        reason = (
+            "Da du deinen Bachelor nicht an der HSBI abgeschlossen hast, kann deine Modulverteilung "
+            "nicht automatisch ausgewertet werden. Der Prüfungsausschuss prüft deine ECTS-Nachweise im Einzelfall."
+        )
+        comparison = (
+            "\n".join(f"• {k}: mindestens {v} ECTS nachzuweisen" for k, v in ects_soll.items())
+            if ects_soll else "Keine Angaben verfügbar."
+        )
+
+    return {
+        "decision": decision,
+        "reason": reason,
+        "ects_comparison": comparison,
+        "weitere": weitere,
+        "unterlagen": BEWERBUNGSUNTERLAGEN_MASTER
+    }
+
+
+def decision_template_markdown(facts: dict) -> str:
+    """Setzt die Fakten in das feste Antwortformat (Markdown wie bei GPT-Antworten)."""
+    zeilen = [
+        f"- **Entscheidung:** {facts['decision']}",
+        f"- **Begründung:** {facts['reason']}"
+    ]
+    if facts["ects_comparison"]:
+        zeilen += ["- **ECTS-Vergleich:**", facts["ects_comparison"]]
+    if facts["weitere"]:
+        zeilen += ["- **Weitere Voraussetzungen:**", facts["weitere"]]
+    zeilen.append(f"- **Bewerbungsunterlagen:** {facts['unterlagen']}")
+    return "\n".join(zeilen)
+
+
+def render_decision_template(applicant_data: dict, rules: dict) -> dict:
+    """
+    Vollständige Antwort ohne GPT-Aufruf (Millisekunden statt Sekunden).
+    Bachelor-Sessions werden wie vor der Template-Umstellung als "Unklar" geführt – in jedem
+    DECISION_MODE, damit /report (abgeschlossen, Entscheidungen) vergleichbar bleibt; der Text nennt Ja/Nein.
+    """
+    facts = build_decision_facts(applicant_data, rules)
+    bachelor = "bachelor" in (applicant_data.get("abschlussziel") or "").strip().lower()
+    return {
+        "formatted_response": format_markdown_response(decision_template_markdown(facts)),
+        "decision": "Unklar" if bachelor else facts["decision"]
+    }
+
+
+def build_polish_messages(applicant_data: dict, rules: dict) -> list:
+    """Nachrichten, mit denen GPT die regelbasierte Antwort nur sprachlich glättet."""
+    facts = build_decision_facts(applicant_data, rules)
+    user_prompt = f"""
+    Hier ist die regelbasiert erstellte Rückmeldung an den Bewerber:
+
+    {decision_template_markdown(facts)}
+
+    Formuliere sie freundlich, flüssig und verständlich um.
+    ❗Wichtig:
+    - Die erste Zeile muss exakt lauten: - **Entscheidung:** {facts['decision']}
+    - Ändere keine Entscheidung, keine Zahlen und keine Bewertungen (erfüllt / nicht erfüllt).
+    - Behalte die Abschnitte und ihre Reihenfolge bei.
+    - Antworte ausschließlich im **Markdown-Format** ohne Emojis oder Symbole.
     """
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+def _fallback_result(applicant_data: dict, rules: dict, e: Exception) -> dict:
+    """Bei Modellausfall regelbasiert antworten; nur wenn auch das scheitert, Fehlermeldung."""
+    log.warning("llm_fallback", error=f"{type(e).__name__}: {e}")
     try:
-        # 🔹 Sicherstellen, dass applicant_data ein dict ist
-        if not isinstance(applicant_data, dict):
-            applicant_data = {}
+        return render_decision_template(applicant_data if isinstance(applicant_data, dict) else {}, rules)
+    except Exception:
+        return _error_result(e)
 
-        # 🔹 Nutzerkategorie automatisch bestimmen
-        hsbi_status = (applicant_data.get("hsbi_bachelor") or "").strip().lower()
-        nutzerkategorie = "intern" if hsbi_status == "ja" else "extern"
 
-        # 🔹 Abschlussziel, HZB und Studiengänge extrahieren
-        abschlussziel = (applicant_data.get("abschlussziel") or "").strip().lower()
-        hochschulzugang = (applicant_data.get("hochschulzugang") or "").strip().lower()
-        bachelorstudiengang = applicant_data.get("bachelorstudiengang", "Unbekannt")
-        masterstudiengang = applicant_data.get("studiengang", "Unbekannt")
-
-        # 🔹 GPT System Prompt
-        system_prompt = """
-        Du bist Bifi, der digitale Studienberater der Hochschule Bielefeld (HSBI).
-        Sprich den Nutzer stets direkt mit „du“ oder „deine“ an – nicht in der dritten Person.
-        Analysiere die Bewerberdaten und prüfe anhand der gegebenen Informationen, 
-        ob die Zulassungsvoraussetzungen erfüllt sind.
-        Formuliere klar, freundlich und verständlich im Markdown-Format, **ohne Emojis oder Symbole**.
-
-        Das Format deiner Antwort:
-        - **Entscheidung:** Ja / Nein / Unklar
+# 🔹 GPT System Prompt
+SYSTEM_PROMPT = """
+Du bist Bifi, der digitale Studienberater der Hochschule Bielefeld (HSBI).
+Sprich den Nutzer stets direkt mit „du“ oder „deine“ an – nicht in der dritten Person.
+Analysiere die Bewerberdaten und prüfe anhand der gegebenen Informationen, 
+ob die Zulassungsvoraussetzungen erfüllt sind.
+Formuliere klar, freundlich und verständlich im Markdown-Format, **ohne Emojis oder Symbole**.
+
+Das Format deiner Antwort:
+- **Entscheidung:** Ja / Nein / Unklar
+- **Begründung:** Warum oder warum nicht
+- **ECTS-Vergleich:** Falls relevant, liste Soll/Ist im direkten Vergelich und Bewertung auf
+- **Weitere Voraussetzungen:** Note, Berufserfahrung, Englischkenntnisse
+- **Bewerbungsunterlagen:** Welche Unterlagen du einreichen musst
+"""
+
+
+def build_decision_messages(applicant_data: dict, rules: dict):
+    """
+    Baut aus Bewerberdaten und Studienregeln die Nachrichten für OpenAI.
+    Für Bachelorbewerber: nur HZB-Prüfung.
+    Für Masterbewerber: vollständige ECTS- und Regelprüfung.
+    Gibt (messages, None) zurück oder (None, Ergebnis), wenn die Antwort ohne GPT feststeht.
+    """
+    # 🔹 Sicherstellen, dass applicant_data ein dict ist
+    if not isinstance(applicant_data, dict):
+        applicant_data = {}
+
+    # 🔹 Abschlussziel, HZB und Studiengänge extrahieren
+    abschlussziel = (applicant_data.get("abschlussziel") or "").strip().lower()
+    hochschulzugang = (applicant_data.get("hochschulzugang") or "").strip().lower()
+    bachelorstudiengang = applicant_data.get("bachelorstudiengang", "Unbekannt")
+    masterstudiengang = applicant_data.get("studiengang", "Unbekannt")
+
+    # 🔹 Bachelor mit eindeutiger HZB-Angabe → Antwort steht in jedem Modus ohne GPT fest
+    if "bachelor" in abschlussziel and hochschulzugang in ("ja", "nein"):
+        return None, render_decision_template(applicant_data, rules)
+
+    # 🔹 Template-Modus: Antwort vollständig regelbasiert bzw. nur von GPT geglättet
+    if DECISION_MODE == "template":
+        return None, render_decision_template(applicant_data, rules)
+    if DECISION_MODE == "template_polish":
+        return build_polish_messages(applicant_data, rules), None
+
+    # 🔹 Nutzerkategorie automatisch bestimmen
+    hsbi_status = (applicant_data.get("hsbi_bachelor") or "").strip().lower()
+    nutzerkategorie = "intern" if hsbi_status == "ja" else "extern"
+
+
+    # 🔹 Unterschiedliche Logik: Bachelor vs Master
+    if "bachelor" in abschlussziel:
+        # 🟦 Bachelorbewerber → Nur HZB-Prüfung
+        user_prompt = f"""
+        Der Bewerber möchte einen Bachelorstudiengang beginnen.
+        Prüfe, ob eine Hochschulzugangsberechtigung (z. B. Abitur, Fachabitur, berufliche Qualifikation) vorliegt.
+
+        Bewerberdaten:
+        {json.dumps(applicant_data, indent=2, ensure_ascii=False)}
+
+        Antworte klar im Markdown-Format:
+        - **Entscheidung:** Ja/Nein
         - **Begründung:** Warum oder warum nicht
-        - **ECTS-Vergleich:** Falls relevant, liste Soll/Ist im direkten Vergelich und Bewertung auf
-        - **Weitere Voraussetzungen:** Note, Berufserfahrung, Englischkenntnisse
-        - **Bewerbungsunterlagen:** Welche Unterlagen du einreichen musst
+        - **Weitere Voraussetzungen:** ggf. ergänzende Anforderungen (z. B. Sprachkenntnisse)
+        - **Bewerbungsunterlagen:** Welche Dokumente müssen eingereicht werden (z. B. Zeugnisse, Lebenslauf)
         """
+    else:
+        # 🟨 Masterbewerber → Extern vs Intern unterscheiden
+        if nutzerkategorie == "extern":
+            # Externe Bewerber: keine Modulverteilung → regelbasierte Grundlage ohne Ist-Werte
+            facts = build_decision_facts(applicant_data, rules)
+            auto_decision, auto_reason = facts["decision"], facts["reason"]
+            ects_soll_text = facts["ects_comparison"]
+            ects_ist_text = "- Keine Daten verfügbar (externer Abschluss)"
 
-        # 🔹 Unterschiedliche Logik: Bachelor vs Master
-        if "bachelor" in abschlussziel:
-            if hochschulzugang == "ja":
-                formatted_output = format_markdown_response("""
-                - **Entscheidung:** Ja  
-                - **Begründung:** Der Bewerber besitzt eine anerkannte Hochschulzugangsberechtigung (z. B. Abitur, Fachabitur oder berufliche Qualifikation) und erfüllt damit die formalen Voraussetzungen für ein Bachelorstudium an der HSBI.  
-                - **Bewerbungsunterlagen:** Abschlusszeugnis, Lebenslauf, ggf. Nachweis über berufliche Qualifikation.
-                """)
-                return {"formatted_response": formatted_output}
-
-            elif hochschulzugang == "nein":
-                formatted_output = format_markdown_response("""
-                - **Entscheidung:** Nein  
-                - **Begründung:** Es liegt keine Hochschulzugangsberechtigung vor. Eine Zulassung zum Bachelorstudium ist daher nicht möglich.  
-                - **Bewerbungsunterlagen:** Keine – bitte wenden Sie sich an die Studienberatung für alternative Zugangswege.
-                """)
-                return {"formatted_response": formatted_output}
-            
-            # 🟦 Bachelorbewerber → Nur HZB-Prüfung
             user_prompt = f"""
-            Der Bewerber möchte einen Bachelorstudiengang beginnen.
-            Prüfe, ob eine Hochschulzugangsberechtigung (z. B. Abitur, Fachabitur, berufliche Qualifikation) vorliegt.
+            Du bist Bifi, der Studienberater der HSBI.
+            Der Bewerber ist externer Masterbewerber.
+
+            Hier sind die bereits automatisch ausgewerteten Ergebnisse aus der Excel-Datenbasis:
+
+            Automatische Entscheidung: {auto_decision}
+            Automatische Begründung: {auto_reason}
 
             Bewerberdaten:
             {json.dumps(applicant_data, indent=2, ensure_ascii=False)}
 
-            Antworte klar im Markdown-Format:
-            - **Entscheidung:** Ja/Nein
+            ECTS-Vergleich laut Excel-Daten:
+
+            Soll:
+            {ects_soll_text}
+
+            Ist (berechnet aus Bachelor-Struktur):
+            {ects_ist_text}
+
+            Analysiere die Ergebnisse. Verwende die automatische Entscheidung und Begründung als Grundlage.
+            Formuliere sie im freundlichen, klaren Markdown-Stil.
+
+            Antworte im Markdown-Format:
+            - **Entscheidung:** Ja/Nein/Unklar
             - **Begründung:** Warum oder warum nicht
-            - **Weitere Voraussetzungen:** ggf. ergänzende Anforderungen (z. B. Sprachkenntnisse)
-            - **Bewerbungsunterlagen:** Welche Dokumente müssen eingereicht werden (z. B. Zeugnisse, Lebenslauf)
+            - **ECTS-Vergleich:** Liste Soll/Ist und Bewertung auf
+            - **Weitere Voraussetzungen:** Note, Berufserfahrung, Englischkenntnisse
+            - **Bewerbungsunterlagen:** Welche Unterlagen erforderlich sind
             """
         else:
-            # 🟨 Masterbewerber → Extern vs Intern unterscheiden
-            if nutzerkategorie == "extern":
-                user_prompt = f"""
-                Du bist Bifi, der Studienberater der HSBI.
-                Der Bewerber ist interner Masterbewerber.
+            # 🟩 INTERNER MASTERBEWERBER MIT ECHTEM ECTS-VERGLEICH ------------------
+            
+            # 🆕 1️⃣ ECTS berechnen (Ist-Werte aus dem geladenen Regelwerk)
+            ects_ist = calculate_bachelor_ects(
+                bachelorstudiengang,
+                applicant_data.get("studienart", ""),
+                applicant_data.get("vertiefung", ""),
+                rules=rules,
+            )
 
-                Hier sind die bereits automatisch ausgewerteten Ergebnisse aus der Excel-Datenbasis:
+            
+            # 🆕 2️⃣ Soll-Werte aus Rules extrahieren
+            ects_soll = {}
+            if "Studiengänge" in rules and masterstudiengang in rules["Studiengänge"]:
+                ects_soll = rules["Studiengänge"][masterstudiengang].get("ECTS_Anforderungen", {})
+
+            # 🧮 Automatische Entscheidung basierend auf Soll-/Ist-ECTS
+            auto_decision, auto_reason, ects_comparison_text = evaluate_ects_decision(ects_soll, ects_ist)
+
+
+            # 🆕 3️⃣ ECTS schön formatieren
+            ects_ist_text = (
+                "\n".join([f"- {k}: {v} ECTS" for k, v in ects_ist.items()])
+                if ects_ist else "- Keine Daten verfügbar"
+            )
+            ects_soll_text = (
+                "\n".join([f"- {k}: {v} ECTS" for k, v in ects_soll.items()])
+                if ects_soll else "- Keine Angaben verfügbar"
+            )
+
+            # 🆕 4️⃣ Prompt vorbereiten
+            user_prompt = f"""
+            Du bist Bifi, der digitale Studienberater der Hochschule Bielefeld (HSBI).
+            Der Bewerber ist interner Masterbewerber.
 
-                Automatische Entscheidung: {auto_decision}
-                Automatische Begründung: {auto_reason}
+            Deine Aufgabe:
+            🟩 Verwende ausschließlich die automatisch berechnete Entscheidung und Begründung unten.
+            🟥 Ändere sie nicht und rechne NICHT selbst mit den ECTS-Werten.
 
-                Bewerberdaten:
-                {json.dumps(applicant_data, indent=2, ensure_ascii=False)}
+            ---
 
-                ECTS-Vergleich laut Excel-Daten:
+            📊 **Automatische Bewertung:**
+            - Entscheidung: **{auto_decision}**
+            - Begründung: **{auto_reason}**
 
-                Soll:
-                {ects_soll_text}
+            ---
 
-                Ist (berechnet aus Bachelor-Struktur):
-                {ects_ist_text}
+            📘 **ECTS-Vergleich laut Excel-Daten:**
 
-                Analysiere die Ergebnisse. Verwende die automatische Entscheidung und Begründung als Grundlage.
-                Formuliere sie im freundlichen, klaren Markdown-Stil.
+            **Soll-Werte:**
+            {ects_soll_text}
 
-                Antworte im Markdown-Format:
-                - **Entscheidung:** Ja/Nein/Unklar
-                - **Begründung:** Warum oder warum nicht
-                - **ECTS-Vergleich:** Liste Soll/Ist und Bewertung auf
-                - **Weitere Voraussetzungen:** Note, Berufserfahrung, Englischkenntnisse
-                - **Bewerbungsunterlagen:** Welche Unterlagen erforderlich sind
-                """
-            else:
-                # 🟩 INTERNER MASTERBEWERBER MIT ECHTEM ECTS-VERGLEICH ------------------
-                
-                # 🆕 1️⃣ Excel-Daten laden
-                df_zusammensetzung = pd.read_excel("zulassung.xlsx", sheet_name="Modulzusammensetzung")
-                df_modules = pd.read_excel("zulassung.xlsx", sheet_name="Module")
-
-                # 🆕 2️⃣ ECTS berechnen (Ist-Werte)
-                ects_ist = calculate_bachelor_ects(
-                    bachelorstudiengang,
-                    applicant_data.get("studienart", ""),
-                    applicant_data.get("vertiefung", ""),
-                )
+            **Ist-Werte (berechnet aus Bachelor-Struktur):**
+            {ects_ist_text}
 
-                
-                # 🆕 3️⃣ Soll-Werte aus Rules extrahieren
-                ects_soll = {}
-                if "Studiengänge" in rules and masterstudiengang in rules["Studiengänge"]:
-                    ects_soll = rules["Studiengänge"][masterstudiengang].get("ECTS_Anforderungen", {})
+            **Direkter Vergleich:**
+            {ects_comparison_text}
 
-                # 🧮 Automatische Entscheidung basierend auf Soll-/Ist-ECTS
-                auto_decision, auto_reason, ects_comparison_text = evaluate_ects_decision(ects_soll, ects_ist)
+            ---
 
+            📋 **Bewerberdaten:**
+            {json.dumps(applicant_data, indent=2, ensure_ascii=False)}
 
-                # 🆕 4️⃣ ECTS schön formatieren
-                ects_ist_text = (
-                    "\n".join([f"- {k}: {v} ECTS" for k, v in ects_ist.items()])
-                    if ects_ist else "- Keine Daten verfügbar"
-                )
-                ects_soll_text = (
-                    "\n".join([f"- {k}: {v} ECTS" for k, v in ects_soll.items()])
-                    if ects_soll else "- Keine Angaben verfügbar"
-                )
+            ---
 
-                # 🆕 5️⃣ Prompt vorbereiten
-                user_prompt = f"""
-                Du bist Bifi, der digitale Studienberater der Hochschule Bielefeld (HSBI).
-                Der Bewerber ist interner Masterbewerber.
+            🧠 **Deine Aufgabe:**
+            Formuliere die endgültige Rückmeldung an den Bewerber basierend auf diesen Daten.
+            Verwende ausschließlich die automatische Entscheidung und Begründung oben und schreibe
+            eine klare, freundliche und professionelle Antwort im Markdown-Format.
 
-                Deine Aufgabe:
-                🟩 Verwende ausschließlich die automatisch berechnete Entscheidung und Begründung unten.
-                🟥 Ändere sie nicht und rechne NICHT selbst mit den ECTS-Werten.
+            Das Format muss exakt so aussehen:
 
-                ---
+            - **Entscheidung:** {auto_decision}
+            - **Begründung:** Formuliere die automatische Begründung flüssig und verständlich.
+            - **ECTS-Vergleich:** Gib den direkten Vergleich aus ({ects_comparison_text}) und erkläre kurz, was das bedeutet.
+            - **Weitere Voraussetzungen:** Erwähne Note, Berufserfahrung und Englischkenntnisse aus den Bewerberdaten.
+            - **Bewerbungsunterlagen:** Liste auf, welche Unterlagen der Bewerber einreichen sollte.
 
-                📊 **Automatische Bewertung:**
-                - Entscheidung: **{auto_decision}**
-                - Begründung: **{auto_reason}**
+            ❗Wichtig:
+            - Du darfst keine neuen ECTS-Werte berechnen.
+            - Du darfst die Entscheidung nicht verändern.
+            - Antworte ausschließlich im **Markdown-Format** ohne Emojis oder Symbole.
+            """
 
-                ---
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ], None
 
-                📘 **ECTS-Vergleich laut Excel-Daten:**
 
-                **Soll-Werte:**
-                {ects_soll_text}
+def parse_decision_response(response) -> dict:
+    """Extrahiert Text und Entscheidung (Ja/Nein/Unklar) aus der OpenAI-Antwort."""
+    decision_text = ""
+    if hasattr(response, "choices") and len(response.choices) > 0:
+        decision_text = response.choices[0].message.content.strip()
+    with span("response_format"):
+        return decision_from_text(decision_text)
 
-                **Ist-Werte (berechnet aus Bachelor-Struktur):**
-                {ects_ist_text}
 
-                **Direkter Vergleich:**
-                {ects_comparison_text}
+def decision_from_text(decision_text: str) -> dict:
+    """Formatiert den GPT-Text und liest die Entscheidung (Ja/Nein/Unklar) aus."""
+    decision_text = (decision_text or "").strip()
 
-                ---
+    # 🔹 Formatieren oder Fallback
+    if not decision_text:
+        return {
+            "formatted_response": NO_ANSWER_TEXT,
+            "decision": "Unklar"
+        }
 
-                📋 **Bewerberdaten:**
-                {json.dumps(applicant_data, indent=2, ensure_ascii=False)}
+    # 🔍 Entscheidung (Ja/Nein/Unklar) aus dem GPT-Text extrahieren
+    match = re.search(r"(?i)\b(ja|nein|unklar)\b", decision_text)
+    decision_value = match.group(1).capitalize() if match else "Unklar"
 
-                ---
+    # 🧩 Immer Entscheidung mitsenden
+    return {
+        "formatted_response": format_markdown_response(decision_text),
+        "decision": decision_value
+    }
 
-                🧠 **Deine Aufgabe:**
-                Formuliere die endgültige Rückmeldung an den Bewerber basierend auf diesen Daten.
-                Verwende ausschließlich die automatische Entscheidung und Begründung oben und schreibe
-                eine klare, freundliche und professionelle Antwort im Markdown-Format.
 
-                Das Format muss exakt so aussehen:
+def _decision_cache_key(applicant_data: dict, rules: dict) -> str:
+    # Antwortmodus gehört zum Schlüssel, sonst liefert ein Moduswechsel alte Texte
+    return profile_key(applicant_data, f"{getattr(rules, 'version', None)}:{DECISION_MODE}")
 
-                - **Entscheidung:** {auto_decision}
-                - **Begründung:** Formuliere die automatische Begründung flüssig und verständlich.
-                - **ECTS-Vergleich:** Gib den direkten Vergleich aus ({ects_comparison_text}) und erkläre kurz, was das bedeutet.
-                - **Weitere Voraussetzungen:** Erwähne Note, Berufserfahrung und Englischkenntnisse aus den Bewerberdaten.
-                - **Bewerbungsunterlagen:** Liste auf, welche Unterlagen der Bewerber einreichen sollte.
 
-                ❗Wichtig:
-                - Du darfst keine neuen ECTS-Werte berechnen.
-                - Du darfst die Entscheidung nicht verändern.
-                - Antworte ausschließlich im **Markdown-Format** ohne Emojis oder Symbole.
-                """
+def _usage_tokens(response_or_chunk) -> int:
+    usage = getattr(response_or_chunk, "usage", None)
+    return getattr(usage, "total_tokens", 0) or 0
 
-        # 🔹 GPT-Aufruf
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.2
-        )
 
-        # 🔹 Antwort verarbeiten
-        decision_text = ""
-        if hasattr(response, "choices") and len(response.choices) > 0:
-            decision_text = response.choices[0].message.content.strip()
+def _count_llm_call(outcome: str, tokens: int = 0):
+    LLM_CALLS.inc(outcome=outcome)
+    if tokens:
+        LLM_TOKENS.inc(tokens)
 
-        # 🔹 Entscheidung direkt aus dem GPT-Text extrahieren
-        decision_match = re.search(r"Entscheidung:\s*(Ja|Nein|Unklar)", decision_text, re.IGNORECASE)
-        decision_value = decision_match.group(1).capitalize() if decision_match else "Unklar"
 
-        # 🔹 Formatieren oder Fallback
-        if not decision_text:
-            formatted_output = "⚠️ Keine Antwort vom Entscheidungsmodul erhalten."
-            decision_value = "Unklar"
-        else:
-            formatted_output = format_markdown_response(decision_text)
+def _cache_decision(cache_key: str, result: dict, latency: float, tokens: int):
+    """Legt erfolgreiche GPT-Antworten inkl. Latenz und Tokenverbrauch im Cache ab."""
+    if result["formatted_response"] == NO_ANSWER_TEXT:
+        return
+    decision_cache.set(cache_key, result, latency=latency, tokens=tokens)
 
-            # 🔍 Entscheidung (Ja/Nein/Unklar) aus dem GPT-Text extrahieren
-            match = re.search(r"(?i)\b(ja|nein|unklar)\b", decision_text)
-            decision_value = match.group(1).capitalize() if match else "Unklar"
 
-        # 🧩 Immer Entscheidung mitsenden
-        return {
-            "formatted_response": formatted_output,
-            "decision": decision_value
-        }
+async def _cache_decision_async(cache_key: str, result: dict, latency: float, tokens: int):
+    """Wie _cache_decision, ohne die Event-Loop mit SQLite-Zugriffen zu blockieren."""
+    if result["formatted_response"] == NO_ANSWER_TEXT:
+        return
+    await decision_cache.set_async(cache_key, result, latency=latency, tokens=tokens)
+
+
+def _error_result(e: Exception) -> dict:
+    return {
+        "formatted_response": f"❌ Fehler bei der Entscheidungsanalyse: {str(e)}",
+        "decision": "Unklar"
+    }
+
+
+def get_openai_decision(applicant_data: dict, rules: dict):
+    """
+    Übergibt die gesammelten Bewerberdaten und Studienregeln an OpenAI,
+    um automatisch zu prüfen, ob die Voraussetzungen erfüllt sind (synchron).
+    """
+    try:
+        with span("prompt_build"):
+            messages, fixed_result = build_decision_messages(applicant_data, rules)
+        if fixed_result is not None:
+            return fixed_result
+
+        cache_key = _decision_cache_key(applicant_data, rules)
+        cached = decision_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        started = time.perf_counter()
+        try:
+            with span("llm_call"):
+                response = _sync_client().chat.completions.create(
+                    model=OPENAI_MODEL,
+                    messages=messages,
+                    temperature=0.2
+                )
+        except Exception:
+            _count_llm_call("error")
+            raise
+        _count_llm_call("ok", _usage_tokens(response))
+        result = parse_decision_response(response)
+        _cache_decision(cache_key, result, time.perf_counter() - started, _usage_tokens(response))
+        return result
 
     except Exception as e:
-        return {
-            "formatted_response": f"❌ Fehler bei der Entscheidungsanalyse: {str(e)}",
-            "decision": "Unklar"
-        }
+        return _fallback_result(applicant_data, rules, e)
+
+
+async def get_openai_decision_async(applicant_data: dict, rules: dict):
+    """
+    Async-Variante für die Chat-Route: nutzt den gepoolten AsyncOpenAI-Client,
+    blockiert den Event-Loop nicht und begrenzt gleichzeitige Modellaufrufe.
+    """
+    try:
+        with span("prompt_build"):
+            messages, fixed_result = build_decision_messages(applicant_data, rules)
+        if fixed_result is not None:
+            return fixed_result
+
+        cache_key = _decision_cache_key(applicant_data, rules)
+        cached = await decision_cache.get_async(cache_key)
+        if cached is not None:
+            return cached
+
+        started = time.perf_counter()
+        try:
+            with span("llm_call"):
+                async with _llm_semaphore:
+                    response = await _async_client().chat.completions.create(
+                        model=OPENAI_MODEL,
+                        messages=messages,
+                        temperature=0.2
+                    )
+        except Exception:
+            _count_llm_call("error")
+            raise
+        _count_llm_call("ok", _usage_tokens(response))
+        result = parse_decision_response(response)
+        await _cache_decision_async(cache_key, result, time.perf_counter() - started, _usage_tokens(response))
+        return result
+
+    except Exception as e:
+        return _fallback_result(applicant_data, rules, e)
+
+
+async def stream_openai_decision(applicant_data: dict, rules: dict):
+    """
+    Streamt die Entscheidung als Async-Generator:
+    ("chunk", html) für jedes darstellbare Stück, am Ende ("done", ergebnis).
+    Feste Antworten und Cache-Treffer kommen als ein einziger Chunk.
+    """
+    try:
+        with span("prompt_build"):
+            messages, fixed_result = build_decision_messages(applicant_data, rules)
+        if fixed_result is not None:
+            yield "chunk", fixed_result["formatted_response"]
+            yield "done", fixed_result
+            return
+
+        cache_key = _decision_cache_key(applicant_data, rules)
+        cached = await decision_cache.get_async(cache_key)
+        if cached is not None:
+            yield "chunk", cached["formatted_response"]
+            yield "done", cached
+            return
+
+        started = time.perf_counter()
+        formatter = MarkdownStreamFormatter()
+        parts = []
+        tokens = 0
+        box_opened = False
+
+        try:
+            async with _llm_semaphore:
+                stream = await _async_client().chat.completions.create(
+                    model=OPENAI_MODEL,
+                    messages=messages,
+                    temperature=0.2,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+                async for chunk in stream:
+                    tokens = _usage_tokens(chunk) or tokens
+                    if not chunk.choices:
+                        continue
+                    if not parts:
+                        STAGE_SECONDS.observe(time.perf_counter() - started, stage="llm_first_token")
+                    delta = chunk.choices[0].delta.content or ""
+                    parts.append(delta)
+                    html = formatter.feed(delta)
+                    if html:
+                        if not box_opened:
+                            html = RESPONSE_BOX_START + html
+                            box_opened = True
+                        yield "chunk", html
+        except Exception:
+            _count_llm_call("error")
+            raise
+        # Ganzer Stream inkl. Weitergabe der Chunks an den Client
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage="llm_call")
+        _count_llm_call("ok", tokens)
+
+        tail = formatter.finish()
+        if box_opened or tail:
+            yield "chunk", ("" if box_opened else RESPONSE_BOX_START) + tail + RESPONSE_BOX_END
+
+        with span("response_format"):
+            result = decision_from_text("".join(parts))
+        await _cache_decision_async(cache_key, result, time.perf_counter() - started, tokens)
+        yield "done", result
+
+    except Exception as e:
+        yield "done", _fallback_result(applicant_data, rules, e)
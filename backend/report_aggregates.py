@@ -0,0 +1,165 @@
+import os
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+from structured_log import get_logger
+
+# Wie viele Tage die Tages-Buckets zurückreichen; größere Zeiträume rechnen den Report vollständig
+REPORT_MAX_DAYS = int(os.getenv("REPORT_MAX_DAYS", "400"))
+
+log = get_logger("report_aggregates")
+
+
+class DayBucket:
+    """Kennzahlen eines Kalendertags."""
+
+    __slots__ = ("users", "completed", "nutzertypen", "programs")
+
+    def __init__(self):
+        self.users = set()
+        self.completed = set()
+        self.nutzertypen = Counter()
+        # Master-Studiengänge von Nutzern, deren letzter Eintrag an diesem Tag ein Abschluss ist
+        self.programs = Counter()
+
+
+class ReportAggregates:
+    """
+    Laufend gepflegte Report-Kennzahlen in Tages-Buckets. Jede geschriebene
+    Logzeile aktualisiert die Buckets in O(1); ein Report über N Tage führt
+    nur N Buckets zusammen statt das gesamte Log neu einzulesen.
+    Das Zeitfenster ist tagesgenau (der älteste Tag zählt vollständig).
+    """
+
+    def __init__(self, max_days=REPORT_MAX_DAYS):
+        self.max_days = max_days
+        self.ready = False
+        self._days = {}
+        # user_id → (timestamp, Tag, gezählter Studiengang oder None) des letzten Eintrags
+        self._last = {}
+        self._oldest_day = None
+        self._lock = threading.Lock()
+        # Fertige Reports je `days`, gültig bis neue Daten kommen oder der Tag wechselt
+        self._version = 0
+        self._report_cache = {}
+
+    def rebuild(self, rows):
+        """Baut alle Buckets aus Logzeilen (Spalten wie LOG_HEADER) neu auf."""
+        with self._lock:
+            self._days = {}
+            self._last = {}
+            self._oldest_day = self._cutoff_day()
+            for row in rows:
+                self._add(row)
+            self._version += 1
+            self.ready = True
+
+    def add_rows(self, rows):
+        """Übernimmt frisch geschriebene Zeilen (ignoriert, solange noch nicht aufgebaut)."""
+        if not self.ready:
+            return
+        with self._lock:
+            cutoff = self._cutoff_day()
+            if cutoff != self._oldest_day:
+                self._prune(cutoff)
+            for row in rows:
+                self._add(row)
+            self._version += 1
+
+    def covers(self, days: int) -> bool:
+        return self.ready and days <= self.max_days
+
+    def report(self, days: int = 30) -> dict:
+        """Dashboard-Kennzahlen im Format von generate_report aus den Buckets der letzten `days` Tage."""
+        today = datetime.now().date()
+        start = (datetime.now() - timedelta(days=days)).date()
+
+        cache_key = (self._version, today)
+        cached = self._report_cache.get(days)
+        if cached is not None and cached[0] == cache_key:
+            return dict(cached[1])
+
+        users, completed = set(), set()
+        nutzertypen, programs = Counter(), Counter()
+        with self._lock:
+            for offset in range((today - start).days + 1):
+                bucket = self._days.get((start + timedelta(days=offset)).isoformat())
+                if bucket is None:
+                    continue
+                users |= bucket.users
+                completed |= bucket.completed
+                nutzertypen.update(bucket.nutzertypen)
+                programs.update(bucket.programs)
+
+        total_users = len(users)
+        completed_users = len(completed)
+        dropped_users = total_users - completed_users
+        dropout_rate = round((dropped_users / total_users * 100), 2) if total_users > 0 else 0
+
+        log.debug("report_berechnet", total_users=total_users, days=days, incremental=True)
+
+        report = {
+            "period_days": days,
+            "total_users": total_users,
+            "completed": completed_users,
+            "dropped": dropped_users,
+            "dropout_rate": dropout_rate,
+            "beliebteste_studiengänge": [[name, count] for name, count in programs.most_common(5) if count > 0],
+            "nutzertypen": {name: count for name, count in nutzertypen.most_common() if count > 0}
+        }
+        if self._version == cache_key[0]:
+            self._report_cache[days] = (cache_key, report)
+        return dict(report)
+
+    def _cutoff_day(self) -> str:
+        return (datetime.now() - timedelta(days=self.max_days)).date().isoformat()
+
+    def _add(self, row):
+        timestamp, user_id, abschlussziel, studiengang, nutzerkategorie, entscheidung, status = (
+            (list(row) + [None] * 7)[:7]
+        )
+        try:
+            day = datetime.fromisoformat(str(timestamp)).date().isoformat()
+        except ValueError:
+            return
+        if day < self._oldest_day:
+            return
+
+        bucket = self._days.get(day)
+        if bucket is None:
+            bucket = self._days[day] = DayBucket()
+
+        bucket.users.add(user_id)
+        if status == "abgeschlossen" and str(entscheidung).lower() in ("ja", "unklar"):
+            bucket.completed.add(user_id)
+
+        kategorie = str(nutzerkategorie).strip()
+        if kategorie != "Unbekannt":
+            bucket.nutzertypen[kategorie] += 1
+
+        # Studiengänge zählen nur für den jeweils letzten Eintrag eines Nutzers
+        last = self._last.get(user_id)
+        if last is not None and last[0] > timestamp:
+            return
+        if last is not None and last[2] is not None and last[1] in self._days:
+            self._days[last[1]].programs[last[2]] -= 1
+
+        program = str(studiengang).strip()
+        counted = None
+        if (
+            str(status).strip().lower() == "abgeschlossen"
+            and "master" in str(abschlussziel).strip().lower()
+            and program != "Unbekannt"
+        ):
+            counted = program
+            bucket.programs[program] += 1
+        self._last[user_id] = (timestamp, day, counted)
+
+    def _prune(self, cutoff: str):
+        # Tageswechsel → Buckets und Nutzer außerhalb des Vorhaltezeitraums verwerfen
+        for day in [day for day in self._days if day < cutoff]:
+            del self._days[day]
+        for user_id in [user_id for user_id, last in self._last.items() if last[1] < cutoff]:
+            del self._last[user_id]
+        self._oldest_day = cutoff
@@ -1,69 +1,470 @@
-import pandas as pd
+import copy
+import hashlib
+import os
+import pickle
+from contextlib import contextmanager
 
-def get_vertiefungen_for(studiengang: str, studienart: str = None) -> list:
+import numpy as np
+
+from fuzzy_match import TrigramIndex
+from metrics import span
+from structured_log import get_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: kein Dateilock, Worker parsen im Zweifel parallel
+    fcntl = None
+
+# Kategorien, die bei der ECTS-Berechnung berücksichtigt werden (Spalten im Tab "Module")
+ECTS_KATEGORIEN = ["mathematik", "technik", "naturwissenschaft", "betriebswirtschaft", "informatik", "elektrotechnik"]
+ECTS_PRO_MODUL = 5
+
+# Format des Startup-Caches; erhöhen, sobald sich der Aufbau von RulesSnapshot ändert
+CACHE_FORMAT = 4
+
+# Numerische Matrizen liegen in einem versionierten Segment, das alle Worker read-only
+# per mmap einblenden (gemeinsame Seiten im Page-Cache statt einer Kopie pro Prozess).
+# RULES_SHM_DIR=/dev/shm legt die Segmente in den Shared Memory (Standard: neben der Excel-Datei).
+RULES_SHARED_SEGMENT = os.getenv("RULES_SHARED_SEGMENT", "1") == "1"
+RULES_SHM_DIR = os.getenv("RULES_SHM_DIR") or None
+SHARED_ARRAYS = ("module_matrix", "curriculum_masks", "ects_matrix", "soll_matrix")
+_SEGMENT_ALIGN = 64
+
+log = get_logger("rules_excel")
+
+
+def _norm(value) -> str:
+    """Normalisiert Excel-Werte für Lookups (Leerzeichen, Groß-/Kleinschreibung, NaN)."""
+    if value is None:
+        return ""
+    text = str(value).strip().lower()
+    return "" if text == "nan" else text
+
+
+class RulesSnapshot(dict):
     """
-    Gibt alle Vertiefungen aus der Excel-Datei zurück,
-    die zu einem bestimmten Bachelorstudiengang (und optional Studienart) gehören.
-    Funktioniert robust gegen Leerzeichen, Groß-/Kleinschreibung und Tippfehler.
+    Einmalig geparstes Regelwerk aus der Excel-Datei.
+    Verhält sich wie das bisherige rules-Dict ("Allgemein", "Studiengänge", "Module_ECTS")
+    und hält zusätzlich normalisierte Indizes für die Lookups pro Chat-Turn.
+    """
+
+    def __init__(self, general, programs, module_ects, module_names, module_matrix, categories, curricula,
+                 bachelor_names=None):
+        super().__init__({
+            "Allgemein": general,
+            "Studiengänge": programs,
+            "Module_ECTS": module_ects
+        })
+        # Versions-ID (Inhalts-Hash der Excel-Datei), wird von load_excel_rules gesetzt
+        self.version = None
+        # kleingeschriebene ECTS-Kategorien aus Tab "Module" (Spalten der Matrizen)
+        self.categories = categories
+        # (bachelorstudiengang, studienart) → {Vertiefung: [Pflichtmodule]}
+        self.curricula = curricula
+
+        # === Matrix-Darstellung ===
+        # Modul × Kategorie (ECTS), Zeilen in der Reihenfolge von module_names
+        self.module_names = module_names
+        self.module_index = {name: i for i, name in enumerate(module_names)}
+        self.module_matrix = module_matrix
+        # Curriculum × Modul als Bitmaske, Zeilen = (bachelorstudiengang, studienart, vertiefung)
+        self.curriculum_keys, self.curriculum_masks, self.missing_modules = _build_curriculum_masks(
+            self.module_index, curricula
+        )
+        self.curriculum_index = {key: i for i, key in enumerate(self.curriculum_keys)}
+        # Curriculum × Kategorie: alle ECTS-Summen als ein Matrixprodukt
+        self.ects_matrix = self.ects_sums(self.curriculum_masks)
+
+        # Soll-ECTS: Masterstudiengang × Kategorie (NaN = keine Anforderung). Kategorien aus
+        # "Studiengänge", die im Tab "Module" fehlen, bekommen eigene Spalten mit Ist = 0.
+        self.program_names = list(programs)
+        requirements = [
+            {str(k).strip().lower(): float(v) for k, v in programs[p].get("ECTS_Anforderungen", {}).items() if v is not None}
+            for p in self.program_names
+        ]
+        self.requirement_categories = categories + sorted(
+            {cat for req in requirements for cat in req} - set(categories)
+        )
+        column = {cat: i for i, cat in enumerate(self.requirement_categories)}
+        self.soll_matrix = np.full((len(self.program_names), len(self.requirement_categories)), np.nan)
+        for row, req in enumerate(requirements):
+            for cat, ects in req.items():
+                self.soll_matrix[row, column[cat]] = ects
+
+        # bachelorstudiengang → sortierte Vertiefungen (über alle Studienarten)
+        self.vertiefungen_by_bachelor = {}
+        for (bachelor, _), entries in curricula.items():
+            known = self.vertiefungen_by_bachelor.setdefault(bachelor, [])
+            known.extend(v for v in entries if v not in known)
+        for bachelor in self.vertiefungen_by_bachelor:
+            self.vertiefungen_by_bachelor[bachelor].sort()
+
+        # normalisierter Bachelorname → Schreibweise aus der Excel-Datei
+        self.bachelor_names = bachelor_names or {b: b.title() for b in self.vertiefungen_by_bachelor}
+        # Trigramm-Indizes für Freitext-Antworten (Tippfehler, Schreibvarianten)
+        self.bachelor_index = TrigramIndex(self.bachelor_names.values())
+        self.vertiefung_index = TrigramIndex(
+            sorted({v for entries in self.vertiefungen_by_bachelor.values() for v in entries})
+        )
+
+    def vertiefungen(self, studiengang: str, studienart: str = None) -> list:
+        """Sortierte Vertiefungen zu einem Bachelorstudiengang (optional je Studienart)."""
+        bachelor = _norm(studiengang)
+        if not studienart:
+            return list(self.vertiefungen_by_bachelor.get(bachelor, []))
+        return sorted(self.curricula.get((bachelor, _norm(studienart)), {}))
+
+    def ects_for(self, studiengang: str, studienart: str, vertiefung: str) -> dict:
+        """Vorberechnete ECTS pro Kategorie einer Kombination (leer, wenn unbekannt)."""
+        row = self.curriculum_index.get((_norm(studiengang), _norm(studienart), _norm(vertiefung)))
+        if row is None:
+            return {}
+        return dict(zip(self.categories, self.ects_matrix[row].tolist()))
+
+    def ects_sums(self, masks) -> np.ndarray:
+        """ECTS pro Kategorie für eine (Modul-Bitmaske) oder viele Curricula (Masken als Zeilen)."""
+        return np.asarray(masks, dtype=float) @ self.module_matrix
+
+    def check_programs(self, ects_ist) -> list:
+        """
+        Soll/Ist-Vergleich gegen alle Masterstudiengänge auf einmal (Logik wie
+        evaluate_ects_decision): "Für welche Master erfülle ich die ECTS-Anforderungen?".
+        `ects_ist` ist ein Dict {Kategorie: ECTS} oder ein Vektor über `categories`.
+        """
+        if isinstance(ects_ist, dict):
+            vector = np.zeros(len(self.requirement_categories))
+            column = {cat: i for i, cat in enumerate(self.requirement_categories)}
+            for cat, ects in ects_ist.items():
+                if ects is not None and str(cat).strip().lower() in column:
+                    vector[column[str(cat).strip().lower()]] = float(ects)
+            has_ist = bool(ects_ist)
+        else:
+            vector = np.zeros(len(self.requirement_categories))
+            vector[:len(self.categories)] = ects_ist
+            has_ist = len(self.categories) > 0
+
+        required = ~np.isnan(self.soll_matrix)
+        has_data = required.any(axis=1) & has_ist
+        deficit = required & (vector < self.soll_matrix) & has_data[:, None]
+        fehlend = np.where(deficit, np.round(np.nan_to_num(self.soll_matrix) - vector, 2), 0.0).sum(axis=1)
+        decisions = np.where(~has_data, "Unklar", np.where(fehlend == 0, "Ja", np.where(fehlend <= 10, "Unklar", "Nein")))
+
+        return [
+            {
+                "studiengang": program,
+                "entscheidung": str(decisions[row]),
+                "fehlende_ects": round(float(fehlend[row]), 2) if has_data[row] else None,
+                "defizite": [cat for cat, missing in zip(self.requirement_categories, deficit[row]) if missing]
+            }
+            for row, program in enumerate(self.program_names)
+        ]
+
+    def match_bachelor(self, text: str) -> dict:
+        """Freitext → kanonischer Bachelorstudiengang (siehe TrigramIndex.resolve)."""
+        return self.bachelor_index.resolve(text)
+
+    def match_vertiefung(self, text: str, studiengang: str, studienart: str = None) -> dict:
+        """Freitext → Vertiefung, beschränkt auf die Vertiefungen des Studiengangs."""
+        return self.vertiefung_index.resolve(text, allowed=set(self.vertiefungen(studiengang, studienart)))
+
+
+def _build_curriculum_masks(module_index, curricula):
+    """
+    Baut für jede Kombination (Bachelor, Studienart, Vertiefung) die Bitmaske ihrer
+    Pflichtmodule über alle Module. Module aus der Modulzusammensetzung, die im
+    Tab "Module" fehlen, werden pro Kombination gesammelt statt still ignoriert.
+    """
+    keys = []
+    rows = []
+    missing_modules = {}
+
+    for (bachelor, studienart), entries in curricula.items():
+        for vertiefung, module_list in entries.items():
+            if not module_list:
+                continue
+            key = (bachelor, studienart, _norm(vertiefung))
+            # Jedes Modul zählt nur einmal, auch wenn es mehrfach gelistet ist
+            names = dict.fromkeys(m.strip().lower() for m in module_list)
+            rows.append([module_index[name] for name in names if name in module_index])
+            keys.append(key)
+            missing = [name for name in names if name not in module_index]
+            if missing:
+                missing_modules[key] = missing
+
+    masks = np.zeros((len(keys), len(module_index)), dtype=bool)
+    for row, positions in enumerate(rows):
+        masks[row, positions] = True
+    return keys, masks, missing_modules
+
+
+def _find_column(columns, *needles):
+    """Findet eine Spalte dynamisch anhand von Teilstrings im (kleingeschriebenen) Namen."""
+    return next((c for c in columns if any(n in str(c).strip().lower() for n in needles)), None)
+
+
+def _build_module_matrix(df_modules):
     """
+    Baut die Modul × Kategorie-Matrix ('x' = 5 ECTS) über die normalisierten Modulnamen
+    sowie die ECTS-Summen je Kategorienspalte (für "Module_ECTS").
+    """
+    col_modname = _find_column(df_modules.columns, "modul")
+    if col_modname is None:
+        raise KeyError("Spalte mit Modulnamen nicht gefunden (z. B. 'Modulbezeichnung').")
+
+    category_cols = [
+        c for c in df_modules.columns
+        if any(k in str(c).strip().lower() for k in ECTS_KATEGORIEN)
+    ]
+    categories = [str(c).strip().lower() for c in category_cols]
+
     import pandas as pd
 
-    try:
-        df = pd.read_excel("zulassung.xlsx", sheet_name="Modulzusammensetzung")
+    marks = df_modules[category_cols].astype(str).apply(lambda col: col.str.strip().str.lower()) == "x"
+    ects = marks.to_numpy(dtype=float) * ECTS_PRO_MODUL
+    module_ects = dict(zip(category_cols, ects.sum(axis=0).tolist()))
+
+    # Doppelte Modulnamen zählen mehrfach (wie bisher beim isin-Filter)
+    names = df_modules[col_modname].map(_norm).to_numpy()
+    named = names != ""
+    grouped = pd.DataFrame(ects[named]).groupby(names[named], sort=True).sum()
+    module_matrix = grouped.to_numpy(dtype=float).reshape(len(grouped), len(categories))
+    return list(grouped.index), module_matrix, categories, module_ects
 
-        # Normalisiere Texte (entferne Leerzeichen, Kleinbuchstaben)
-        df["Bachelorstudiengang"] = df["Bachelorstudiengang"].astype(str).str.strip().str.lower()
-        df["Studienart"] = df["Studienart"].astype(str).str.strip().str.lower()
-        df["Vertiefung"] = df["Vertiefung"].astype(str).str.strip()
 
-        studiengang_norm = str(studiengang).strip().lower()
-        studienart_norm = str(studienart).strip().lower() if studienart else None
+def _build_curricula(df_zus):
+    """
+    Baut den Index (bachelorstudiengang, studienart) → {Vertiefung: [Pflichtmodule]}
+    sowie die Original-Schreibweise je normalisiertem Bachelornamen.
+    """
+    columns = list(df_zus.columns)
+    col_bachelor = _find_column(columns, "bachelor")
+    col_studienart = _find_column(columns, "studienart")
+    col_vertiefung = _find_column(columns, "vertiefung")
+    col_module = _find_column(columns, "pflicht", "modul")
+
+    if not all([col_bachelor, col_studienart, col_vertiefung, col_module]):
+        raise KeyError("Fehlende Spalten (Bachelorstudiengang / Studienart / Vertiefung / Pflichtmodule)")
+
+    curricula = {}
+    bachelor_names = {}
+    for _, row in df_zus.iterrows():
+        bachelor = _norm(row[col_bachelor])
+        vertiefung = str(row[col_vertiefung]).strip()
+        if not bachelor or _norm(vertiefung) == "":
+            continue
+        bachelor_names.setdefault(bachelor, str(row[col_bachelor]).strip())
 
-        # Filter anwenden
-        subset = df[df["Bachelorstudiengang"] == studiengang_norm]
-        if studienart_norm:
-            subset = subset[subset["Studienart"] == studienart_norm]
+        module_list = []
+        if _norm(row[col_module]):
+            module_list = [mod.strip() for mod in str(row[col_module]).split(",") if mod.strip()]
 
-        vertiefungen = subset["Vertiefung"].dropna().unique().tolist()
+        entries = curricula.setdefault((bachelor, _norm(row[col_studienart])), {})
+        entries.setdefault(vertiefung, []).extend(module_list)
 
-        # Filtere leere Strings heraus
-        vertiefungen = [v for v in vertiefungen if v and v.strip() != "" and v.lower() != "nan"]
+    return curricula, bachelor_names
 
-        print(f"[Excel] Vertiefungen gefunden für {studiengang} ({studienart}): {vertiefungen}")
-        return sorted(vertiefungen)
+
+def get_vertiefungen_for(studiengang: str, studienart: str = None, rules=None) -> list:
+    """
+    Gibt alle Vertiefungen aus dem Regelwerk zurück,
+    die zu einem bestimmten Bachelorstudiengang (und optional Studienart) gehören.
+    Funktioniert robust gegen Leerzeichen und Groß-/Kleinschreibung.
+    """
+    try:
+        rules = rules if rules is not None else get_rules()
+        with span("vertiefungen_lookup"):
+            vertiefungen = rules.vertiefungen(studiengang, studienart)
+
+        log.debug("vertiefungen_gefunden", studiengang=studiengang, studienart=studienart, vertiefungen=vertiefungen)
+        return vertiefungen
 
     except Exception as e:
-        print(f"[Fehler in get_vertiefungen_for]: {e}")
+        log.error("vertiefungen_fehler", studiengang=studiengang, studienart=studienart, error=str(e))
         return []
 
 
-def load_excel_rules(path="zulassung.xlsx"):
+def workbook_hash(path: str) -> str:
+    """Kurzer Inhalts-Hash der Excel-Datei, dient als Versions-ID und Cache-Schlüssel."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def cache_path_for(path: str) -> str:
+    """Pfad des Startup-Caches neben der Excel-Datei (z. B. zulassung.rules.pkl)."""
+    return os.path.splitext(path)[0] + ".rules.pkl"
+
+
+def segment_path_for(path: str, version: str) -> str:
+    """Pfad des Matrix-Segments einer Regelwerk-Version (z. B. zulassung.rules.5c403d43bda3.bin)."""
+    directory = RULES_SHM_DIR or os.path.dirname(os.path.abspath(path))
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(directory, f"{name}.rules.{version}.bin")
+
+
+def _write_segment(segment_path: str, rules) -> dict:
+    """Schreibt die Matrizen hintereinander (64-Byte-ausgerichtet) und liefert das Layout je Array."""
+    layout = {}
+    tmp_path = f"{segment_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            for name in SHARED_ARRAYS:
+                array = np.ascontiguousarray(getattr(rules, name))
+                f.write(b"\0" * (-f.tell() % _SEGMENT_ALIGN))
+                layout[name] = (array.dtype.str, array.shape, f.tell())
+                f.write(array.tobytes())
+        # Neue Version = neue Datei; bereits eingeblendete Segmente bleiben unverändert gültig
+        os.replace(tmp_path, segment_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return layout
+
+
+def _map_segment(segment_path: str, layout: dict) -> dict:
+    """Blendet das Segment read-only ein; die Arrays teilen sich den Speicher mit allen Workern."""
+    if os.path.getsize(segment_path) == 0:
+        return {name: np.empty(shape, dtype=dtype) for name, (dtype, shape, _) in layout.items()}
+    buffer = np.memmap(segment_path, dtype=np.uint8, mode="r")
+    return {
+        name: np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+        for name, (dtype, shape, offset) in layout.items()
+    }
+
+
+def _remove_old_segments(segment_path: str):
+    """Entfernt Segmente anderer Versionen; eingeblendete Seiten bleiben für laufende Worker erhalten."""
+    directory, name = os.path.split(segment_path)
+    prefix = name.split(".rules.")[0] + ".rules."
+    for entry in os.listdir(directory):
+        if entry.startswith(prefix) and entry.endswith(".bin") and entry != name:
+            try:
+                os.remove(os.path.join(directory, entry))
+            except OSError:
+                pass
+
+
+@contextmanager
+def _publish_lock(cache_path: str):
+    """Exklusiver Dateilock: nur ein Worker parst und veröffentlicht, die anderen lesen danach den Cache."""
+    if fcntl is None:
+        yield
+        return
+    with open(cache_path + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _read_rules_cache(cache_path: str, version: str, path: str):
+    """Lädt den serialisierten Snapshot, falls er zum aktuellen Inhalts-Hash passt, und blendet die Matrizen ein."""
+    try:
+        with open(cache_path, "rb") as f:
+            cached = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log.warning("cache_unlesbar", path=cache_path, error=str(e))
+        return None
+
+    if cached.get("format") != CACHE_FORMAT or cached.get("version") != version:
+        return None
+    rules = cached["rules"]
+    if cached.get("layout") is not None:
+        try:
+            arrays = _map_segment(segment_path_for(path, version), cached["layout"])
+        except (OSError, ValueError):
+            # Segment fehlt (z. B. gerade ersetzt) → wie Cache-Miss behandeln
+            return None
+        for name, array in arrays.items():
+            setattr(rules, name, array)
+    return rules
+
+
+def _write_rules_cache(cache_path: str, rules, path: str):
+    """
+    Veröffentlicht den Snapshot: erst das Matrix-Segment, dann atomar (tmp + rename) die
+    Metadaten, damit parallele Worker nie halbe Dateien lesen und erst danach umschalten.
+    """
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        payload = {"format": CACHE_FORMAT, "version": rules.version, "rules": rules, "layout": None}
+        if RULES_SHARED_SEGMENT:
+            segment_path = segment_path_for(path, rules.version)
+            payload["layout"] = _write_segment(segment_path, rules)
+            # Matrizen stehen im Segment, die Metadaten enthalten nur den Rest des Snapshots
+            shell = copy.copy(rules)
+            for name in SHARED_ARRAYS:
+                setattr(shell, name, None)
+            payload["rules"] = shell
+
+        with open(tmp_path, "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+        if RULES_SHARED_SEGMENT:
+            _remove_old_segments(segment_path)
+    except OSError as e:
+        log.warning("cache_schreiben_fehlgeschlagen", path=cache_path, error=str(e))
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_excel_rules(path="zulassung.xlsx", use_cache=True):
+    """
+    Liefert das Regelwerk als RulesSnapshot. Passt der Startup-Cache neben der
+    Excel-Datei zum Inhalts-Hash, wird er geladen (Matrizen per mmap aus dem
+    gemeinsamen Segment); sonst parst genau ein Worker die Excel-Datei und
+    veröffentlicht Cache und Segment neu, alle anderen übernehmen das Ergebnis.
+    """
+    with span("workbook_hash"):
+        version = workbook_hash(path)
+    cache_path = cache_path_for(path)
+
+    if not use_cache:
+        with span("workbook_parse"):
+            rules = _parse_workbook(path)
+        rules.version = version
+        return rules
+
+    with span("rules_cache_load"):
+        rules = _read_rules_cache(cache_path, version, path)
+    if rules is not None:
+        return rules
+
+    with _publish_lock(cache_path):
+        # Ein anderer Worker hat die Version evtl. veröffentlicht, während wir auf den Lock gewartet haben
+        with span("rules_cache_load"):
+            rules = _read_rules_cache(cache_path, version, path)
+        if rules is not None:
+            return rules
+
+        with span("workbook_parse"):
+            parsed = _parse_workbook(path)
+        parsed.version = version
+        _write_rules_cache(cache_path, parsed, path)
+
+    # Auch der veröffentlichende Worker nutzt die eingeblendeten Matrizen
+    rules = _read_rules_cache(cache_path, version, path)
+    return rules if rules is not None else parsed
+
+
+def _parse_workbook(path):
+    """
+    Liest alle Tabs der Excel-Datei ein und baut den RulesSnapshot
+    mit normalisierten Indizes für Module, Modulzusammensetzung und Studiengänge.
+    """
     import pandas as pd
 
     xls = pd.ExcelFile(path)
 
     # --- TAB 1: Module + ECTS-Bereiche -----------------------------
     df_modules = pd.read_excel(xls, "Module")
-    category_cols = [c for c in df_modules.columns if c != "Modulbezeichnung"]
-
-    # 🔹 "x" oder "X" → 1, leere Felder → 0, Zahlen bleiben Zahlen
-    for col in category_cols:
-        df_modules[col] = (
-            df_modules[col]
-            .astype(str)
-            .str.strip()
-            .replace({"x": 1, "X": 1, "": 0, "nan": 0})
-        )
-        try:
-            df_modules[col] = df_modules[col].astype(float)
-        except ValueError:
-            df_modules[col] = 0.0
-
-        # 🔹 Jedes Modul zählt 5 ECTS → multiplizieren
-        df_modules[col] = df_modules[col] * 5
-
-    # 🔹 Summen pro Kategorie (in ECTS)
-    module_ects = df_modules[category_cols].fillna(0).sum().to_dict()
+    # 🔹 Modul × Kategorie-Matrix ("x" = 5 ECTS) und Summen pro Kategorie (in ECTS)
+    module_names, module_matrix, categories, module_ects = _build_module_matrix(df_modules)
 
     # --- TAB 2: Studiengänge ---------------------------------------
     df_programs = pd.read_excel(xls, "Studiengänge")
@@ -81,16 +482,31 @@ def load_excel_rules(path="zulassung.xlsx"):
     df_general = pd.read_excel(xls, "Allgemein")
     general = dict(zip(df_general["Schlüssel"], df_general["Wert"]))
 
-    # -------- Gesamtes Regelwerk zurückgeben ------------------------
-    rules = {
-        "Allgemein": general,
-        "Studiengänge": programs,
-        "Module_ECTS": module_ects
-    }
+    # --- TAB 4: Modulzusammensetzung -------------------------------
+    df_zus = pd.read_excel(xls, "Modulzusammensetzung")
+    curricula, bachelor_names = _build_curricula(df_zus)
+
+    rules = RulesSnapshot(
+        general, programs, module_ects, module_names, module_matrix, categories, curricula, bachelor_names
+    )
+    if rules.missing_modules:
+        missing_names = sorted({m for names in rules.missing_modules.values() for m in names})
+        # Details je Kombination in rules.missing_modules
+        log.warning(
+            "module_fehlen", modules=len(missing_names), combinations=len(rules.missing_modules),
+            examples=missing_names[:10]
+        )
 
+    # -------- Gesamtes Regelwerk zurückgeben ------------------------
     return rules
 
 
+def get_rules(path="zulassung.xlsx"):
+    """Gibt die aktuell aktive Regelwerk-Version zurück (siehe rules_registry)."""
+    from rules_registry import get_registry
+    return get_registry(path).current()
+
+
 def get_general_requirements(rules):
     return rules["Allgemein"]
 
@@ -99,90 +515,28 @@ def get_program_requirements(rules, program):
     return rules["Studiengänge"].get(program)
 
 
-def calculate_bachelor_ects(studiengang: str, studienart: str, vertiefung: str):
+def calculate_bachelor_ects(studiengang: str, studienart: str, vertiefung: str, rules=None):
     """
     Berechnet die aufsummierten ECTS für einen bestimmten Bachelorstudiengang
-    basierend auf der Excel-Tabelle 'Modulzusammensetzung' und 'Module'.
-    Erkennt automatisch Schreibvarianten (Pflichtmodule, Prlichtmodule etc.)
-    und rechnet dynamisch nach Kategorien (Mathematik, Technik, Informatik, ...).
+    basierend auf den Tabs 'Modulzusammensetzung' und 'Module' des Regelwerks.
+    Die Summen pro Kategorie (Mathematik, Technik, Informatik, ...) werden beim
+    Laden vorberechnet, der Aufruf ist nur noch ein Lookup.
     """
 
     try:
-        # === 1️⃣ Modulzusammensetzung laden
-        df_zus = pd.read_excel("zulassung.xlsx", sheet_name="Modulzusammensetzung")
-        df_zus.columns = [str(c).strip().lower() for c in df_zus.columns]
-
-        # Spalten dynamisch finden
-        col_bachelor = next((c for c in df_zus.columns if "bachelor" in c), None)
-        col_studienart = next((c for c in df_zus.columns if "studienart" in c), None)
-        col_vertiefung = next((c for c in df_zus.columns if "vertiefung" in c), None)
-        col_module = next((c for c in df_zus.columns if "pflicht" in c or "modul" in c), None)
-
-        if not all([col_bachelor, col_studienart, col_vertiefung, col_module]):
-            raise KeyError("Fehlende Spalten (Bachelorstudiengang / Studienart / Vertiefung / Pflichtmodule)")
-
-        # Filter anwenden
-        subset = df_zus[
-            (df_zus[col_bachelor].astype(str).str.strip().str.lower() == studiengang.strip().lower())
-            & (df_zus[col_studienart].astype(str).str.strip().str.lower() == studienart.strip().lower())
-            & (df_zus[col_vertiefung].astype(str).str.strip().str.lower() == vertiefung.strip().lower())
-        ]
+        rules = rules if rules is not None else get_rules()
 
-        if subset.empty:
-            print(f"[ECTS] Keine Einträge für {studiengang} / {studienart} / {vertiefung}")
-            return {}
+        # === Vorberechnete Summe nachschlagen (beim Laden des Regelwerks erstellt)
+        with span("ects_calculation"):
+            ects_sum = rules.ects_for(studiengang, studienart, vertiefung)
 
-        # === 2️⃣ Modulnamen extrahieren
-        module_list = []
-        for mods in subset[col_module].dropna():
-            for mod in str(mods).split(","):
-                module_list.append(mod.strip())
-
-        if not module_list:
-            print(f"[ECTS] Keine Module gefunden für {studiengang} ({vertiefung})")
+        if not ects_sum:
+            log.info("ects_keine_module", studiengang=studiengang, studienart=studienart, vertiefung=vertiefung)
             return {}
 
-        # === 3️⃣ Modulliste laden und filtern
-        df_mod = pd.read_excel("zulassung.xlsx", sheet_name="Module")
-        df_mod.columns = [str(c).strip().lower() for c in df_mod.columns]
-
-        col_modname = next((c for c in df_mod.columns if "modul" in c), None)
-        if not col_modname:
-            raise KeyError("Spalte mit Modulnamen nicht gefunden (z. B. 'Modulbezeichnung').")
-
-        # Nur relevante Module behalten (Groß-/Kleinschreibung ignorieren)
-        module_names = [m.strip().lower() for m in module_list]
-        df_mod[col_modname] = df_mod[col_modname].astype(str).str.strip().str.lower()
-        df_filtered = df_mod[df_mod[col_modname].isin(module_names)]
-
-        # === 4️⃣ Relevante ECTS-Kategorien automatisch erkennen
-        category_cols = [
-            c for c in df_filtered.columns
-            if any(x in c for x in ["mathematik", "technik", "naturwissenschaft", "betriebswirtschaft", "informatik", "elektrotechnik"])
-        ]
-
-        if not category_cols:
-            print("[ECTS] Keine ECTS-Kategorien erkannt.")
-            return {}
-
-        # === 5️⃣ 'x' → 5 ECTS konvertieren und summieren
-        df_filtered[category_cols] = df_filtered[category_cols].applymap(
-            lambda x: 5 if str(x).strip().lower() == "x" else 0
-        )
-        ects_sum = df_filtered[category_cols].sum().to_dict()
-
-        # 🧹 Sicherstellen, dass alle Werte numerisch sind
-        for k, v in ects_sum.items():
-            try:
-                ects_sum[k] = float(v)
-            except (ValueError, TypeError):
-                ects_sum[k] = 0.0
-        print("[DEBUG] Berechnete ECTS pro Kategorie:")
-        for k, v in ects_sum.items():
-            print(f"  {k}: {v}")
-        print(f"[ECTS-Berechnung erfolgreich] {studiengang} / {vertiefung}: {ects_sum}")
+        log.debug("ects_berechnet", studiengang=studiengang, vertiefung=vertiefung, ects=ects_sum)
         return ects_sum
 
     except Exception as e:
-        print(f"[Fehler bei ECTS-Berechnung]: {e}")
+        log.error("ects_fehler", studiengang=studiengang, vertiefung=vertiefung, error=str(e))
         return {}
@@ -0,0 +1,105 @@
+import os
+import threading
+from collections import OrderedDict
+
+from rules_excel import load_excel_rules
+from structured_log import get_logger
+
+# Prüfintervall für Änderungen an der Excel-Datei (Sekunden)
+RELOAD_INTERVAL_SECONDS = float(os.getenv("RULES_RELOAD_INTERVAL", "5"))
+# Anzahl älterer Regelwerk-Versionen, die für laufende Sessions vorgehalten werden
+KEEP_VERSIONS = 5
+
+log = get_logger("rules_registry")
+
+_REGISTRIES = {}
+_REGISTRIES_LOCK = threading.Lock()
+
+
+class RulesRegistry:
+    """
+    Hält das aktive Regelwerk und lädt es im Hintergrund neu, sobald sich
+    die Excel-Datei ändert. Die neue Version wird erst nach vollständigem
+    Parsen per Referenz-Tausch aktiv, Requests warten also nie auf einen Reload.
+    Ältere Versionen bleiben abrufbar, damit laufende Sessions konsistent enden.
+    """
+
+    def __init__(self, path="zulassung.xlsx", interval=RELOAD_INTERVAL_SECONDS):
+        self.path = path
+        self.interval = interval
+        self._current = None
+        self._versions = OrderedDict()
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def current(self):
+        """Aktuell aktive Regelwerk-Version (wird beim ersten Zugriff geladen)."""
+        if self._current is None:
+            self.reload()
+        return self._current
+
+    def get(self, version: str = None):
+        """Regelwerk zu einer Versions-ID; unbekannte Versionen fallen auf die aktuelle zurück."""
+        if version:
+            rules = self._versions.get(version)
+            if rules is not None:
+                return rules
+        return self.current()
+
+    def reload(self) -> bool:
+        """Lädt die Excel-Datei neu, falls sie sich geändert hat. Gibt True bei neuer Version zurück."""
+        with self._lock:
+            mtime = os.path.getmtime(self.path)
+            if self._current is not None and mtime == self._mtime:
+                return False
+            # Auch bei Fehlern merken → defekte Datei wird erst nach erneuter Änderung wieder geparst
+            self._mtime = mtime
+
+            # Bei unverändertem Inhalts-Hash kommt der Snapshot direkt aus dem Startup-Cache
+            rules = load_excel_rules(self.path)
+            version = rules.version
+            if self._current is not None and version == self._current.version:
+                return False
+
+            self._versions[version] = rules
+            while len(self._versions) > KEEP_VERSIONS:
+                self._versions.popitem(last=False)
+            # Atomarer Tausch: laufende Requests behalten ihre bisherige Referenz
+            self._current = rules
+
+        log.info("regelwerk_aktiv", version=version, path=self.path)
+        return True
+
+    def start(self):
+        """Startet die Hintergrundüberwachung der Excel-Datei."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="rules-reload", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.reload()
+            except Exception as e:
+                # Fehlerhafte Datei (z. B. während des Speicherns) → alte Version bleibt aktiv
+                active = self._current.version if self._current is not None else "-"
+                log.warning("neuladen_fehlgeschlagen", active=active, path=self.path, error=str(e))
+
+
+def get_registry(path="zulassung.xlsx") -> RulesRegistry:
+    """Gibt die prozessweite Registry für eine Excel-Datei zurück."""
+    with _REGISTRIES_LOCK:
+        registry = _REGISTRIES.get(path)
+        if registry is None:
+            registry = _REGISTRIES[path] = RulesRegistry(path)
+        return registry
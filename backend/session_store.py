@@ -0,0 +1,293 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+
+from structured_log import get_logger
+
+# "memory" (nur dieser Prozess) oder "sqlite" (geteilt zwischen Workern/Prozessen)
+SESSION_STORE = os.getenv("SESSION_STORE", "memory").strip().lower()
+SESSION_DB = os.getenv("SESSION_DB", "sessions.db")
+# Obergrenze für Sessions im Speicher und Leerlaufzeit bis zum Verwerfen (Sekunden)
+SESSION_MAX_SIZE = int(os.getenv("SESSION_MAX_SIZE", "10000"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", str(2 * 3600)))
+# Abstand zwischen zwei Aufräumläufen abgelaufener Sessions in SQLite (Sekunden, pro Prozess)
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+# Sperre einer Session in SQLite: Lebensdauer (Crash eines Workers) und maximale Wartezeit (Sekunden)
+SESSION_LOCK_TTL = float(os.getenv("SESSION_LOCK_TTL", "30"))
+SESSION_LOCK_TIMEOUT = float(os.getenv("SESSION_LOCK_TIMEOUT", "10"))
+# Anzahl Lock-Streifen für die Sperre pro user_id (begrenzt statt ein Lock je Session)
+LOCK_STRIPES = 64
+
+log = get_logger("session_store")
+
+_MISSING = object()
+
+
+class SessionState(MutableMapping):
+    """
+    Kompakter Gesprächszustand mit festen Feldern statt eines offenen dicts.
+    Verhält sich wie ein dict: nicht gesetzte Felder gelten als "nicht in state".
+    Die Reihenfolge der Felder entspricht der Reihenfolge im Gesprächsverlauf.
+    """
+
+    __slots__ = (
+        "_rules_version", "_question", "_suggested", "abschlussziel", "hochschulzugang", "hsbi_bachelor",
+        "bachelorstudiengang", "studienart", "vertiefung", "ects_ist",
+        "studiengang", "abschlussnote", "berufserfahrung", "englischkenntnisse"
+    )
+
+    def __init__(self, values: dict = None):
+        for key, value in (values or {}).items():
+            self[key] = value
+
+    def __getitem__(self, key):
+        value = getattr(self, key, _MISSING) if key in self.__slots__ else _MISSING
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(f"Unbekanntes Session-Feld: {key}")
+        setattr(self, key, value)
+
+    def __delitem__(self, key):
+        if key not in self or key not in self.__slots__:
+            raise KeyError(key)
+        delattr(self, key)
+
+    def __iter__(self):
+        return (key for key in self.__slots__ if hasattr(self, key))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"SessionState({self.to_dict()!r})"
+
+    def to_dict(self) -> dict:
+        return {key: getattr(self, key) for key in self}
+
+    @classmethod
+    def from_dict(cls, values: dict) -> "SessionState":
+        """Baut den Zustand aus gespeicherten Daten; unbekannte Altfelder werden ignoriert."""
+        return cls({key: value for key, value in values.items() if key in cls.__slots__})
+
+
+class SessionTransaction:
+    """Zustand einer Session innerhalb einer Transaktion; `state` darf ersetzt werden."""
+
+    def __init__(self, state: dict):
+        self.state = state
+
+
+class SessionStore(ABC):
+    """
+    Schnittstelle für Session-Zustände. Lesen, Ändern und Zurückschreiben
+    passieren in `transaction(user_id)` – exklusiv pro user_id, damit sich
+    parallele Turns derselben Session nicht gegenseitig überschreiben.
+    Unvollständige Implementierungen scheitern schon beim Erzeugen.
+    """
+
+    @abstractmethod
+    def transaction(self, user_id: str):
+        """Context-Manager, der eine SessionTransaction liefert und den Zustand danach speichert."""
+
+    def get(self, user_id: str) -> SessionState:
+        with self.transaction(user_id) as txn:
+            return SessionState(txn.state)
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Kennzahlen für /sessions und /metrics."""
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Sessions im Prozessspeicher (nur für einen einzelnen Worker geeignet).
+    LRU-begrenzt und mit Leerlauf-TTL, damit abgebrochene Sessions den
+    Speicher nicht dauerhaft belegen.
+    """
+
+    def __init__(self, max_size=SESSION_MAX_SIZE, ttl=SESSION_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        # user_id → (SessionState, letzter Zugriff), älteste zuerst
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+        self.expired = 0
+        self.evicted = 0
+
+    @contextmanager
+    def transaction(self, user_id: str):
+        with self._stripes[hash(user_id) % LOCK_STRIPES]:
+            now = time.time()
+            with self._lock:
+                self._evict_expired(now)
+                entry = self._sessions.get(user_id)
+            txn = SessionTransaction(entry[0] if entry else SessionState())
+            yield txn
+            with self._lock:
+                self._sessions[user_id] = (txn.state, now)
+                self._sessions.move_to_end(user_id)
+                while len(self._sessions) > self.max_size:
+                    self._sessions.popitem(last=False)
+                    self.evicted += 1
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "size": len(self._sessions),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "expired": self.expired,
+            "evicted": self.evicted
+        }
+
+    def _evict_expired(self, now):
+        # Nach letztem Zugriff sortiert → abgelaufene Sessions stehen vorne
+        while self._sessions:
+            user_id, (_, last_access) = next(iter(self._sessions.items()))
+            if now - last_access <= self.ttl:
+                break
+            del self._sessions[user_id]
+            self.expired += 1
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions in einer SQLite-Datei im WAL-Modus, geteilt von allen Workern
+    auf einer Maschine. Exklusiv ist ein Turn nur pro user_id: eine Zeile in
+    `session_locks` sperrt die Session über Worker hinweg (mit Ablaufzeit, falls
+    ein Worker abstürzt), Threads desselben Prozesses warten an Lock-Streifen.
+    Die Datenbank selbst ist nur für einzelne kurze Anweisungen gesperrt.
+    Abgelaufene Sessions gelten beim Lesen als neu; gelöscht werden sie nur
+    alle `sweep_interval` Sekunden außerhalb des Turns.
+    """
+
+    def __init__(
+        self, path=SESSION_DB, ttl=SESSION_TTL, busy_timeout_ms=5000, sweep_interval=SESSION_SWEEP_INTERVAL,
+        lock_ttl=SESSION_LOCK_TTL, lock_timeout=SESSION_LOCK_TIMEOUT
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.busy_timeout_ms = busy_timeout_ms
+        self.sweep_interval = sweep_interval
+        self.lock_ttl = lock_ttl
+        self.lock_timeout = lock_timeout
+        self._next_sweep = 0.0
+        self._sweep_lock = threading.Lock()
+        self._local = threading.local()
+        self._stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "user_id TEXT PRIMARY KEY, state TEXT NOT NULL, updated REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions (updated)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_locks ("
+            "user_id TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+        self.expired = 0
+        self.lock_waits = 0
+
+    def _connection(self):
+        # Eine Verbindung pro Thread (sqlite3-Verbindungen sind nicht thread-sicher)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            self._local.conn = conn
+        return conn
+
+    def sweep(self, now=None) -> int:
+        """Löscht abgelaufene Sessions (eigene kurze Transaktion, nicht im Turn)."""
+        now = time.time() if now is None else now
+        conn = self._connection()
+        deleted = conn.execute("DELETE FROM sessions WHERE updated < ?", (now - self.ttl,)).rowcount
+        conn.execute("DELETE FROM session_locks WHERE expires < ?", (now,))
+        self.expired += deleted
+        return deleted
+
+    def _maybe_sweep(self, now):
+        if now < self._next_sweep or not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_sweep = now + self.sweep_interval
+            self.sweep(now)
+        finally:
+            self._sweep_lock.release()
+
+    @contextmanager
+    def transaction(self, user_id: str):
+        with self._stripes[hash(user_id) % LOCK_STRIPES]:
+            now = time.time()
+            self._maybe_sweep(now)
+            owner = self._acquire(user_id)
+            conn = self._connection()
+            try:
+                row = conn.execute(
+                    "SELECT state FROM sessions WHERE user_id = ? AND updated >= ?", (user_id, now - self.ttl)
+                ).fetchone()
+                txn = SessionTransaction(SessionState.from_dict(json.loads(row[0])) if row else SessionState())
+                yield txn
+                conn.execute(
+                    "INSERT OR REPLACE INTO sessions (user_id, state, updated) VALUES (?, ?, ?)",
+                    (user_id, json.dumps(dict(txn.state), ensure_ascii=False), now)
+                )
+            finally:
+                conn.execute("DELETE FROM session_locks WHERE user_id = ? AND owner = ?", (user_id, owner))
+
+    def _acquire(self, user_id: str) -> str:
+        """Sperrt die Session über Worker hinweg; wartet mit wachsenden Pausen, höchstens `lock_timeout` Sekunden."""
+        conn = self._connection()
+        owner = uuid.uuid4().hex
+        deadline = time.monotonic() + self.lock_timeout
+        delay = 0.002
+        while True:
+            now = time.time()
+            # Jede Anweisung ist eine eigene, kurze Schreibtransaktion
+            conn.execute("DELETE FROM session_locks WHERE user_id = ? AND expires < ?", (user_id, now))
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO session_locks (user_id, owner, expires) VALUES (?, ?, ?)",
+                (user_id, owner, now + self.lock_ttl)
+            ).rowcount
+            if inserted:
+                return owner
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Session {user_id} ist seit {self.lock_timeout} s gesperrt")
+            self.lock_waits += 1
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+    def stats(self) -> dict:
+        size = self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "size": size,
+            "ttl_seconds": self.ttl,
+            "expired": self.expired,
+            "lock_waits": self.lock_waits
+        }
+
+
+def create_session_store(kind: str = SESSION_STORE) -> SessionStore:
+    """Erzeugt den konfigurierten Session-Store (Umgebungsvariable SESSION_STORE)."""
+    if kind == "sqlite":
+        return SQLiteSessionStore()
+    if kind != "memory":
+        log.warning("unbekannter_session_store", kind=kind, fallback="memory")
+    return MemorySessionStore()
@@ -0,0 +1,217 @@
+"""
+Strukturiertes Anwendungs-Log (JSON-Lines) für den Chat-Pfad.
+Ereignisse werden im Request nur als Dict eingereiht; Serialisierung und Ausgabe
+übernimmt ein Hintergrund-Thread. Debug-Ereignisse landen immer im Ringpuffer
+(abrufbar über /debug/events) und werden nur bei passendem Level und gesampelt ausgegeben.
+
+Konfiguration:
+    APP_LOG_LEVEL=info                               Standard-Level aller Module
+    APP_LOG_LEVELS=rules_excel=debug,conversation=warning   Level je Modul
+    APP_LOG_DEBUG_SAMPLE_RATE=0.01                   Anteil ausgegebener Debug-Ereignisse
+    APP_LOG_FILE=/var/log/hsbi/app.jsonl             Ziel (Standard: stdout)
+"""
+import atexit
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+
+APP_LOG_LEVEL = os.getenv("APP_LOG_LEVEL", "info").strip().lower()
+APP_LOG_LEVELS = os.getenv("APP_LOG_LEVELS", "")
+APP_LOG_DEBUG_SAMPLE_RATE = float(os.getenv("APP_LOG_DEBUG_SAMPLE_RATE", "0.01"))
+APP_LOG_FILE = os.getenv("APP_LOG_FILE") or None
+APP_LOG_QUEUE_SIZE = int(os.getenv("APP_LOG_QUEUE_SIZE", "10000"))
+# Letzte Debug-Ereignisse im Speicher (0 = aus)
+APP_LOG_RING_SIZE = int(os.getenv("APP_LOG_RING_SIZE", "1000"))
+# Höchstens so lange wartet stop() beim Beenden auf den Schreib-Thread (Sekunden)
+APP_LOG_STOP_TIMEOUT = float(os.getenv("APP_LOG_STOP_TIMEOUT", "2"))
+
+
+def _parse_levels(spec: str) -> dict:
+    """'modul=level,modul2=level' → {modul: Levelwert}; unbekannte Level werden ignoriert."""
+    levels = {}
+    for part in spec.split(","):
+        name, _, level = part.partition("=")
+        level = level.strip().lower()
+        if name.strip() and level in LEVELS:
+            levels[name.strip()] = LEVELS[level]
+    return levels
+
+
+_DEFAULT_LEVEL = LEVELS.get(APP_LOG_LEVEL, LEVELS["info"])
+_MODULE_LEVELS = _parse_levels(APP_LOG_LEVELS)
+
+_recent = deque(maxlen=APP_LOG_RING_SIZE) if APP_LOG_RING_SIZE > 0 else None
+_STOP = object()
+
+
+# === Hintergrund-Schreiber ===
+class JsonLineWriter:
+    """
+    Serialisiert und schreibt Ereignisse in einem Hintergrund-Thread. Ist die Queue voll,
+    wird das Ereignis verworfen und gezählt – Diagnose-Logs dürfen den Request nie blockieren.
+    Fehler beim Schreiben verwerfen nur den betroffenen Block; der Thread läuft weiter.
+    """
+
+    def __init__(self, path=APP_LOG_FILE, queue_size=APP_LOG_QUEUE_SIZE):
+        self.path = path
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def write(self, event: dict):
+        if self._closed:
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Wartet, bis alle bisher eingereihten Ereignisse geschrieben sind."""
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.join()
+
+    def stop(self, timeout=APP_LOG_STOP_TIMEOUT):
+        """Beendet den Schreib-Thread; wartet höchstens `timeout` Sekunden (z. B. bei voller Queue)."""
+        with self._start_lock:
+            self._closed = True
+            thread, self._thread = self._thread, None
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {"queued": self._queue.qsize(), "written": self.written, "dropped": self.dropped, "errors": self.errors}
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name="app-log-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        out = self._open()
+        try:
+            while True:
+                events = [self._queue.get()]
+                # Alles, was bereits wartet, mit einem write() mitnehmen
+                while events[-1] is not _STOP:
+                    try:
+                        events.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                try:
+                    self._write(out, [event for event in events if event is not _STOP])
+                except Exception as e:
+                    self.errors += 1
+                    if self.errors == 1:
+                        sys.stderr.write(f"[AppLog] ⚠️ Ereignisse konnten nicht geschrieben werden: {e}\n")
+                finally:
+                    for _ in events:
+                        self._queue.task_done()
+                if events[-1] is _STOP:
+                    break
+        finally:
+            if out not in (sys.stdout, sys.stderr):
+                out.close()
+
+    def _open(self):
+        if not self.path:
+            return sys.stdout
+        try:
+            return open(self.path, "a", encoding="utf-8")
+        except OSError as e:
+            sys.stderr.write(f"[AppLog] ⚠️ {self.path} nicht beschreibbar, schreibe nach stderr: {e}\n")
+            return sys.stderr
+
+    def _write(self, out, events: list):
+        if not events:
+            return
+        lines = [_to_json(event) for event in events]
+        out.write("\n".join(lines) + "\n")
+        out.flush()
+        self.written += len(lines)
+
+
+def _to_json(event: dict) -> str:
+    record = dict(event)
+    record["ts"] = datetime.fromtimestamp(record["ts"]).isoformat(timespec="milliseconds")
+    return json.dumps(record, ensure_ascii=False, default=str)
+
+
+writer = JsonLineWriter()
+atexit.register(writer.stop)
+
+
+# === Logger je Modul ===
+class StructuredLogger:
+    """Logger eines Moduls; Ereignisse sind ein Name plus Felder, z. B. log.debug("ects_berechnet", ects=...)."""
+
+    def __init__(self, module: str):
+        self.module = module
+        self.level = _MODULE_LEVELS.get(module, _DEFAULT_LEVEL)
+
+    def debug(self, event: str, **fields):
+        record = {"ts": time.time(), "level": "debug", "module": self.module, "event": event, **fields}
+        if _recent is not None:
+            _recent.append(record)
+        if self.level <= LEVELS["debug"] and random.random() < APP_LOG_DEBUG_SAMPLE_RATE:
+            writer.write(record)
+
+    def info(self, event: str, **fields):
+        self._log("info", event, fields)
+
+    def warning(self, event: str, **fields):
+        self._log("warning", event, fields)
+
+    def error(self, event: str, **fields):
+        self._log("error", event, fields)
+
+    def _log(self, level: str, event: str, fields: dict):
+        if self.level <= LEVELS[level]:
+            writer.write({"ts": time.time(), "level": level, "module": self.module, "event": event, **fields})
+
+
+_LOGGERS = {}
+
+
+def get_logger(module: str) -> StructuredLogger:
+    logger = _LOGGERS.get(module)
+    if logger is None:
+        logger = _LOGGERS[module] = StructuredLogger(module)
+    return logger
+
+
+def recent_events(limit: int = 100, module: str = None, event: str = None) -> list:
+    """Die letzten Debug-Ereignisse aus dem Ringpuffer (neueste zuletzt), optional gefiltert."""
+    if _recent is None:
+        return []
+    events = [
+        e for e in list(_recent)
+        if (module is None or e["module"] == module) and (event is None or e["event"] == event)
+    ]
+    return [
+        {**e, "ts": datetime.fromtimestamp(e["ts"]).isoformat(timespec="milliseconds")}
+        for e in events[-limit:]
+    ] if limit > 0 else []
@@ -0,0 +1,23 @@
+"""
+Gemeinsame Test-Umgebung: Backend-Module liegen flach in backend/, Logs, Sessions und
+Caches landen in einem temporären Ordner, der OpenAI-Client wird nie wirklich aufgerufen.
+Die Variablen müssen vor dem ersten Import der Backend-Module gesetzt sein.
+"""
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TMP_DIR = tempfile.mkdtemp(prefix="hsbi-tests-")
+
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ["LOG_FILE"] = os.path.join(TMP_DIR, "chatbot_log.csv")
+os.environ["LOG_BACKEND"] = "csv"
+os.environ["LOG_DIR"] = os.path.join(TMP_DIR, "logs")
+os.environ["LOG_DB"] = os.path.join(TMP_DIR, "chatbot_log.db")
+os.environ["SESSION_STORE"] = "memory"
+os.environ["SESSION_DB"] = os.path.join(TMP_DIR, "sessions.db")
+os.environ["DECISION_CACHE_ENABLED"] = "0"
+os.environ["APP_LOG_FILE"] = os.path.join(TMP_DIR, "app.jsonl")
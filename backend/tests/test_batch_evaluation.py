@@ -0,0 +1,108 @@
+import asyncio
+import io
+import json
+
+import httpx
+import pandas as pd
+import pytest
+
+from batch_evaluation import CompiledBatchRules, evaluate_batch, read_profiles, stream_results
+from openai_client import build_decision_facts
+from rules_excel import get_rules, get_vertiefungen_for
+
+
+@pytest.fixture(scope="module")
+def rules():
+    return get_rules()
+
+
+def _profiles(rules):
+    profiles = [
+        {"abschlussziel": "Bachelor", "hochschulzugang": hzb}
+        for hzb in ("Ja", "Nein", "", "vielleicht")
+    ]
+    programs = list(rules.program_names) + ["Unbekannt"]
+    formal = {"abschlussnote": "3,3", "berufserfahrung": "0", "englischkenntnisse": "Nein"}
+    for bachelor in list(rules.bachelor_index.names)[:6]:
+        for studienart in ("Vollzeit", "praxisintegriert"):
+            vertiefungen = get_vertiefungen_for(bachelor, studienart, rules=rules) or [""]
+            for vertiefung in vertiefungen[:3]:
+                for program in programs:
+                    profiles.append({
+                        "abschlussziel": "Master", "hsbi_bachelor": "Ja", "bachelorstudiengang": bachelor,
+                        "studienart": studienart, "vertiefung": vertiefung, "studiengang": program, **formal
+                    })
+    for program in programs:
+        profiles.append({
+            "abschlussziel": "Master", "hsbi_bachelor": "Nein", "bachelorstudiengang": "Physik",
+            "studiengang": program, "abschlussnote": "1,0", "berufserfahrung": "3", "englischkenntnisse": "Ja"
+        })
+    return profiles
+
+
+def test_batch_decision_matches_single_template_decision(rules):
+    profiles = _profiles(rules)
+    result = evaluate_batch(pd.DataFrame(profiles).fillna("").astype(str), CompiledBatchRules(rules))
+
+    expected = [build_decision_facts(profile, rules)["decision"] for profile in profiles]
+    mismatches = [
+        (profile, got, want)
+        for profile, got, want in zip(profiles, result["entscheidung"], expected) if got != want
+    ]
+    assert not mismatches
+    assert set(expected) == {"Ja", "Nein", "Unklar"}
+
+
+def test_streamed_chunks_are_valid_jsonl_with_unique_ids(rules):
+    profiles = pd.DataFrame([{"abschlussziel": "Bachelor", "hochschulzugang": "Ja"}] * 25)
+
+    text = "".join(stream_results(profiles, rules, "jsonl", chunk_size=7))
+    lines = text.split("\n")
+
+    assert lines[-1] == ""
+    records = [json.loads(line) for line in lines[:-1]]
+    assert [record["id"] for record in records] == [str(i) for i in range(25)]
+
+
+def test_streamed_csv_has_one_header_and_every_row(rules):
+    profiles = pd.DataFrame([{"abschlussziel": "Master", "hsbi_bachelor": "Nein"}] * 25)
+
+    result = pd.read_csv(io.StringIO("".join(stream_results(profiles, rules, "csv", chunk_size=7))), dtype=str)
+
+    assert list(result["id"]) == [str(i) for i in range(25)]
+
+
+def test_unknown_curriculum_lists_no_deficits(rules):
+    profile = {
+        "abschlussziel": "Master", "hsbi_bachelor": "Ja", "bachelorstudiengang": "Gibt es nicht",
+        "studienart": "Vollzeit", "vertiefung": "", "studiengang": rules.program_names[0]
+    }
+    result = evaluate_batch(pd.DataFrame([profile]), CompiledBatchRules(rules)).iloc[0]
+
+    assert result["ects_entscheidung"] == "Unklar"
+    assert pd.isna(result["fehlende_ects"])
+    assert result["defizite"] == ""
+    assert build_decision_facts(profile, rules)["decision"] == result["entscheidung"]
+
+
+@pytest.mark.parametrize("body", [b"[1, 2]", b"{\"a\": ", b"\xff\xfe\x00garbage", b"a,b\n1,2,3,4\n\"x"])
+def test_read_profiles_rejects_malformed_input(body):
+    with pytest.raises(ValueError):
+        read_profiles(body)
+
+
+def test_endpoint_returns_400_for_malformed_body():
+    import main
+
+    async def post(body, content_type):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/evaluate/batch", content=body, headers={"content-type": content_type})
+
+    bad = asyncio.run(post(b"[{\"abschlussziel\": ", "application/json"))
+    assert bad.status_code == 400
+    assert "error" in bad.json()
+
+    good = asyncio.run(post(json.dumps([{"abschlussziel": "Bachelor", "hochschulzugang": "Ja"}]).encode(), "application/json"))
+    assert good.status_code == 200
+    assert json.loads(good.text.splitlines()[0])["entscheidung"] == "Ja"
@@ -0,0 +1,67 @@
+import itertools
+
+import conversation
+from conversation import CONDITION_KEYS, _compile_path, _context, get_progress, questions, update_state
+
+
+def _answer_all(answers):
+    state = {}
+    asked = []
+    while True:
+        question = conversation.get_next_question(state)
+        if question is None:
+            return state, asked
+        asked.append(question["key"])
+        update_state(state, answers[question["key"]])
+
+
+def test_free_text_does_not_grow_the_path_cache():
+    _compile_path.cache_clear()
+    for i in range(200):
+        _compile_path(_context({"abschlussziel": f"irgendwas {i}", "hsbi_bachelor": f"vielleicht {i}"}))
+
+    assert _compile_path.cache_info().currsize == 1
+    # Obergrenze: jede Kombination bekannter Werte plus "" je Schlüssel
+    bound = 1
+    for values in conversation._CONDITION_VALUES:
+        bound *= len(values) + 1
+    for combo in itertools.product(*[sorted(values) + [""] for values in conversation._CONDITION_VALUES]):
+        _compile_path(_context(dict(zip(CONDITION_KEYS, combo))))
+    assert _compile_path.cache_info().currsize == bound
+
+
+def test_context_is_case_insensitive_for_known_values():
+    assert _context({"abschlussziel": "MASTER", "hsbi_bachelor": "ja"}) == _context({"abschlussziel": "Master", "hsbi_bachelor": "Ja"})
+
+
+def test_compiled_path_matches_depends_on():
+    state = {"abschlussziel": "Master", "hsbi_bachelor": "Nein"}
+    next_index, done_before = _compile_path(_context(state))
+    expected = [
+        index for index, q in enumerate(questions)
+        if all(str(state.get(k, "")).lower() == str(v).lower() for k, v in q.get("depends_on", {}).items())
+    ]
+    assert [i for i in range(len(questions)) if next_index[i] == i] == expected
+    assert done_before[-1] == len(expected)
+
+
+def test_external_master_walks_the_expected_questions():
+    answers = {
+        "abschlussziel": "Master", "hsbi_bachelor": "Nein", "bachelorstudiengang": "Physik",
+        "studiengang": "Maschinenbau", "abschlussnote": "2,0", "berufserfahrung": "1",
+        "englischkenntnisse": "Ja"
+    }
+    state, asked = _answer_all(answers)
+
+    assert asked == [
+        "abschlussziel", "hsbi_bachelor", "bachelorstudiengang", "studiengang",
+        "abschlussnote", "berufserfahrung", "englischkenntnisse"
+    ]
+    assert get_progress(state) == 100
+
+
+def test_unknown_abschlussziel_ends_after_first_question():
+    state, asked = _answer_all({"abschlussziel": "Diplom"})
+
+    assert asked == ["abschlussziel"]
+    assert state["abschlussziel"] == "Diplom"
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+import time
+
+from decision_cache import DecisionCache
+
+RESULT = {"formatted_response": "<p>Ja</p>", "decision": "Ja"}
+
+
+def _cache(tmp_path, **kwargs):
+    return DecisionCache(db_path=str(tmp_path / "decisions.db"), enabled=True, **kwargs)
+
+
+def test_entries_survive_a_restart(tmp_path):
+    _cache(tmp_path).set("k1", RESULT, latency=1.5, tokens=100)
+
+    restarted = _cache(tmp_path)
+    assert restarted.get("k1") == RESULT
+    assert restarted.stats()["saved_tokens"] == 100
+
+
+def test_created_column_is_indexed(tmp_path):
+    cache = _cache(tmp_path)
+    indexes = cache._connection().execute("PRAGMA index_list(decisions)").fetchall()
+
+    assert "idx_decisions_created" in {row[1] for row in indexes}
+
+
+def test_expired_rows_are_swept_on_an_interval(tmp_path):
+    cache = _cache(tmp_path, ttl=60, sweep_interval=3600)
+    conn = cache._connection()
+    conn.execute("INSERT INTO decisions VALUES ('alt', '{}', 0, 0, ?)", (time.time() - 120,))
+    cache.set("k1", RESULT)
+    conn.execute("INSERT INTO decisions VALUES ('alt2', '{}', 0, 0, ?)", (time.time() - 120,))
+    cache.set("k2", RESULT)
+
+    # Erster Schreibzugriff räumt auf, der zweite liegt im Intervall
+    assert cache.swept == 1
+    assert conn.execute("SELECT COUNT(*) FROM decisions").fetchone()[0] == 3
+    assert cache.sweep() == 1
+
+
+def test_async_access_reads_the_file_off_the_event_loop(tmp_path):
+    _cache(tmp_path).set("k1", RESULT)
+    cache = _cache(tmp_path)
+    threads = []
+    load = cache._load_from_db
+    cache._load_from_db = lambda key: threads.append(threading.get_ident()) or load(key)
+
+    async def run():
+        loop_thread = threading.get_ident()
+        first = await cache.get_async("k1")
+        await cache.set_async("k2", RESULT)
+        second = await cache.get_async("k1")
+        return loop_thread, first, second
+
+    loop_thread, first, second = asyncio.run(run())
+
+    assert first == second == RESULT
+    # Nur der erste Zugriff fragt die Datei (danach Speichertreffer), und zwar nicht im Loop-Thread
+    assert len(threads) == 1 and threads[0] != loop_thread
+    assert _cache(tmp_path).get("k2") == RESULT
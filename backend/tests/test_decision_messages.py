@@ -0,0 +1,34 @@
+import pytest
+
+import openai_client
+from openai_client import build_decision_messages
+from rules_excel import get_rules
+
+MODES = ["llm", "template", "template_polish"]
+
+
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("hzb, text", [("Ja", "Entscheidung:</b> Ja"), ("Nein", "Entscheidung:</b> Nein")])
+def test_bachelor_with_clear_hzb_is_answered_without_gpt_and_logged_as_unklar(monkeypatch, mode, hzb, text):
+    monkeypatch.setattr(openai_client, "DECISION_MODE", mode)
+    messages, fixed = build_decision_messages({"abschlussziel": "Bachelor", "hochschulzugang": hzb}, {"Allgemein": {}})
+
+    assert messages is None
+    assert text in fixed["formatted_response"]
+    # Wie vor der Template-Umstellung und unabhängig vom Modus: Report-Kennzahlen zählen diese Sessions als "Unklar"
+    assert fixed["decision"] == "Unklar"
+
+
+@pytest.mark.parametrize("vertiefung, studienart, studiengang, decision", [
+    ("Logistik", "praxisintegriert", "Digitale Technologien", "Ja"),
+    ("Mobilität", "Vollzeit", "Angewandte Automatisierung", "Nein"),
+])
+def test_template_keeps_master_decisions(monkeypatch, vertiefung, studienart, studiengang, decision):
+    monkeypatch.setattr(openai_client, "DECISION_MODE", "template")
+    profile = {
+        "abschlussziel": "Master", "hsbi_bachelor": "Ja", "bachelorstudiengang": "Wirtschaftsingenieurwesen",
+        "studienart": studienart, "vertiefung": vertiefung, "studiengang": studiengang
+    }
+    _, fixed = build_decision_messages(profile, get_rules())
+
+    assert fixed["decision"] == decision
@@ -0,0 +1,60 @@
+import pytest
+
+from conversation import SUGGESTED_KEY, get_next_question, update_state
+from rules_excel import get_rules
+from session_store import SessionState
+
+
+@pytest.fixture(scope="module")
+def rules():
+    return get_rules()
+
+
+def _at_bachelor_question(rules):
+    state = SessionState()
+    for answer in ("Master", "Ja"):
+        get_next_question(state, rules)
+        update_state(state, answer, rules)
+    assert get_next_question(state, rules)["key"] == "bachelorstudiengang"
+    return state
+
+
+def test_index_resolves_case_and_exact_names(rules):
+    assert rules.match_bachelor("mechatronik")["match"] == "Mechatronik"
+    assert rules.match_bachelor("Elektrotechnik")["score"] == 1.0
+
+
+def test_index_suggests_for_ambiguous_input(rules):
+    resolved = rules.match_bachelor("Informatk")
+
+    assert resolved["match"] is None
+    assert set(resolved["suggestions"]) == {"Ingenieurinformatik", "Angewandte Informatik"}
+
+
+def test_unrelated_input_has_no_suggestions(rules):
+    assert rules.match_bachelor("xyz") == {"match": None, "score": 0.0, "suggestions": []}
+
+
+def test_suggestion_accepted(rules):
+    state = _at_bachelor_question(rules)
+    result = update_state(state, "Informatk", rules)
+    assert result["options"] == rules.match_bachelor("Informatk")["suggestions"]
+
+    update_state(state, "Angewandte Informatik", rules)
+
+    assert state["bachelorstudiengang"] == "Angewandte Informatik"
+    assert SUGGESTED_KEY not in state
+    assert get_next_question(state, rules)["key"] == "studienart"
+
+
+def test_rejected_suggestions_ask_only_once(rules):
+    state = _at_bachelor_question(rules)
+    assert "next_question" in update_state(state, "Informatk", rules)
+
+    # Wieder keine eindeutige Zuordnung → Eingabe unverändert übernehmen statt erneut fragen
+    result = update_state(state, "Technik", rules)
+
+    assert "next_question" not in result
+    assert state["bachelorstudiengang"] == "Technik"
+    assert SUGGESTED_KEY not in state
+    assert SessionState.from_dict(state.to_dict()) == state
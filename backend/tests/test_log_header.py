@@ -0,0 +1,38 @@
+import io
+
+import logging_handler
+from logging_handler import LOG_HEADER, migrate_log_header, read_log_rows
+
+OLD_HEADER = ",".join(LOG_HEADER[:-1])
+OLD_ROW = "2026-01-05T10:00:00,u1,Master,Maschinenbau,master_intern,Ja,abgeschlossen,100"
+NEW_ROW = "2026-01-05T11:00:00,u2,Master,Maschinenbau,master_intern,Nein,abgeschlossen,100,v1"
+
+
+def test_read_log_rows_accepts_old_header():
+    rows = list(read_log_rows(io.StringIO(f"{OLD_HEADER}\n{OLD_ROW}\n{NEW_ROW}\n")))
+    assert [len(row) for row in rows] == [len(LOG_HEADER)] * 2
+    assert rows[0][-1] == ""
+    assert rows[1][-1] == "v1"
+
+
+def test_full_scan_report_reads_rows_below_old_header(tmp_path, monkeypatch):
+    path = tmp_path / "old.csv"
+    path.write_text(f"{OLD_HEADER}\n{OLD_ROW}\n{NEW_ROW}\n", encoding="utf-8")
+    monkeypatch.setattr(logging_handler, "LOG_FILE", str(path))
+    monkeypatch.setattr(logging_handler, "REPORT_INCREMENTAL", False)
+
+    report = logging_handler.generate_report(days=100000)
+
+    assert report["total_users"] == 2
+    # Der Report schreibt die Datei nicht um
+    assert path.read_text(encoding="utf-8").splitlines()[0] == OLD_HEADER
+
+
+def test_migrate_log_header_is_explicit_and_idempotent(tmp_path):
+    path = tmp_path / "old.csv"
+    path.write_text(f"{OLD_HEADER}\n{OLD_ROW}\n", encoding="utf-8")
+
+    assert migrate_log_header(str(path)) is True
+    assert migrate_log_header(str(path)) is False
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert lines == [",".join(LOG_HEADER), OLD_ROW]
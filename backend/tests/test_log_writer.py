@@ -0,0 +1,59 @@
+import csv
+import threading
+
+from logging_handler import BatchLogWriter
+
+
+def _rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return [row for row in csv.reader(f) if row and row[0] != "timestamp"]
+
+
+def _entry(i):
+    return [f"2026-01-05T10:00:{i % 60:02d}", f"u{i}", "Master", "-", "-", "-", "in_progress", 50, "v1"]
+
+
+def test_stop_writes_everything_queued_before_it(tmp_path):
+    path = str(tmp_path / "log.csv")
+    writer = BatchLogWriter(path=path, batch_size=50, flush_interval=10)
+    for i in range(500):
+        writer.write(_entry(i))
+    writer.stop()
+
+    assert len(_rows(path)) == 500
+
+
+def test_writes_racing_with_stop_are_not_lost(tmp_path):
+    path = str(tmp_path / "log.csv")
+    writer = BatchLogWriter(path=path, batch_size=10, flush_interval=0.01)
+    start = threading.Barrier(5)
+
+    def produce(offset):
+        start.wait()
+        for i in range(400):
+            writer.write(_entry(offset + i))
+
+    producers = [threading.Thread(target=produce, args=(n * 1000,)) for n in range(4)]
+    for thread in producers:
+        thread.start()
+    start.wait()
+    writer.stop()
+    for thread in producers:
+        thread.join()
+
+    # Einträge nach stop() schreibt der Aufrufer selbst, keiner bleibt in der Queue liegen
+    assert len(_rows(path)) == 1600
+    assert writer.stats()["queued"] == 0
+
+
+def test_full_queue_falls_back_to_direct_write(tmp_path, monkeypatch):
+    path = str(tmp_path / "log.csv")
+    writer = BatchLogWriter(path=path, queue_size=1)
+    monkeypatch.setattr(writer, "_ensure_started", lambda: None)
+    writer.write(_entry(1))
+    writer.write(_entry(2))
+
+    assert writer.backpressure == 1
+    assert len(_rows(path)) == 1
+    writer.stop()
+    assert len(_rows(path)) == 2
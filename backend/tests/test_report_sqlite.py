@@ -0,0 +1,47 @@
+from datetime import datetime
+
+from event_store import EventStore
+from log_tail import EventStoreTail
+from report_aggregates import ReportAggregates
+
+
+def _row(user_id, status="abgeschlossen", entscheidung="Ja"):
+    return [datetime.now().isoformat(), user_id, "Master", "Informatik", "master_extern", entscheidung, status, 100, "v1"]
+
+
+def _tail(store, aggregates):
+    return EventStoreTail(store.rows_after, store.max_id, on_rows=aggregates.add_rows, on_reset=lambda: aggregates.rebuild([]))
+
+
+def test_report_includes_rows_written_by_other_workers(tmp_path):
+    path = str(tmp_path / "events.db")
+    # Zwei Worker: je eigene Verbindung und eigene Kennzahlen, eine gemeinsame Datenbank
+    worker_a, worker_b = EventStore(path), EventStore(path)
+    aggregates = ReportAggregates()
+    tail = _tail(worker_a, aggregates)
+
+    worker_a.append([_row("a1")])
+    tail.poll()
+    worker_b.append([_row("b1"), _row("b2", status="in_progress", entscheidung="-")])
+    assert tail.poll() == 2
+
+    report = aggregates.report(30)
+    assert report["total_users"] == 3
+    assert report["completed"] == 2
+    assert report == worker_a.report(30)
+
+
+def test_replaced_database_rebuilds_aggregates(tmp_path):
+    store = EventStore(str(tmp_path / "events.db"))
+    aggregates = ReportAggregates()
+    tail = _tail(store, aggregates)
+    store.append([_row("u1"), _row("u2")])
+    tail.poll()
+
+    store._connection().execute("DELETE FROM events")
+    store._connection().commit()
+    store.append([_row("u3")])
+    tail.poll()
+
+    assert tail.resets == 2
+    assert aggregates.report(30)["total_users"] == 1
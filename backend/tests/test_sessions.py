@@ -0,0 +1,137 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import httpx
+import pytest
+
+from session_store import LOCK_STRIPES, MemorySessionStore, SessionStore, SessionTransaction, SQLiteSessionStore
+
+
+def _increment(store, user_id):
+    with store.transaction(user_id) as txn:
+        count = int(txn.state.get("berufserfahrung", "0"))
+        time.sleep(0.001)
+        txn.state["berufserfahrung"] = str(count + 1)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemorySessionStore()
+    return SQLiteSessionStore(str(tmp_path / "sessions.db"))
+
+
+def test_parallel_turns_of_one_session_do_not_lose_updates(store):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: _increment(store, "u1"), range(40)))
+
+    assert store.get("u1")["berufserfahrung"] == "40"
+
+
+def test_sqlite_turns_of_one_session_are_exclusive_across_workers(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    workers = [SQLiteSessionStore(path), SQLiteSessionStore(path)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: _increment(workers[i % 2], "u1"), range(40)))
+
+    assert workers[0].get("u1")["berufserfahrung"] == "40"
+
+
+def test_sqlite_open_turn_does_not_block_other_users(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    worker_a, worker_b = SQLiteSessionStore(path), SQLiteSessionStore(path)
+    entered, release = threading.Event(), threading.Event()
+
+    def long_turn():
+        with worker_a.transaction("a") as txn:
+            entered.set()
+            release.wait(5)
+            txn.state["abschlussziel"] = "Master"
+
+    thread = threading.Thread(target=long_turn)
+    thread.start()
+    entered.wait(5)
+    started = time.perf_counter()
+    with worker_b.transaction("b") as txn:
+        txn.state["abschlussziel"] = "Bachelor"
+    other_user_seconds = time.perf_counter() - started
+    release.set()
+    thread.join()
+
+    assert other_user_seconds < 0.5
+    assert worker_b.get("a")["abschlussziel"] == "Master"
+
+
+def test_sqlite_lock_of_a_crashed_worker_expires(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    crashed = SQLiteSessionStore(path)
+    crashed._connection().execute("INSERT INTO session_locks VALUES ('u1', 'tot', ?)", (time.time() + 0.2,))
+
+    blocked = SQLiteSessionStore(path, lock_timeout=0.05)
+    with pytest.raises(TimeoutError):
+        with blocked.transaction("u1"):
+            pass
+
+    with SQLiteSessionStore(path, lock_timeout=2).transaction("u1") as txn:
+        txn.state["abschlussziel"] = "Master"
+    assert crashed.get("u1")["abschlussziel"] == "Master"
+
+
+def test_sqlite_expired_session_starts_fresh_and_sweep_runs_off_the_turn(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl=60, sweep_interval=3600)
+    with store.transaction("old") as txn:
+        txn.state["abschlussziel"] = "Master"
+    store._connection().execute("UPDATE sessions SET updated = updated - 120")
+
+    # Abgelaufen → gilt als neue Session, obwohl die Zeile noch nicht gelöscht ist
+    assert "abschlussziel" not in store.get("old")
+    store._connection().execute("UPDATE sessions SET updated = updated - 120")
+    assert store.sweep() == 1
+    assert store.stats()["size"] == 0
+
+
+def test_blocked_session_turn_does_not_block_the_event_loop():
+    import main
+
+    lock = main.SESSION_STORE._stripes[hash("busy-user") % LOCK_STRIPES]
+    lock.acquire()
+    threading.Timer(0.5, lock.release).start()
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            started = time.perf_counter()
+            chat = asyncio.create_task(client.post("/chat", json={"message": "Master", "user_id": "busy-user"}))
+            await asyncio.sleep(0.05)
+            root = await client.get("/")
+            root_seconds = time.perf_counter() - started
+            return root, root_seconds, await chat
+
+    root, root_seconds, chat = asyncio.run(scenario())
+    assert root.status_code == 200 and root_seconds < 0.3
+    assert chat.status_code == 200
+
+
+def test_interactions_are_logged_after_the_session_lock_is_released(monkeypatch):
+    import main
+
+    lock = main.SESSION_STORE._stripes[hash("log-user") % LOCK_STRIPES]
+    held = []
+    monkeypatch.setattr(main, "log_interaction", lambda **entry: held.append(lock.locked()))
+
+    main.advance_session({"message": "Master", "user_id": "log-user"})
+
+    assert held == [False, False]
+
+
+def test_incomplete_store_fails_on_creation():
+    class NoStats(SessionStore):
+        @contextmanager
+        def transaction(self, user_id):
+            yield SessionTransaction({})
+
+    with pytest.raises(TypeError):
+        NoStats()
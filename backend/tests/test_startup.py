@@ -0,0 +1,27 @@
+import importlib.util
+import os
+
+BENCH_SUITE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "bench_suite.py")
+# Spielraum über dem Budget für ausgelastete CI-Maschinen (Sekunden); die Benchmark selbst misst ohne
+STARTUP_BUDGET_MARGIN = float(os.getenv("STARTUP_BUDGET_MARGIN", "0.5"))
+
+
+def _bench_suite():
+    spec = importlib.util.spec_from_file_location("bench_suite", BENCH_SUITE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_app_is_ready_within_startup_budget():
+    bench_suite = _bench_suite()
+    # Ein ungemessener Start füllt Regelwerk-Cache und Matrix-Segment sowie den Dateicache des Systems
+    bench_suite.bench_startup(runs=1)
+
+    # Frische Prozesse wie bench_suite.py --startup-budget: Import von main, Lifespan und
+    # Aufwärmen (Regelwerk, OpenAI-Clients), bis /ready 200 liefert; Fehler beim Aufwärmen schlagen durch
+    stages = bench_suite.bench_startup(runs=5)
+
+    ready_s = stages["startup.ready"]["median_us"] / 1e6
+    limit = bench_suite.DEFAULT_STARTUP_BUDGET + STARTUP_BUDGET_MARGIN
+    assert ready_s <= limit, f"Start bis /ready {ready_s:.3f} s (Median), erlaubt {limit:.2f} s"
@@ -0,0 +1,73 @@
+import json
+import threading
+import time
+
+from structured_log import JsonLineWriter
+
+
+def _event(n, **fields):
+    return {"ts": time.time(), "level": "info", "module": "test", "event": f"e{n}", **fields}
+
+
+def _lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_failed_batch_does_not_kill_the_writer(tmp_path):
+    path = str(tmp_path / "app.jsonl")
+    writer = JsonLineWriter(path=path)
+    writer.write({"ts": "kein Zeitstempel", "event": "kaputt"})
+    writer.flush()
+    writer.write(_event(1))
+    writer.flush()
+    writer.stop()
+
+    assert writer.errors == 1
+    assert [line["event"] for line in _lines(path)] == ["e1"]
+
+
+def test_stop_returns_when_the_writer_is_stuck(tmp_path):
+    writer = JsonLineWriter(path=str(tmp_path / "app.jsonl"), queue_size=2)
+    blocked = threading.Event()
+    writer._write = lambda out, events: blocked.wait(5)
+    for n in range(10):
+        writer.write(_event(n))
+
+    started = time.perf_counter()
+    writer.stop(timeout=0.2)
+    elapsed = time.perf_counter() - started
+    blocked.set()
+
+    assert elapsed < 1
+    assert writer.dropped > 0
+
+
+def test_unwritable_path_falls_back_to_stderr(tmp_path, capsys):
+    writer = JsonLineWriter(path=str(tmp_path / "fehlt" / "app.jsonl"))
+    writer.write(_event(1, user="u1"))
+    writer.stop()
+
+    err = capsys.readouterr().err
+    assert "nicht beschreibbar" in err
+    assert '"event": "e1"' in err
+
+
+def test_failing_metrics_collector_is_logged_not_printed(capsys):
+    import metrics
+    import structured_log
+
+    def kaputt():
+        raise RuntimeError("kein Zugriff")
+
+    metrics.register_collector(kaputt)
+    try:
+        text = metrics.render_metrics()
+    finally:
+        metrics._COLLECTORS.remove(kaputt)
+    structured_log.writer.flush()
+
+    assert "# TYPE" in text
+    assert capsys.readouterr().out == ""
+    events = _lines(structured_log.APP_LOG_FILE)
+    assert any(e["event"] == "collector_fehlgeschlagen" and e["collector"] == "kaputt" for e in events)
@@ -56,40 +56,90 @@ function showOptionButtons(options) {
   chatWindow.scrollTop = chatWindow.scrollHeight;
 }
 
-// === Nachricht an Backend senden ===
+// === Antwort des Backends anzeigen (Optionen, Fortschritt, Bewerben-Button) ===
+function handleBotResponse(data, streamedMsg) {
+  if (!data.response) return;
+
+  // 🔹 Gestreamte Nachricht durch die vollständige Antwort ersetzen
+  if (streamedMsg) {
+    streamedMsg.innerHTML = data.response.replace(/\n/g, "<br>");
+  } else {
+    appendMessage("bot", data.response);
+  }
+
+  // ✅ Wenn Optionen vorhanden → Buttons anzeigen (z. B. Ja/Nein bei Englischkenntnissen)
+  if (data.options && Array.isArray(data.options) && data.options.length > 0) {
+    showOptionButtons(data.options);
+  }
+
+  // 🔹 Fortschrittsanzeige aktualisieren
+  if (data.progress !== undefined) {
+    updateProgress(data.progress);
+  }
+
+  // 🔹 Bewerben-Button aktivieren, wenn Entscheidung "Ja"
+  if (data.decision && data.decision.toLowerCase() === "ja") {
+    applyBtn.disabled = false; // Aktivieren
+    applyBtn.classList.add("active-apply"); // CSS-Effekt hinzufügen (optional)
+
+  } else {
+    applyBtn.disabled = true;
+    applyBtn.classList.remove("active-apply");
+  }
+}
+
+// === Nachricht an Backend senden (Server-Sent Events über /chat/stream) ===
 async function sendMessage(message) {
   appendMessage("user", message);
 
   try {
-    const response = await fetch("http://127.0.0.1:5000/chat", {
+    const response = await fetch("http://127.0.0.1:5000/chat/stream", {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({ message, user_id: sessionId }),
     });
 
-    const data = await response.json();
-
-    if (data.response) {
-      appendMessage("bot", data.response);
-
-      // ✅ Wenn Optionen vorhanden → Buttons anzeigen (z. B. Ja/Nein bei Englischkenntnissen)
-      if (data.options && Array.isArray(data.options) && data.options.length > 0) {
-        showOptionButtons(data.options);
-      }
-
-      // 🔹 Fortschrittsanzeige aktualisieren
-      if (data.progress !== undefined) {
-        updateProgress(data.progress);
-      }
+    // 🔹 Fehlerantworten (4xx/5xx) sind kein SSE-Stream → Meldung statt Parser
+    if (!response.ok) {
+      appendMessage("bot", `🚫 Fehler vom Server (${response.status}). Bitte versuche es erneut.`);
+      console.error(await response.text());
+      return;
+    }
 
-      // 🔹 Bewerben-Button aktivieren, wenn Entscheidung "Ja"
-      if (data.decision && data.decision.toLowerCase() === "ja") {
-        applyBtn.disabled = false; // Aktivieren
-        applyBtn.classList.add("active-apply"); // CSS-Effekt hinzufügen (optional)
-        
-      } else {
-        applyBtn.disabled = true;
-        applyBtn.classList.remove("active-apply");
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let streamedMsg = null;
+    let streamedHtml = "";
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      // 🔹 Vollständige Events (durch Leerzeile getrennt) verarbeiten
+      let boundary;
+      while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+        const rawEvent = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+
+        const eventName = (rawEvent.match(/^event: (.*)$/m) || [])[1];
+        const dataLine = (rawEvent.match(/^data: (.*)$/m) || [])[1];
+        if (!dataLine) continue;
+        const data = JSON.parse(dataLine);
+
+        if (eventName === "chunk") {
+          // ✍️ Entscheidung erscheint Stück für Stück
+          if (!streamedMsg) {
+            appendMessage("bot", "");
+            streamedMsg = chatWindow.lastElementChild;
+          }
+          streamedHtml += data.html;
+          streamedMsg.innerHTML = streamedHtml.replace(/\n/g, "<br>");
+          chatWindow.scrollTop = chatWindow.scrollHeight;
+        } else if (eventName === "done") {
+          handleBotResponse(data, streamedMsg);
+        }
       }
     }
   } catch (err) {